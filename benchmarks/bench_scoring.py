@@ -0,0 +1,273 @@
+"""Scoring throughput benchmarks.
+
+Scores the sample models shipped with the tests and larger synthetic models
+over random inputs of several sizes, through each scoring path:
+
+- row: ScoringModel.predict called once per row,
+- batch: ScoringModel.predictBatch over chunks of rows,
+- parallel: predictParallel with one worker per CPU; skipped on machines
+  with a single CPU, where it would only measure the overhead of a worker.
+
+For every case it reports rows per second, the median and 99th percentile
+per-row latency (amortized over a chunk for the batch path; not observable
+for the parallel path) and the peak resident memory of the Python
+processes. PMML models are scored natively, and the sample PMML model also
+by pypmml, whose JVM is not included in the memory. Each case runs
+in a fresh interpreter, so cases do not share warm-up or memory.
+
+Usage::
+
+    python benchmarks/bench_scoring.py -o results.json
+    python benchmarks/bench_scoring.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_scoring.py --baseline benchmarks/baseline.json --threshold 0.2
+
+With --baseline, the run exits with status 1 if the throughput of any case
+is more than threshold (a fraction) below the baseline. benchmarks/baseline.json
+holds the results of the 1000 and 100000 row cases on the machine described
+in its "environment"; throughput only compares within the same environment,
+so the run warns when it differs.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "orangecontrib", "scoring", "tests")
+
+SIZES = (1000, 100000, 1000000)
+PATHS = ("row", "batch", "parallel")
+CHUNK_SIZE = 1000
+# Number of input fields of the larger synthetic models
+SYNTHETIC_FEATURES = 50
+
+def syntheticTreePFA(depth=10, nFeatures=10, seed=0):
+    rand = random.Random(seed)
+    names = ["x{0}".format(i) for i in range(nFeatures)]
+
+    def node(d):
+        if d == 0:
+            return {"string": rand.choice(["a", "b", "c", "d"])}
+        return {"if": {"<": ["input." + rand.choice(names), rand.random()]},
+                "then": node(d - 1), "else": node(d - 1)}
+
+    return json.dumps({"input": {"type": "record", "name": "Input",
+                                 "fields": [{"name": name, "type": "double"} for name in names]},
+                       "output": "string",
+                       "action": [node(depth)]})
+
+def syntheticLinearPFA(nFeatures=SYNTHETIC_FEATURES, seed=0):
+    rand = random.Random(seed)
+    return json.dumps({
+        "input": {"type": "array", "items": "double"},
+        "output": "double",
+        "cells": {"model": {"type": {"type": "record", "name": "Model",
+                                     "fields": [{"name": "coeff", "type": {"type": "array", "items": "double"}},
+                                                {"name": "const", "type": "double"}]},
+                            "init": {"coeff": [rand.random() for _ in range(nFeatures)], "const": 0.5}}},
+        "action": [{"model.reg.linear": ["input", {"cell": "model"}]}]})
+
+def syntheticRegressionPMML(nFeatures=SYNTHETIC_FEATURES, seed=0):
+    rand = random.Random(seed)
+    names = ["x{0}".format(i) for i in range(nFeatures)]
+    fields = "".join('<DataField name="{0}" optype="continuous" dataType="double"/>'.format(name) for name in names)
+    mining = "".join('<MiningField name="{0}"/>'.format(name) for name in names)
+    predictors = "".join('<NumericPredictor name="{0}" coefficient="{1!r}"/>'.format(name, rand.random())
+                         for name in names)
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<PMML version="4.1" xmlns="http://www.dmg.org/PMML-4_1">'
+            '<Header/><DataDictionary numberOfFields="{0}">{1}'
+            '<DataField name="y" optype="continuous" dataType="double"/></DataDictionary>'
+            '<RegressionModel functionName="regression"><MiningSchema>{2}'
+            '<MiningField name="y" usageType="predicted"/></MiningSchema>'
+            '<RegressionTable intercept="0.5">{3}</RegressionTable></RegressionModel></PMML>'
+            ).format(nFeatures + 1, fields, mining, predictors)
+
+def _sample(name):
+    with open(os.path.join(TESTS_DIR, name)) as f:
+        return f.read()
+
+# name -> (backend, file extension, function returning the document); the
+# pypmml backend scores a PMML document in the JVM instead of natively
+MODELS = {
+    "sample_iris.json": ("PFA", ".json", lambda: _sample("sample_iris.json")),
+    "sample_pfa.json": ("PFA", ".json", lambda: _sample("sample_pfa.json")),
+    "sample_pmml.xml": ("PMML", ".xml", lambda: _sample("sample_pmml.xml")),
+    "sample_pmml.xml (pypmml)": ("pypmml", ".xml", lambda: _sample("sample_pmml.xml")),
+    "synthetic_tree_pfa": ("PFA", ".json", syntheticTreePFA),
+    "synthetic_linear_pfa": ("PFA", ".json", syntheticLinearPFA),
+    "synthetic_regression_pmml": ("PMML", ".xml", syntheticRegressionPMML),
+}
+
+def _peakMemoryMB():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def runCase(modelName, path, nRows):
+    """Run one case in this process and return its measurements."""
+    from orangecontrib.scoring.lib.model import ScoringModel
+    from orangecontrib.scoring.lib.parallel import predictParallel
+
+    backend, ext, document = MODELS[modelName]
+    if backend == "pypmml":
+        model = ScoringModel.fromPMML(document(), native=False)
+    else:
+        model = ScoringModel.fromDocument(backend, document(), ext)
+    if model.type == "PFA" and not model.pfaInputIsRecord and "array" not in model.inputFields[0][1]:
+        columns = ["input_value"]
+    elif model.type == "PFA" and not model.pfaInputIsRecord:
+        columns = ["x{0}".format(i) for i in range(SYNTHETIC_FEATURES)]
+    else:
+        columns = [name for name, _ in model.inputFields]
+    X = np.random.RandomState(0).uniform(0, 7, size=(nRows, len(columns)))
+
+    latencies = None
+    started = time.perf_counter()
+    if path == "row":
+        makeDatum = model.datumBuilder(columns)
+        latencies = np.empty(nRows)
+        for i, row in enumerate(X):
+            rowStarted = time.perf_counter()
+            model.predict(makeDatum(row))
+            latencies[i] = time.perf_counter() - rowStarted
+    elif path == "batch":
+        latencies = []
+        for start in range(0, nRows, CHUNK_SIZE):
+            chunkStarted = time.perf_counter()
+            chunk = X[start:start + CHUNK_SIZE]
+            model.predictBatch(chunk, columns)
+            latencies.append((time.perf_counter() - chunkStarted) / len(chunk))
+        latencies = np.array(latencies)
+    elif path == "parallel":
+        predictParallel(model, X, columns, workers=os.cpu_count(), chunkSize=CHUNK_SIZE)
+    else:
+        raise ValueError("Unknown scoring path {0}".format(path))
+    elapsed = time.perf_counter() - started
+
+    return {"model": modelName, "backend": backend, "path": path, "rows": nRows,
+            "seconds": elapsed, "rowsPerSec": nRows / elapsed,
+            "p50LatencyMs": None if latencies is None else float(np.percentile(latencies, 50)) * 1000,
+            "p99LatencyMs": None if latencies is None else float(np.percentile(latencies, 99)) * 1000,
+            "peakMemoryMB": _peakMemoryMB()}
+
+def runIsolated(modelName, path, nRows):
+    """Run one case in a fresh interpreter and return its measurements."""
+    output = subprocess.run([sys.executable, os.path.realpath(__file__), "--case", modelName, path, str(nRows)],
+                            stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def caseKey(result):
+    return "{0}/{1}/{2}".format(result["model"], result["path"], result["rows"])
+
+def compare(results, baseline, threshold):
+    """Return descriptions of the cases whose throughput dropped by more than
+    threshold (a fraction) below the baseline."""
+    reference = {caseKey(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = reference.get(caseKey(result))
+        if base is None:
+            continue
+        if result["rowsPerSec"] < base["rowsPerSec"] * (1 - threshold):
+            regressions.append("{0}: {1:.0f} rows/s, baseline {2:.0f} rows/s ({3:+.1%})".format(
+                caseKey(result), result["rowsPerSec"], base["rowsPerSec"],
+                result["rowsPerSec"] / base["rowsPerSec"] - 1))
+    return regressions
+
+def environment():
+    versions = {}
+    # titus2 has no __version__; read those of the installed distributions
+    for module, distribution in (("numpy", "numpy"), ("titus", "titus2"), ("pypmml", "pypmml")):
+        try:
+            from importlib.metadata import version
+            versions[module] = version(distribution)
+        except Exception:  # pylint: disable=broad-except
+            try:
+                versions[module] = __import__(module).__version__
+            except (ImportError, AttributeError):
+                versions[module] = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "versions": versions}
+
+def environmentChanges(baseline, current):
+    """Return descriptions of the differences between the environment of the
+    baseline and the current one."""
+    before, after = baseline.get("environment", {}), current
+    changes = ["{0}: {1} -> {2}".format(key, before.get(key), after[key])
+               for key in ("python", "platform", "cpus") if before.get(key) != after[key]]
+    beforeVersions = before.get("versions", {})
+    changes += ["{0}: {1} -> {2}".format(module, beforeVersions.get(module), version)
+                for module, version in after["versions"].items() if beforeVersions.get(module) != version]
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring throughput.")
+    parser.add_argument("--models", type=lambda value: value.split(","), default=sorted(MODELS),
+                        help="comma-separated models; all by default: " + ", ".join(sorted(MODELS)))
+    parser.add_argument("--paths", type=lambda value: value.split(","), default=list(PATHS),
+                        help="comma-separated scoring paths (default: %(default)s)")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=list(SIZES),
+                        help="comma-separated numbers of rows (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative drop of throughput (default: %(default)s)")
+    parser.add_argument("--save-baseline", help="save the results as a new baseline")
+    parser.add_argument("--case", nargs=3, metavar=("MODEL", "PATH", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        modelName, path, nRows = args.case
+        print(json.dumps(runCase(modelName, path, int(nRows))))
+        return 0
+
+    paths = args.paths
+    if "parallel" in paths and (os.cpu_count() or 1) == 1:
+        print("Skipping the parallel cases on a single CPU.")
+        paths = [path for path in paths if path != "parallel"]
+    results = []
+    for modelName in args.models:
+        for path in paths:
+            for nRows in args.sizes:
+                result = runIsolated(modelName, path, nRows)
+                results.append(result)
+                print("{0:<55} {1:>12.0f} rows/s  p50 {2:>8} ms  p99 {3:>8} ms  peak {4:>8.1f} MB".format(
+                    caseKey(result), result["rowsPerSec"],
+                    "-" if result["p50LatencyMs"] is None else "{0:.4f}".format(result["p50LatencyMs"]),
+                    "-" if result["p99LatencyMs"] is None else "{0:.4f}".format(result["p99LatencyMs"]),
+                    result["peakMemoryMB"] or float("nan")))
+                sys.stdout.flush()
+
+    report = {"environment": environment(), "results": results}
+    for filename in (args.output, args.save_baseline):
+        if filename:
+            with open(filename, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changes = environmentChanges(baseline, report["environment"])
+        if changes:
+            print("Warning: the baseline was measured in another environment:\n" + "\n".join(changes))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Throughput regressions:\n" + "\n".join(regressions))
+            return 1
+        print("No throughput regressions beyond {0:.0%}.".format(args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
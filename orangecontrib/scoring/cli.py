@@ -0,0 +1,210 @@
+"""Command-line scoring of CSV, Parquet and Arrow files with PMML and PFA models.
+
+Usage::
+
+    orange-scoring score model.pfa input.csv -o out.csv
+    orange-scoring score model.pfa input.parquet -o out.arrow
+    orange-scoring serve model.pfa --port 8000
+
+The input is read and scored in chunks and the predictions of every chunk
+are written before the next one is read, so memory use does not depend on
+the size of the input. Parquet and Arrow IPC files (see
+orangecontrib.scoring.lib.arrowio) require pyarrow. ``serve`` scores JSON rows posted over HTTP, see
+orangecontrib.scoring.server.
+"""
+import argparse
+import csv
+import logging
+import shlex
+import sys
+from contextlib import ExitStack
+
+import numpy as np
+
+from orangecontrib.scoring.lib import arrowio, gateway
+from orangecontrib.scoring.lib.parallel import ScoringPool, canRunParallel
+from orangecontrib.scoring.lib.readers import getReader
+from orangecontrib.scoring.server import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT, ScoringServer
+
+DEFAULT_CHUNK_SIZE = 10000
+MISSING_VALUES = ("", "?", "NA", "NaN", "nan")
+MODEL_HELP = ("PMML (*.pmml, *.xml) or PFA (*.pfa, *.json, *.yml, *.yaml) file, "
+              "optionally compressed (*.gz, *.bz2, *.zip)")
+JAVA_OPTS_HELP = ("options of the JVM scoring PMML models with pypmml, e.g. --java-opts=\"-Xmx4g\"; "
+                  "by default those in ${0}".format(gateway.ENV_VARIABLE))
+
+# Types of input fields whose CSV values are converted into numbers; values
+# of other fields, e.g. strings holding zip codes, are kept as text
+NUMERIC_TYPES = ("integer", "float", "double", "int", "long")
+
+def isNumericType(dataType):
+    """Whether the values of an input field of dataType (a PMML or Avro type,
+    a union of them or an array of them) are numbers."""
+    types = [name for name in dataType.replace("array of ", "").split(",") if name != "null"]
+    return bool(types) and all(name in NUMERIC_TYPES for name in types)
+
+def numericColumns(model, names):
+    """Return, for each of the input columns names of model, whether it
+    holds numbers."""
+    if model.type == "PMML" or model.pfaInputIsRecord:
+        types = dict(model.inputFields)
+        return [isNumericType(types[name]) for name in names]
+    return [isNumericType(model.inputFields[0][1])] * len(names)
+
+def toArray(rows, numeric):
+    """Convert rows of CSV values into an array. Columns for which numeric is
+    true are converted into floats with NaN for missing values, the others are
+    kept as text with None for missing values. The array is a float array if
+    all columns are numeric, else an object array, whatever the values."""
+    X = np.empty((len(rows), len(numeric)), dtype=float if all(numeric) else object)
+    for j, isNumber in enumerate(numeric):
+        if isNumber:
+            X[:, j] = [np.nan if row[j] in MISSING_VALUES else float(row[j]) for row in rows]
+        else:
+            X[:, j] = [None if row[j] in MISSING_VALUES else row[j] for row in rows]
+    return X
+
+def inputColumns(model, header):
+    """Return the indices and names of the columns of header passed to model."""
+    if model.type == "PMML" or model.pfaInputIsRecord:
+        names = [name for name, _ in model.inputFields]
+        missing = [name for name in names if name not in header]
+        if missing:
+            raise ValueError("Input has no column for model field(s) {0}".format(", ".join(missing)))
+        return [header.index(name) for name in names], names
+    return list(range(len(header))), header
+
+def iterChunks(reader, nColumns, chunkSize):
+    """Yield lists of at most chunkSize rows read from a csv reader."""
+    chunk = []
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != nColumns:
+            raise ValueError("Line {0} has {1} values, header has {2}".format(reader.line_num, len(row), nColumns))
+        chunk.append(row)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def csvArrays(fin, model, chunkSize):
+    """Yield arrays of at most chunkSize rows of the CSV file fin, with the
+    columns passed to model, and the names of the columns."""
+    reader = csv.reader(fin)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Input has no header")
+    indices, names = inputColumns(model, header)
+    numeric = numericColumns(model, names)
+    for rows in iterChunks(reader, len(header), chunkSize):
+        yield toArray([[row[i] for i in indices] for row in rows], numeric), names
+
+def arrowArrays(filename, model, chunkSize):
+    """Yield arrays of at most chunkSize rows of a Parquet or Arrow IPC file,
+    with the columns passed to model, and the names of the columns; other
+    columns are not read."""
+    _, names = inputColumns(model, arrowio.columnNames(filename))
+    for batch in arrowio.iterBatches(filename, names, chunkSize):
+        yield arrowio.toArray(batch, names), names
+
+def score(modelFile, inputFile, outputFile, chunkSize=DEFAULT_CHUNK_SIZE, workers=1, columns=None):
+    """Score inputFile with the model in modelFile and write the predictions,
+    one row per input row, into outputFile.
+
+    Files are CSV files, or Parquet and Arrow IPC files by their extensions
+    (see arrowio.isArrowFile). columns is a list of output fields to write;
+    all are written by default. Returns the number of scored rows."""
+    model = getReader(modelFile).read()
+    outputNames = [name for name, _ in model.outputFields]
+    if columns:
+        unknown = [name for name in columns if name not in outputNames]
+        if unknown:
+            raise ValueError("Model has no output field(s) {0}".format(", ".join(unknown)))
+        outputNames = columns
+
+    nRows = 0
+    with ExitStack() as stack:
+        if arrowio.isArrowFile(inputFile):
+            arrays = arrowArrays(inputFile, model, chunkSize)
+        else:
+            fin = sys.stdin if inputFile == "-" else stack.enter_context(open(inputFile, newline=""))
+            arrays = csvArrays(fin, model, chunkSize)
+        if arrowio.isArrowFile(outputFile):
+            write = stack.enter_context(arrowio.PredictionWriter(outputFile, model.outputFields, outputNames)).write
+        else:
+            fout = sys.stdout if outputFile == "-" else stack.enter_context(open(outputFile, "w", newline=""))
+            writer = csv.writer(fout)
+            writer.writerow(outputNames)
+            write = lambda batch: writer.writerows(zip(*[batch[name] for name in outputNames]))
+        pool = None
+        if workers > 1 and canRunParallel(model):
+            pool = stack.enter_context(ScoringPool(model, workers))
+        for X, names in arrays:
+            write(pool.predict(X, names) if pool is not None else model.predictBatch(X, names))
+            nRows += len(X)
+    return nRows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="orange-scoring", description="Score data with PMML and PFA models.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    scoreParser = subparsers.add_parser("score", help="score a CSV, Parquet or Arrow file")
+    scoreParser.add_argument("model", help=MODEL_HELP)
+    scoreParser.add_argument("input", help="CSV file with a header row, - for standard input, "
+                                           "or Parquet (*.parquet) or Arrow (*.arrow, *.feather) file")
+    scoreParser.add_argument("-o", "--output", default="-",
+                             help="CSV, Parquet or Arrow file for the predictions; CSV on standard output by default")
+    scoreParser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                             help="number of rows read and scored at once (default: %(default)s)")
+    scoreParser.add_argument("--workers", type=int, default=1,
+                             help="number of processes scoring in parallel (default: %(default)s)")
+    scoreParser.add_argument("--columns", type=lambda value: value.split(","),
+                             help="comma-separated output fields to write; all by default")
+    scoreParser.add_argument("--java-opts", help=JAVA_OPTS_HELP)
+    serveParser = subparsers.add_parser("serve", help="score JSON rows posted to a local HTTP server")
+    serveParser.add_argument("model", help=MODEL_HELP)
+    serveParser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    serveParser.add_argument("--port", type=int, default=8000, help="port to listen on (default: %(default)s)")
+    serveParser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                             help="largest number of rows scored at once (default: %(default)s)")
+    serveParser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT * 1000,
+                             help="milliseconds to wait for a batch to fill (default: %(default)s)")
+    serveParser.add_argument("--workers", type=int, default=1,
+                             help="number of processes scoring each batch (default: %(default)s)")
+    serveParser.add_argument("--java-opts", help=JAVA_OPTS_HELP)
+    args = parser.parse_args(argv)
+    if args.java_opts is not None:
+        gateway.configure(shlex.split(args.java_opts))
+    if args.command == "serve":
+        return serve(parser, args)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    try:
+        score(args.model, args.input, args.output, chunkSize=args.chunk_size,
+              workers=args.workers, columns=args.columns)
+    except (IOError, ValueError, NotImplementedError) as ex:
+        parser.exit(1, "{0}: error: {1}\n".format(parser.prog, ex))
+    return 0
+
+def serve(parser, args):
+    if args.max_batch_size < 1:
+        parser.error("--max-batch-size must be positive")
+    if args.max_wait < 0:
+        parser.error("--max-wait must not be negative")
+    try:
+        model = getReader(args.model).read()
+    except (IOError, ValueError, NotImplementedError) as ex:
+        parser.exit(1, "{0}: error: {1}\n".format(parser.prog, ex))
+    server = ScoringServer(model, args.host, args.port, maxBatchSize=args.max_batch_size,
+                           maxWait=args.max_wait / 1000, workers=args.workers)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Conversion of input arrays into the values models expect.
+
+Orange tables hold every value as a float: categorical values as indices into
+the values of their variables and missing values as NaN. An InputAdapter is
+built once for the fields of a model and the columns of the data, and then
+converts whole columns at once into the types of the model's fields.
+
+Sparse arrays, such as those of bag-of-words tables, are never densified as a
+whole: only the columns a model reads are taken from them, a block of rows at
+a time (see InputAdapter.densify and ScoringModel.predictBatch).
+"""
+import numpy as np
+import scipy.sparse as sp
+
+# Number of values of a sparse array densified at once
+SPARSE_BLOCK_SIZE = 1 << 20
+
+# Avro types of PFA fields whose values are strings
+STRING_TYPES = ("string", "enum")
+
+def _kind(dataType):
+    """Return the kind of Python value ("float", "int", "bool", "str" or None
+    for values passed unchanged) and whether None is allowed for a PFA or
+    PMML data type such as "int,null" or "array of double"."""
+    if dataType.startswith("array of "):
+        dataType = dataType[len("array of "):]
+    types = [name.strip() for name in dataType.split(",")]
+    nullable = "null" in types
+    for kind, names in (("float", ("double", "float", "real")), ("int", ("int", "long", "integer")),
+                        ("bool", ("boolean",)), ("str", STRING_TYPES)):
+        if any(name in names for name in types):
+            return kind, nullable
+    return None, nullable
+
+def _floats(column):
+    """Return column as a float array, or None if it holds values other than
+    numbers and None."""
+    if column.dtype.kind in "fiub":
+        return column.astype(float, copy=False)
+    try:
+        return np.array([np.nan if value is None else value for value in column], dtype=float)
+    except (TypeError, ValueError):
+        return None
+
+def _numberText(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _text(value):
+    return _numberText(value) if isinstance(value, float) else str(value)
+
+# Conversions of single values into each kind
+CONVERSIONS = {"float": float, "int": int, "bool": bool, "str": _text}
+
+def _withNone(values, mask):
+    for i in np.flatnonzero(mask):
+        values[i] = None
+    return values
+
+def coerceColumn(column, kind, nullable=False, categories=None, name=None):
+    """Return the list of values of the 1-D array column converted to kind
+    (see _kind). NaN and None become None, except in float columns that do
+    not allow None. categories are the values of a categorical column whose
+    values are indices."""
+    if kind is None:
+        return column.tolist()
+    floats = None if kind == "str" and categories is None else _floats(column)
+    if floats is None:
+        # strings or other objects; convert them one by one
+        convert = CONVERSIONS[kind]
+        return [None if value is None or value != value else convert(value) for value in column]
+    missing = np.isnan(floats)
+    if kind == "float":
+        values = floats.tolist()
+        return _withNone(values, missing) if nullable else values
+    if kind == "str":
+        if categories is not None:
+            labels = np.array(list(categories) + [None], dtype=object)
+            return labels[np.where(missing, len(categories), floats).astype(int)].tolist()
+        return _withNone([_numberText(value) for value in np.where(missing, 0, floats).tolist()], missing)
+    present = floats[~missing]
+    if kind == "int":
+        if np.any(present != np.floor(present)):
+            raise ValueError("Field {0} of integer type has non-integer values".format(name or ""))
+        return _withNone(np.where(missing, 0, floats).astype(np.int64).tolist(), missing)
+    return _withNone((floats != 0).tolist(), missing)
+
+class InputAdapter(object):
+    """Converter of 2-D arrays whose columns are named by columns into the
+    inputs of model, built once for the model and the columns.
+
+    categories maps the names of categorical columns holding indices, like
+    those of Orange tables, to the tuples of their values; see fromDomain.
+    Columns are matched to the model's fields by name, in any order."""
+    def __init__(self, model, columns, categories=None):
+        self.model = model
+        self.columns = list(columns)
+        self.categories = dict(categories or {})
+        self.fields = list(model.inputFields)
+        index = {name: j for j, name in enumerate(self.columns)}
+        if model.type == "PFA" and not model.pfaInputIsRecord:
+            dataType = self.fields[0][1]
+            # as in ScoringModel.datumBuilder: arrays take the whole row, other
+            # values the first column
+            self.layout = "array" if "array" in dataType else "value"
+            self.plan = [(name, j) + _kind(dataType) for j, name in enumerate(self.columns)]
+            if self.layout == "value":
+                self.plan = self.plan[:1]
+        elif model.type == "PFA" and len(self.fields) == 1 and self.fields[0][1] == "array":
+            self.layout = "arrayRecord"
+            self.plan = [(name, j, None, False) for j, name in enumerate(self.columns)]
+        else:
+            missing = [name for name, _ in self.fields if name not in index]
+            if missing:
+                raise ValueError("Input has no column for model field(s) {0}".format(", ".join(missing)))
+            self.layout = "record"
+            self.plan = [(name, index[name]) + _kind(dataType) for name, dataType in self.fields]
+        # columns holding category indices that string fields read as labels
+        self.labelled = [(j, self.categories[name]) for name, j, kind, _ in self.plan
+                         if kind == "str" and name in self.categories]
+        # indices of the columns read by the model
+        self.used = sorted({j for _, j, _, _ in self.plan})
+
+    @classmethod
+    def fromDomain(cls, model, domain):
+        """Return an adapter for the attributes of an Orange domain."""
+        columns = [var.name for var in domain.attributes]
+        categories = {var.name: tuple(var.values) for var in domain.attributes if var.is_discrete}
+        return cls(model, columns, categories)
+
+    def prepare(self, X):
+        """Return X with the category indices read by string fields replaced
+        by their values, and the names of its columns, for batch scoring.
+
+        X is returned unchanged if there are no such columns; otherwise the
+        result is an object array with None for missing values. Of a sparse
+        X, only the columns read by the model are then densified."""
+        if not self.labelled:
+            return X, self.columns
+        if sp.issparse(X):
+            X, columns = self.densify(X)
+            return InputAdapter(self.model, columns, self.categories).prepare(X)
+        X = np.asarray(X)
+        result = np.empty(X.shape, dtype=object)
+        for j in range(X.shape[1]):
+            column = X[:, j]
+            if column.dtype.kind == "f":
+                result[:, j] = _withNone(column.tolist(), np.isnan(column))
+            else:
+                result[:, j] = column
+        for j, categories in self.labelled:
+            result[:, j] = coerceColumn(X[:, j], "str", True, categories)
+        return result, self.columns
+
+    def densify(self, X):
+        """Return the columns of the sparse array X read by the model as a
+        dense array, and their names."""
+        X = sp.csr_matrix(X)
+        if len(self.used) < X.shape[1]:
+            X = X[:, self.used]
+        return X.toarray(), [self.columns[j] for j in self.used]
+
+    def blockSize(self):
+        """Return the number of rows of a sparse array densified at once."""
+        return max(1, SPARSE_BLOCK_SIZE // max(len(self.used), 1))
+
+    def records(self, X):
+        """Return an iterator over the inputs of the model for the rows of X:
+        values, lists or dicts as expected by ScoringModel.predict. Whole
+        columns are converted at once, before the first row is yielded."""
+        X = np.asarray(X)
+        columns = [coerceColumn(X[:, j], kind, nullable, self.categories.get(name), name)
+                   for name, j, kind, nullable in self.plan]
+        if self.layout == "value":
+            return iter(columns[0])
+        if self.layout == "array":
+            return map(list, zip(*columns))
+        if self.layout == "arrayRecord":
+            name = self.fields[0][0]
+            return ({name: list(row)} for row in zip(*columns))
+        names = [name for name, _, _, _ in self.plan]
+        return (dict(zip(names, row)) for row in zip(*columns))
@@ -0,0 +1,157 @@
+"""Reading inputs from and writing predictions to Parquet and Arrow IPC files.
+
+Inputs are read in record batches, only the columns a model reads, without
+building an Orange Table; each column is converted into NumPy as a whole and
+copied once into the 2-D array passed to the model (float columns without
+nulls are viewed, not converted, before that copy). Predictions are written
+as record batches, string outputs as dictionary-encoded columns.
+
+pyarrow is an optional dependency; the functions below raise
+NotImplementedError if it is not installed.
+"""
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from orangecontrib.scoring.lib.results import DISCRETE_TYPES
+
+# Extensions of the files read and written with pyarrow, and their formats
+ARROW_EXTENSIONS = {".parquet": "parquet", ".pq": "parquet",
+                    ".arrow": "ipc", ".feather": "ipc", ".ipc": "ipc"}
+
+# Avro/PMML data types of outputs and the Arrow types of their columns
+FLOAT_TYPES = ("double", "float", "real")
+INTEGER_TYPES = ("int", "long", "integer")
+
+def isArrowFile(filename):
+    """Return True if filename is a Parquet or Arrow IPC file by its extension."""
+    return os.path.splitext(filename)[1].lower() in ARROW_EXTENSIONS
+
+def _format(filename):
+    if pa is None:
+        raise NotImplementedError("Reading and writing {0} files requires pyarrow; "
+                                  "install it with 'pip install pyarrow'".format(filename))
+    return ARROW_EXTENSIONS[os.path.splitext(filename)[1].lower()]
+
+def _isNumeric(dataType):
+    return pa.types.is_floating(dataType) or pa.types.is_integer(dataType) or pa.types.is_boolean(dataType)
+
+def _numbers(column):
+    """Return column as a float array with NaN for nulls."""
+    if pa.types.is_float64(column.type) and column.null_count == 0:
+        return column.to_numpy()
+    return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+def toArray(batch, names):
+    """Copy the columns names of a record batch into a new 2-D array: a float
+    array if all of them are numeric, else an object array with NaN for null
+    numbers and None for other nulls, as the CSV reader of the command line
+    does."""
+    columns = [batch.column(batch.schema.get_field_index(name)) for name in names]
+    numeric = [_isNumeric(column.type) for column in columns]
+    X = np.empty((batch.num_rows, len(columns)), dtype=float if all(numeric) else object)
+    for j, column in enumerate(columns):
+        if numeric[j]:
+            X[:, j] = _numbers(column)
+        else:
+            X[:, j] = column.to_numpy(zero_copy_only=False)
+    return X
+
+def columnNames(filename):
+    """Return the names of the columns of a Parquet or Arrow IPC file."""
+    if _format(filename) == "parquet":
+        return pq.ParquetFile(filename).schema_arrow.names
+    with pa.memory_map(filename) as source:
+        return _openIpc(source).schema.names
+
+def _openIpc(source):
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+def _ipcBatches(reader):
+    if isinstance(reader, pa.ipc.RecordBatchFileReader):
+        return (reader.get_batch(i) for i in range(reader.num_record_batches))
+    return iter(reader)
+
+def iterBatches(filename, columns=None, batchSize=10000):
+    """Yield the record batches of a Parquet or Arrow IPC file, of at most
+    batchSize rows and with the given columns only, if any.
+
+    Arrow IPC files are memory-mapped, so batches are read lazily and
+    slicing them does not copy."""
+    if _format(filename) == "parquet":
+        for batch in pq.ParquetFile(filename).iter_batches(batch_size=batchSize, columns=columns):
+            yield batch
+        return
+    with pa.memory_map(filename) as source:
+        for batch in _ipcBatches(_openIpc(source)):
+            for start in range(0, batch.num_rows, batchSize):
+                yield batch.slice(start, batchSize)
+
+def _arrowType(dataType):
+    if dataType in DISCRETE_TYPES:
+        return pa.dictionary(pa.int32(), pa.string())
+    types = [name.strip() for name in dataType.split(",")]
+    if any(name in FLOAT_TYPES for name in types):
+        return pa.float64()
+    if any(name in INTEGER_TYPES for name in types):
+        return pa.int64()
+    if "boolean" in types:
+        return pa.bool_()
+    return pa.string()
+
+class PredictionWriter(object):
+    """Writes batches of predictions, as returned by
+    ScoringModel.predictBatch, into a Parquet or Arrow IPC file.
+
+    outputFields are the (name, type) pairs of the model's outputs and names
+    those of the fields to write, all by default. String outputs are written
+    as dictionary-encoded columns; the dictionary of a column only grows, so
+    IPC files get dictionary deltas rather than a new dictionary per batch.
+    Use the writer as a context manager or call close when done."""
+    def __init__(self, filename, outputFields, names=None):
+        fileFormat = _format(filename)
+        types = dict(outputFields)
+        self.names = list(names or [name for name, _ in outputFields])
+        self.schema = pa.schema([(name, _arrowType(types[name])) for name in self.names])
+        # index of every value of each dictionary-encoded column
+        self.categories = {name: {} for name in self.names if pa.types.is_dictionary(self.schema.field(name).type)}
+        if fileFormat == "parquet":
+            self.writer = pq.ParquetWriter(filename, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(filename, self.schema,
+                                          options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.writer.close()
+
+    def _column(self, name, values):
+        dataType = self.schema.field(name).type
+        if name in self.categories:
+            index = self.categories[name]
+            indices = [None if value is None else index.setdefault(str(value), len(index)) for value in values]
+            return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(index), pa.string()))
+        if pa.types.is_string(dataType):
+            values = [None if value is None else str(value) for value in values]
+        return pa.array(values, dataType)
+
+    def write(self, batch):
+        """Write the predictions batch as one record batch."""
+        self.writer.write_batch(pa.RecordBatch.from_arrays([self._column(name, batch[name]) for name in self.names],
+                                                           schema=self.schema))
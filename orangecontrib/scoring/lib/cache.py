@@ -0,0 +1,178 @@
+import os
+import hashlib
+import marshal
+import tempfile
+import importlib.util
+from types import SimpleNamespace
+
+# Version of the layout of cache entries; bump it to invalidate older entries
+CACHE_FORMAT = "1"
+# Default bound on the total size of a cache directory in bytes
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+class ModelCache(object):
+    """Directory of compiled model artifacts keyed by content hash.
+
+    An entry is a file named after the hash of the model document together
+    with the versions of the backend and of the Python bytecode format, so
+    upgrading titus or Python never reuses a stale entry. When the total size
+    of the directory exceeds maxSize, the least recently used entries are
+    removed."""
+    def __init__(self, directory=None, maxSize=DEFAULT_MAX_SIZE):
+        if directory is None:
+            from Orange.misc.environ import cache_dir
+            directory = os.path.join(cache_dir(), "scoring-models")
+        self.directory = directory
+        self.maxSize = maxSize
+
+    @staticmethod
+    def key(document, backend, ext=None):
+        """Return the cache key of a model document read by the given backend."""
+        if backend == "PFA":
+            import titus.version
+            backendVersion = titus.version.__version__
+        elif backend == "PMML":
+            import pypmml
+            backendVersion = pypmml.__version__
+        else:
+            raise RuntimeError("Backend of a cached model can be PFA or PMML.")
+        digest = hashlib.sha256()
+        for part in (CACHE_FORMAT, backend, backendVersion, importlib.util.MAGIC_NUMBER.hex(), ext or ""):
+            digest.update(part.encode("utf-8") + b"\0")
+        digest.update(document.encode("utf-8") if isinstance(document, str) else document)
+        return "{0}-{1}".format(backend.lower(), digest.hexdigest())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Return the bytes stored under key, or None on a cache miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def store(self, key, data):
+        """Store data under key and evict old entries if the cache is too large."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmpPath, self._path(key))
+        except BaseException:
+            os.unlink(tmpPath)
+            raise
+        self.evict()
+
+    def entries(self):
+        """Return (path, size, last use) of every entry, least recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith("."):
+                continue
+            try:
+                stat = os.stat(self._path(name))
+            except OSError:
+                continue
+            entries.append((self._path(name), stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into maxSize."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def invalidate(self, key):
+        """Remove the entry stored under key, if any."""
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all entries."""
+        for path, _, _ in self.entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+_defaultCache = None
+
+def defaultCache():
+    """Return the process-wide cache in Orange's cache directory."""
+    global _defaultCache
+    if _defaultCache is None:
+        _defaultCache = ModelCache()
+    return _defaultCache
+
+class _CompiledEngineConfig(object):
+    """Stands in for a titus EngineConfig whose Python code is already compiled,
+    so that PFAEngine.fromAst skips type-checking and code generation."""
+    def __init__(self, engineConfig, code):
+        self._engineConfig = engineConfig
+        self._code = code
+
+    def walk(self, task, symbolTable, functionTable, engineOptions, version):
+        return SimpleNamespace(parser=self._engineConfig.inputPlaceholder.parser), self._code
+
+    def __getattr__(self, name):
+        return getattr(self._engineConfig, name)
+
+def _generatePython(engineConfig):
+    import titus.options
+    import titus.pfaast
+    import titus.signature
+    import titus.version
+    from titus.genpy import GeneratePython
+    # the same walk as in PFAEngine.fromAst with its default arguments
+    _, code = engineConfig.walk(GeneratePython.makeTask("pure"),
+                                titus.pfaast.SymbolTable.blank(),
+                                titus.pfaast.FunctionTable.blank(),
+                                titus.options.EngineOptions(engineConfig.options, None),
+                                titus.signature.PFAVersion.fromString(titus.version.defaultPFAVersion))
+    return compile(code, "<string>", "exec")
+
+def pfaEnginesFromCache(engineConfig, key, cache, multiplicity=1):
+    """Build multiplicity titus PFAEngines for engineConfig, reusing the
+    bytecode generated for it that cache holds under key, or storing it there
+    on a miss."""
+    from titus.genpy import PFAEngine
+    code = None
+    data = cache.load(key)
+    if data is not None:
+        try:
+            code = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            cache.invalidate(key)
+    if code is None:
+        code = _generatePython(engineConfig)
+        cache.store(key, marshal.dumps(code))
+    engines = PFAEngine.fromAst(_CompiledEngineConfig(engineConfig, code), multiplicity=multiplicity)
+    for engine in engines:
+        engine.config = engineConfig
+    return engines
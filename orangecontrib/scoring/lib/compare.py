@@ -0,0 +1,199 @@
+"""Comparison of the latency and predictions of two models on the same rows.
+
+Both models score every row with ScoringModel.predict, one row at a time,
+in turn; which model goes first alternates from row to row, so that neither
+model consistently profits from caches warmed by the other or suffers from
+warming them. A few rows are scored by both models before timing starts.
+"""
+import time
+
+import numpy as np
+
+from orangecontrib.scoring.lib.adapter import InputAdapter
+from orangecontrib.scoring.lib.multi import modelNames
+from orangecontrib.scoring.lib.results import DISCRETE_TYPES
+
+# Number of rows scored by both models before timing starts
+DEFAULT_WARMUP = 10
+# Number of slowest rows reported
+DEFAULT_SLOWEST = 10
+# Percentiles of the per-row latency reported by latencySummary
+PERCENTILES = (50, 90, 95, 99)
+
+def latencySummary(latencies):
+    """Return the mean, percentiles and maximum of latencies, in seconds, and
+    the throughput in rows per second."""
+    latencies = np.asarray(latencies, dtype=float)
+    if not len(latencies):
+        return {"rows": 0}
+    summary = {"rows": len(latencies), "mean": float(latencies.mean())}
+    summary.update(zip(("p{0}".format(p) for p in PERCENTILES), np.percentile(latencies, PERCENTILES).tolist()))
+    summary["max"] = float(latencies.max())
+    total = latencies.sum()
+    summary["rowsPerSecond"] = len(latencies) / total if total > 0 else float("inf")
+    return summary
+
+def pairFields(modelA, modelB, fields=None):
+    """Return the pairs of output fields of modelA and modelB compared by
+    compareModels: fields, if given, else the fields with the same name in
+    both models, else the first output field of each."""
+    if fields:
+        namesA = [name for name, _ in modelA.outputFields]
+        namesB = [name for name, _ in modelB.outputFields]
+        unknown = [a for a, _ in fields if a not in namesA] + [b for _, b in fields if b not in namesB]
+        if unknown:
+            raise ValueError("Models have no output field(s) {0}".format(", ".join(unknown)))
+        return list(fields)
+    namesB = {name for name, _ in modelB.outputFields}
+    common = [(name, name) for name, _ in modelA.outputFields if name in namesB]
+    return common or [(modelA.outputFields[0][0], modelB.outputFields[0][0])]
+
+def _outputs(model, result):
+    """Return the dict of output values of the result of model.predict."""
+    if model.type == "PFA" and not model.pfaOutputIsRecord:
+        return {model.outputFields[0][0]: result}
+    # PMML models may return a mapping of the JVM
+    return dict(result)
+
+def _isDiscrete(model, name, values):
+    return dict(model.outputFields)[name] in DISCRETE_TYPES or \
+        any(not isinstance(value, (int, float)) for value in values if value is not None)
+
+class Agreement(object):
+    """Agreement of the values valuesA and valuesB of the output field nameA
+    of one model and nameB of the other, row by row.
+
+    Categorical values agree if they are equal, and confusion counts the
+    rows of each pair of values, indexed by labels; numbers agree if they
+    are equal up to tolerance, relative to their magnitude, and
+    meanAbsDifference and maxAbsDifference measure how far apart they are."""
+    def __init__(self, nameA, nameB, valuesA, valuesB, discrete, tolerance=1e-9):
+        self.fields = (nameA, nameB)
+        self.discrete = discrete
+        self.labels = self.confusion = None
+        self.meanAbsDifference = self.maxAbsDifference = None
+        if discrete:
+            self.agree = np.array([a == b for a, b in zip(valuesA, valuesB)], dtype=bool)
+            labels = sorted({str(value) for value in valuesA + valuesB if value is not None})
+            self.labels = labels + [None] if None in valuesA or None in valuesB else labels
+            index = {label: i for i, label in enumerate(self.labels)}
+            self.confusion = np.zeros((len(self.labels), len(self.labels)), dtype=int)
+            for a, b in zip(valuesA, valuesB):
+                self.confusion[index[None if a is None else str(a)], index[None if b is None else str(b)]] += 1
+        else:
+            a = np.array([np.nan if value is None else value for value in valuesA], dtype=float)
+            b = np.array([np.nan if value is None else value for value in valuesB], dtype=float)
+            self.agree = np.isclose(a, b, rtol=tolerance, atol=0, equal_nan=True)
+            differences = np.abs(a - b)[~(np.isnan(a) | np.isnan(b))]
+            if len(differences):
+                self.meanAbsDifference = float(differences.mean())
+                self.maxAbsDifference = float(differences.max())
+
+    @property
+    def rate(self):
+        """Fraction of rows on which the values agree."""
+        return float(self.agree.mean()) if len(self.agree) else 1.0
+
+class Comparison(object):
+    """Latencies and predictions of two models, as returned by compareModels.
+
+    latencies is an (nRows, 2) array of the seconds each model spent on each
+    row, outputs a dict of output values of each model, and agreements an
+    Agreement for each compared pair of output fields."""
+    def __init__(self, names, latencies, outputs, agreements):
+        self.names = names
+        self.latencies = latencies
+        self.outputs = outputs
+        self.agreements = agreements
+
+    @property
+    def nRows(self):
+        return len(self.latencies)
+
+    def summary(self, i):
+        """Return the latencySummary of model i, 0 or 1."""
+        return latencySummary(self.latencies[:, i])
+
+    def slowest(self, n=DEFAULT_SLOWEST):
+        """Return the indices of the n rows that took longest to score with
+        either model, slowest first."""
+        order = np.argsort(-self.latencies.max(axis=1), kind="stable")
+        return order[:n]
+
+    def disagreeing(self):
+        """Return a boolean array telling which rows differ in any compared field."""
+        agree = np.ones(self.nRows, dtype=bool)
+        for agreement in self.agreements:
+            agree &= agreement.agree
+        return ~agree
+
+    def format(self, slowest=DEFAULT_SLOWEST):
+        """Return lines of text reporting the comparison."""
+        lines = []
+        for i, name in enumerate(self.names):
+            summary = self.summary(i)
+            if not summary["rows"]:
+                continue
+            lines.append("{0}: {1:.0f} rows/s, latency mean {2:.3f} ms, p50 {3:.3f} ms, p95 {4:.3f} ms, "
+                         "p99 {5:.3f} ms, max {6:.3f} ms".format(
+                             name, summary["rowsPerSecond"], 1000 * summary["mean"], 1000 * summary["p50"],
+                             1000 * summary["p95"], 1000 * summary["p99"], 1000 * summary["max"]))
+        for agreement in self.agreements:
+            line = "{0} vs {1}: {2:.2%} agree".format(agreement.fields[0], agreement.fields[1], agreement.rate)
+            if agreement.maxAbsDifference is not None:
+                line += ", mean |difference| {0:.4g}, max {1:.4g}".format(agreement.meanAbsDifference,
+                                                                        agreement.maxAbsDifference)
+            lines.append(line)
+            if agreement.discrete and agreement.rate < 1:
+                # the most frequent pairs of differing values
+                confusion = agreement.confusion
+                pairs = sorted(((confusion[i, j], i, j) for i, j in zip(*np.nonzero(confusion)) if i != j),
+                               key=lambda pair: -pair[0])
+                for count, i, j in pairs[:5]:
+                    lines.append("- {0} rows: {1} vs {2}".format(count, agreement.labels[i], agreement.labels[j]))
+        if slowest and self.nRows:
+            rows = ", ".join("{0} ({1:.3f} ms)".format(i, 1000 * self.latencies[i].max())
+                             for i in self.slowest(slowest))
+            lines.append("Slowest rows: " + rows)
+        return lines
+
+def compareModels(modelA, modelB, X, columns, categories=None, names=None, fields=None,
+                  warmup=DEFAULT_WARMUP, tolerance=1e-9, progress=None):
+    """Score the rows of the 2-D array X, whose columns are named by columns,
+    with modelA and modelB one row at a time, alternating which model goes
+    first, and return a Comparison of their latencies and predictions.
+
+    categories are the values of categorical columns, as for InputAdapter;
+    names those of the models (see multi.modelNames); fields the pairs of
+    output fields to compare (see pairFields); tolerance the relative
+    difference up to which numeric outputs agree. The first warmup rows are
+    scored by both models before timing starts. progress, if given, is
+    called with the fraction of rows scored; an exception raised from it
+    stops the comparison."""
+    models = (modelA, modelB)
+    names = modelNames(models, names)
+    pairs = pairFields(modelA, modelB, fields)
+    inputs = [list(InputAdapter(model, columns, categories).records(X)) for model in models]
+    nRows = len(inputs[0])
+    for i in range(min(warmup, nRows)):
+        for model, rows in zip(models, inputs):
+            model.predict(rows[i])
+    latencies = np.zeros((nRows, 2))
+    results = ([None] * nRows, [None] * nRows)
+    clock = time.perf_counter
+    step = max(1, nRows // 100)
+    for i in range(nRows):
+        for k in ((0, 1) if i % 2 == 0 else (1, 0)):
+            start = clock()
+            result = models[k].predict(inputs[k][i])
+            latencies[i, k] = clock() - start
+            results[k][i] = _outputs(models[k], result)
+        if progress is not None and (i % step == 0 or i == nRows - 1):
+            progress((i + 1) / nRows)
+    outputs = [{name: [result.get(name) for result in modelResults] for name, _ in model.outputFields}
+               for model, modelResults in zip(models, results)]
+    agreements = [Agreement(a, b, outputs[0][a], outputs[1][b],
+                            _isDiscrete(modelA, a, outputs[0][a]) or _isDiscrete(modelB, b, outputs[1][b]),
+                            tolerance)
+                  for a, b in pairs]
+    return Comparison(names, latencies, outputs, agreements)
@@ -0,0 +1,65 @@
+"""Pools of titus engines for scoring a PFA model from several threads.
+
+A titus PFAEngine holds mutable state, its cells, pools and random number
+generator, so one engine must not score in two threads at once. An
+EnginePool holds several engines built from one compiled document (titus's
+multiplicity, see ScoringModel.fromPFA) and lends each to one thread at a
+time.
+
+State of the engines of a pool follows the PFA document:
+
+- cells and pools declared "shared" are a single object for all engines;
+  titus locks them on every update, so updates from any engine are seen by
+  all others and nothing needs merging;
+- all other cells and pools are isolated: each engine starts from the
+  initial values in the document and only sees its own updates, which are
+  never merged. Models that write such state give results depending on the
+  engine that scored a row; build them with a single engine;
+- each engine has its own random number generator; with a randseed in the
+  document the engines get distinct, reproducible seeds derived from it.
+"""
+import queue
+from contextlib import contextmanager
+
+class EnginePool(object):
+    """Lends the engines of a PFA model to one thread at a time.
+
+    checkout waits for a free engine and checkin returns it; the engine
+    context manager does both. Engines are handed out last in, first out,
+    so a lightly loaded pool keeps using the same, warm engine."""
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self._free = queue.LifoQueue()
+        for engine in reversed(self.engines):
+            self._free.put(engine)
+
+    def __len__(self):
+        return len(self.engines)
+
+    @property
+    def nFree(self):
+        """Number of engines not checked out."""
+        return self._free.qsize()
+
+    def checkout(self, timeout=None):
+        """Return a free engine, waiting at most timeout seconds, forever by
+        default, for one to be checked in; raises RuntimeError on timeout."""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError("No PFA engine became free within {0} seconds".format(timeout))
+
+    def checkin(self, engine):
+        """Return engine, obtained from checkout, to the pool."""
+        if not any(engine is own for own in self.engines):
+            raise ValueError("Engine does not belong to this pool")
+        self._free.put(engine)
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """Context manager checking out an engine and checking it in on exit."""
+        engine = self.checkout(timeout)
+        try:
+            yield engine
+        finally:
+            self.checkin(engine)
@@ -0,0 +1,182 @@
+import os
+import time
+import shlex
+import logging
+import threading
+import weakref
+
+log = logging.getLogger(__name__)
+
+# Seconds the JVM is kept running after the last PMML model is released
+IDLE_TIMEOUT = 300
+# Environment variable with the options of the process-wide gateway's JVM, e.g. "-Xmx4g"
+ENV_VARIABLE = "ORANGE_SCORING_JAVA_OPTS"
+
+class PMMLGateway(object):
+    """Process-wide manager of the JVM in which pypmml scores PMML models.
+
+    All PMML models are loaded into a single JVM, started on first use with
+    javaOpts (e.g. ["-Xmx4g"]) as extra JVM options. A model is unloaded
+    from the JVM when the ScoringModel registered for it is garbage-collected,
+    and the JVM is shut down after idleTimeout seconds without any loaded
+    model. A later load starts it again."""
+    def __init__(self, javaOpts=None, idleTimeout=IDLE_TIMEOUT):
+        self.javaOpts = javaOpts
+        self.idleTimeout = idleTimeout
+        self.coldStart = None
+        # id of the JVM's process, read on start
+        self.pid = None
+        self.liveModels = 0
+        self._running = False
+        self._idleTimer = None
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Start the JVM unless it is already running."""
+        from pypmml.base import PMMLContext
+        with self._lock:
+            if self._running:
+                return
+            started = time.perf_counter()
+            PMMLContext.getOrCreate(java_opts=self.javaOpts)
+            self.coldStart = time.perf_counter() - started
+            self._running = True
+            self.pid = self._readPid()
+            log.info("Started JVM for PMML models in %.2f s with options %s", self.coldStart, self.javaOpts or [])
+
+    @staticmethod
+    def _readPid():
+        from pypmml.base import PMMLContext
+        try:
+            # the name of the JVM is "pid@host", also in Java 8
+            bean = PMMLContext.getOrCreate().call_java_static_func("java.lang.management.ManagementFactory",
+                                                                   "getRuntimeMXBean")
+            return int(bean.getName().split("@")[0])
+        except Exception:  # pylint: disable=broad-except
+            log.debug("Could not read the process id of the JVM", exc_info=True)
+            return None
+
+    def load(self, pmmlDoc):
+        """Load a pypmml Model from the PMML document into the shared JVM."""
+        from pypmml import Model
+        with self._lock:
+            self._cancelIdleTimer()
+            self.start()
+            return Model.fromString(pmmlDoc)
+
+    def register(self, scoringModel):
+        """Keep the JVM alive while scoringModel is; unload its pypmml model
+        from the JVM when scoringModel is garbage-collected."""
+        with self._lock:
+            self.liveModels += 1
+        weakref.finalize(scoringModel, self._release, scoringModel.model)
+
+    def _release(self, model):
+        with self._lock:
+            if self._running:
+                try:
+                    model._pc.detach(model._java_model)
+                    model._pc = None
+                except Exception:  # pylint: disable=broad-except
+                    log.debug("Could not detach PMML model from the JVM", exc_info=True)
+            self.liveModels -= 1
+            if self.liveModels == 0 and self._running and self.idleTimeout is not None:
+                self._idleTimer = threading.Timer(self.idleTimeout, self._shutdownIfIdle)
+                self._idleTimer.daemon = True
+                self._idleTimer.start()
+
+    def _cancelIdleTimer(self):
+        if self._idleTimer is not None:
+            self._idleTimer.cancel()
+            self._idleTimer = None
+
+    def _shutdownIfIdle(self):
+        with self._lock:
+            if self.liveModels == 0:
+                self.shutdown()
+
+    def shutdown(self):
+        """Shut the JVM down; models still loaded in it can no longer score."""
+        from pypmml import Model
+        with self._lock:
+            self._cancelIdleTimer()
+            if self._running:
+                log.info("Shutting down JVM for PMML models: %s", formatStats(self.stats()))
+                Model.close()
+                self._running = False
+                self.pid = None
+
+    def stats(self):
+        """Return a dict with the JVM cold start time in seconds, the number of
+        loaded models, the used, committed and maximal heap, the committed
+        memory outside the heap and the resident memory of the JVM's process
+        in bytes, and its options."""
+        stats = {"running": self._running, "coldStart": self.coldStart, "liveModels": self.liveModels,
+                 "javaOpts": list(self.javaOpts or []), "heapUsed": None, "heapCommitted": None,
+                 "heapMax": None, "nonHeapCommitted": None, "resident": None}
+        if self._running:
+            from pypmml.base import PMMLContext
+            try:
+                context = PMMLContext.getOrCreate()
+                runtime = context.call_java_static_func("java.lang.Runtime", "getRuntime")
+                stats["heapCommitted"] = runtime.totalMemory()
+                stats["heapUsed"] = stats["heapCommitted"] - runtime.freeMemory()
+                stats["heapMax"] = runtime.maxMemory()
+                memory = context.call_java_static_func("java.lang.management.ManagementFactory", "getMemoryMXBean")
+                stats["nonHeapCommitted"] = memory.getNonHeapMemoryUsage().getCommitted()
+            except Exception:  # pylint: disable=broad-except
+                log.debug("Could not read JVM heap size", exc_info=True)
+            if self.pid is not None:
+                stats["resident"] = residentBytes(self.pid)
+        return stats
+
+def residentBytes(pid):
+    """Return the resident memory of process pid in bytes, read from /proc
+    or with psutil, if installed, or None if it cannot be read."""
+    try:
+        with open("/proc/{0}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        return psutil.Process(pid).memory_info().rss
+    except psutil.Error:
+        return None
+
+def formatStats(stats):
+    """Return a line of text describing the stats of a PMMLGateway."""
+    if not stats["running"]:
+        return "JVM not running"
+    megabytes = lambda value: "?" if value is None else "{0:.0f} MB".format(value / 2 ** 20)
+    return "started in {0:.2f} s, {1} model(s), heap {2} used of {3}, {4} resident".format(
+        stats["coldStart"], stats["liveModels"], megabytes(stats["heapUsed"]), megabytes(stats["heapMax"]),
+        megabytes(stats["resident"]))
+
+_gateway = None
+
+def pmmlGateway():
+    """Return the process-wide PMMLGateway. Its JVM options are read from
+    the environment variable ORANGE_SCORING_JAVA_OPTS unless set with
+    configure."""
+    global _gateway
+    if _gateway is None:
+        _gateway = PMMLGateway(shlex.split(os.environ.get(ENV_VARIABLE, "")) or None)
+    return _gateway
+
+def configure(javaOpts=None, idleTimeout=IDLE_TIMEOUT):
+    """Set the JVM options, e.g. ["-Xmx4g"], and idle timeout of the
+    process-wide PMMLGateway; raises RuntimeError if its JVM is running,
+    as the options only apply when it starts."""
+    gateway = pmmlGateway()
+    with gateway._lock:
+        if gateway._running and list(javaOpts or []) != list(gateway.javaOpts or []):
+            raise RuntimeError("The JVM for PMML models is already running; options apply when it starts")
+        gateway.javaOpts = javaOpts
+        gateway.idleTimeout = idleTimeout
+    return gateway
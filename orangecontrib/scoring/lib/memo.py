@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+# Default bound on the number of rows whose predictions a RowMemo keeps
+DEFAULT_MAX_ROWS = 100000
+# PFA library functions whose results are not determined by their arguments
+NONDETERMINISTIC_FUNCTIONS = ("rand.", "a.shuffle", "model.cluster.randomSeeds")
+
+class _StatefulNode(object):
+    """Partial function for EngineConfig.collect picking the nodes of a PFA
+    document that write its state or draw random numbers."""
+    def isDefinedAt(self, node):
+        from titus import pfaast
+        if isinstance(node, (pfaast.CellTo, pfaast.PoolTo, pfaast.PoolDel)):
+            return True
+        return isinstance(node, (pfaast.Call, pfaast.FcnRef, pfaast.FcnRefFill)) and \
+            node.name.startswith(NONDETERMINISTIC_FUNCTIONS)
+
+    def __call__(self, node):
+        return node
+
+def isStateless(model):
+    """Return True if the prediction of model for a row depends only on the row:
+    PMML models and PFA models with the map method that neither write cells
+    or pools nor draw random numbers."""
+    if model.type == "PMML":
+        return True
+    if model.type == "PFA":
+        return model.method.lower() == "map" and not model.model.config.collect(_StatefulNode())
+    return False
+
+def uniqueRows(X):
+    """Return the keys of the distinct rows of the 2-D array X, the index of
+    the first occurrence of each and, for each row, the index of its key.
+
+    Rows of numeric arrays are compared by their bytes in a single vectorized
+    np.unique over the rows viewed as opaque scalars; rows of object arrays
+    are compared as tuples."""
+    if X.dtype.hasobject or X.shape[1] == 0:
+        index = {}
+        first = []
+        inverse = np.empty(len(X), dtype=np.intp)
+        for i, row in enumerate(X):
+            key = tuple(row)
+            j = index.setdefault(key, len(index))
+            if j == len(first):
+                first.append(i)
+            inverse[i] = j
+        return list(index), np.array(first, dtype=np.intp), inverse
+    X = np.ascontiguousarray(X)
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    unique, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return [row.tobytes() for row in unique], first, inverse
+
+class RowMemo(object):
+    """Scores each distinct row of a batch once and remembers the predictions
+    of the last maxRows distinct rows across batches.
+
+    Memoization is only correct for models whose predictions depend on the
+    row alone (see isStateless); for other models the constructor raises
+    NotImplementedError. predictBatch has the interface of
+    ScoringModel.predictBatch and scores in this process."""
+    def __init__(self, model, maxRows=DEFAULT_MAX_ROWS):
+        if not isStateless(model):
+            raise NotImplementedError("Scoring duplicate rows once is only supported for PMML models and "
+                                      "PFA models that do not write cells or pools or use random numbers.")
+        self.model = model
+        self.outputFields = model.outputFields
+        self.maxRows = maxRows
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        # predictions are remembered for rows of one dtype and set of columns
+        self._layout = None
+
+    def clear(self):
+        self._memo.clear()
+
+    def predictBatch(self, X, columns):
+        if sp.issparse(X):
+            # rows are compared by the columns the model reads
+            X, columns = self.model.inputAdapter(columns).densify(X)
+        X = np.asarray(X)
+        names = [name for name, _ in self.outputFields]
+        layout = (X.dtype.str, tuple(columns))
+        if layout != self._layout:
+            self._memo.clear()
+            self._layout = layout
+        if not len(X):
+            return {name: [] for name in names}
+
+        keys, first, inverse = uniqueRows(X)
+        results = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            result = self._memo.get(key)
+            if result is None:
+                missing.append(i)
+            else:
+                self._memo.move_to_end(key)
+                results[i] = result
+        if missing:
+            batch = self.model.predictBatch(X[first[missing]], columns)
+            for k, i in enumerate(missing):
+                results[i] = tuple(batch[name][k] for name in names)
+                self._memo[keys[i]] = results[i]
+            while len(self._memo) > self.maxRows:
+                self._memo.popitem(last=False)
+        self.misses += len(missing)
+        self.hits += len(X) - len(missing)
+
+        columnsOut = {}
+        for j, name in enumerate(names):
+            values = np.empty(len(results), dtype=object)
+            for i, result in enumerate(results):
+                values[i] = result[j]
+            columnsOut[name] = values[inverse].tolist()
+        return columnsOut
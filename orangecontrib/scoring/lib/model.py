@@ -1,6 +1,10 @@
 import json
+import logging
+from orangecontrib.scoring.lib import timing
 from orangecontrib.scoring.lib.utils import getPFAField
 
+log = logging.getLogger(__name__)
+
 class ScoringModel(object):
     def __init__(self, model, type):
         self.model = model
@@ -11,39 +15,239 @@ class ScoringModel(object):
         self.method = None
         self.pfaInputIsRecord = False
         self.pfaOutputIsRecord = False
+        # Source document of the model and its file extension, if known; lets
+        # other processes rebuild an equivalent model
+        self.document = None
+        self.documentExt = None
+        # Name of the model, e.g. the name of its file, if known
+        self.name = None
+        # NumPy evaluator of a PFA model (see vectorize.compilePFA), None if
+        # the model is scored by titus alone
+        self.vectorized = None
+        # InputAdapters of the column names scored by titus, see inputAdapter
+        self._adapters = {}
+        # EnginePool lending the titus engines of a PFA model to scoring threads;
+        # model is its first engine
+        self.engines = None
 
-        if type == "PMML":
-            self.inputFields = [(f.name, f.dataType) for f in model.inputFields]
-            self.outputFields = [(f.name, f.dataType) for f in model.outputFields]
-            self.targetFields = [(f.name, f.dataType) for f in model.targetFields]
+        with timing.phase("describeModel"):
+            if type == "PMML":
+                self.inputFields = [(f.name, f.dataType) for f in model.inputFields]
+                self.outputFields = [(f.name, f.dataType) for f in model.outputFields]
+                self.targetFields = [(f.name, f.dataType) for f in model.targetFields]
+
+            if type == "PFA":
+                if (model.config.method).lower() != 'map':
+                    raise NotImplementedError("Only 'map' method for PFA is supported. {0} is not currently supported.".format(model.config.method)) 
+                self.method = model.config.method
+                pfaInput = json.loads(model.config.input.toJson())
+                pfaOutput = json.loads(model.config.output.toJson())
+                self.inputFields, self.pfaInputIsRecord = getPFAField(pfaInput, "input")
+                self.outputFields, self.pfaOutputIsRecord = getPFAField(pfaOutput, "output")
 
         if type == "PFA":
-            if (model.config.method).lower() != 'map':
-                raise NotImplementedError("Only 'map' method for PFA is supported. {0} is not currently supported.".format(model.config.method)) 
-            self.method = model.config.method
-            pfaInput = json.loads(model.config.input.toJson())
-            pfaOutput = json.loads(model.config.output.toJson())
-            self.inputFields, self.pfaInputIsRecord = getPFAField(pfaInput, "input")
-            self.outputFields, self.pfaOutputIsRecord = getPFAField(pfaOutput, "output")
+            from orangecontrib.scoring.lib.engines import EnginePool
+            self.engines = EnginePool([model])
+            from orangecontrib.scoring.lib.vectorize import compilePFA
+            with timing.phase("vectorize"):
+                self.vectorized = compilePFA(model, self.outputFields, self.pfaOutputIsRecord)
 
     @classmethod
-    def fromPMML(cls, pmmlDoc):
-        from pypmml import Model
-        model = Model.fromString(pmmlDoc)
-        return cls(model, "PMML")
+    def fromPMML(cls, pmmlDoc, native=True, progress=None):
+        """Build a model from a PMML document. Documents covered by the NumPy
+        evaluator (see pmml.compilePMML) are scored in this process unless
+        native is False; others are loaded into pypmml's JVM.
+
+        progress, if given, is called with the fraction of parsing done."""
+        from orangecontrib.scoring.lib.pmml import compilePMML
+        model = None
+        if native:
+            with timing.phase("parse"):
+                model = compilePMML(pmmlDoc, progress)
+        if model is not None:
+            scoringModel = cls(model, "PMML")
+            scoringModel.document = pmmlDoc
+            return scoringModel
+        from orangecontrib.scoring.lib.gateway import pmmlGateway
+        gateway = pmmlGateway()
+        with timing.phase("parse"):
+            model = gateway.load(pmmlDoc)
+        if progress is not None:
+            progress(1.0)
+        scoringModel = cls(model, "PMML")
+        scoringModel.document = pmmlDoc
+        gateway.register(scoringModel)
+        return scoringModel
 
     @classmethod
-    def fromPFA(cls, pfaDoc, ext):
+    def fromPFA(cls, pfaDoc, ext, cache=None, progress=None, engines=1):
+        """Build a model from a PFA document. If cache (a ModelCache) is given,
+        the Python code titus generates for the document is kept there and
+        reused when the same document is loaded again.
+
+        The document is compiled once into the given number of titus engines,
+        so that as many threads can score with the model at once; see
+        engines.EnginePool for how their cells and pools are shared.
+
+        progress, if given, is called with the fraction of parsing and
+        compiling done."""
+        import titus.reader
         from titus.genpy import PFAEngine
-        if ext in (".yml", ".yaml"):
-            engine = PFAEngine.fromYaml(pfaDoc)[0]
-        else:
-            engine = PFAEngine.fromJson(pfaDoc)[0]
-        return cls(engine, "PFA")
+        with timing.phase("parse"):
+            if ext in (".yml", ".yaml"):
+                engineConfig = titus.reader.yamlToAst(pfaDoc)
+            else:
+                engineConfig = titus.reader.jsonToAst(pfaDoc)
+        if progress is not None:
+            progress(0.5)
+        with timing.phase("compile"):
+            if cache is None:
+                pfaEngines = PFAEngine.fromAst(engineConfig, multiplicity=engines)
+            else:
+                from orangecontrib.scoring.lib.cache import pfaEnginesFromCache
+                pfaEngines = pfaEnginesFromCache(engineConfig, cache.key(pfaDoc, "PFA", ext), cache, engines)
+        scoringModel = cls(pfaEngines[0], "PFA")
+        if engines > 1:
+            from orangecontrib.scoring.lib.engines import EnginePool
+            scoringModel.engines = EnginePool(pfaEngines)
+        scoringModel.document = pfaDoc
+        scoringModel.documentExt = ext
+        return scoringModel
+
+    @classmethod
+    def fromDocument(cls, type, document, ext=None):
+        """Build a model of the given type ("PMML" or "PFA") from its source document."""
+        if type == "PFA":
+            return cls.fromPFA(document, ext)
+        if type == "PMML":
+            return cls.fromPMML(document)
+        raise RuntimeError("Attribute type of ScoringModel class can be PFA or PMML.")
+
+    @property
+    def usesJVM(self):
+        """True for PMML models scored by pypmml in the JVM (see gateway)."""
+        from orangecontrib.scoring.lib.pmml import NativePMML
+        return self.type == "PMML" and not isinstance(self.model, NativePMML)
 
     def predict(self, data):
         if self.type == "PFA":
-            return self.model.action(data)
+            with self.engines.engine() as engine:
+                return engine.action(data)
         if self.type == "PMML":
             return self.model.predict(data)
         raise RuntimeError("Attribute type of ScoringModel class can be PFA or PMML.")
+
+    def predictBatch(self, X, columns):
+        """Score every row of the 2-D array X whose columns are named by columns.
+
+        Returns a dict mapping each output field name to the list of its values,
+        one value per row of X. X may be a scipy sparse matrix."""
+        import scipy.sparse as sp
+        if sp.issparse(X):
+            return self._predictBatchSparse(X, columns)
+        if self.type == "PFA":
+            return self._predictBatchPFA(X, columns)
+        if self.type == "PMML":
+            return self._predictBatchPMML(X, columns)
+        raise RuntimeError("Attribute type of ScoringModel class can be PFA or PMML.")
+
+    def datumBuilder(self, columns):
+        """Return a function converting a row of values named by columns into
+        the datum expected by predict."""
+        if self.type == "PFA":
+            name, dataType = self.inputFields[0]
+            if not self.pfaInputIsRecord:
+                if "array" in dataType:
+                    return list
+                return lambda row: row[0]
+            if len(self.inputFields) == 1 and dataType == "array":
+                return lambda row: {name: list(row)}
+        return lambda row: dict(zip(columns, row))
+
+    def inputAdapter(self, columns):
+        """Return the InputAdapter converting arrays with the given columns
+        into the inputs of the model; adapters are built once per columns."""
+        key = tuple(columns)
+        adapter = self._adapters.get(key)
+        if adapter is None:
+            from orangecontrib.scoring.lib.adapter import InputAdapter
+            adapter = self._adapters[key] = InputAdapter(self, columns)
+        return adapter
+
+    def _predictBatchSparse(self, X, columns):
+        # only the columns read by the model are densified, a block of rows at a time
+        adapter = self.inputAdapter(columns)
+        X = X.tocsr()
+        nRows = X.shape[0]
+        blockSize = adapter.blockSize()
+        result = {name: [] for name, _ in self.outputFields}
+        for start in range(0, nRows, blockSize):
+            with timing.phase("buildInput", min(blockSize, nRows - start)):
+                block, names = adapter.densify(X[start:start + blockSize])
+            batch = self.predictBatch(block, names)
+            for name, values in result.items():
+                values.extend(batch[name])
+        return result
+
+    def _predictBatchPFA(self, X, columns):
+        from orangecontrib.scoring.lib.vectorize import Unsupported
+        if self.vectorized is not None:
+            try:
+                with timing.phase("predict", len(X)):
+                    return self.vectorized.predictBatch(X, columns)
+            except Unsupported as ex:
+                # e.g. int overflows, which titus reports
+                log.debug("Batch is scored with titus: %s", ex)
+            except Exception:  # pylint: disable=broad-except
+                # titus scores the batch again and raises its own error, if
+                # any; if it does not, the evaluator is wrong and not used again
+                result = self._predictBatchTitus(X, columns)
+                log.warning("Vectorized scoring of a PFA model failed, scoring it with titus from now on",
+                            exc_info=True)
+                self.vectorized = None
+                return result
+        return self._predictBatchTitus(X, columns)
+
+    def _predictBatchTitus(self, X, columns):
+        names = [name for name, _ in self.outputFields]
+        nRows = len(X)
+        with timing.phase("buildInput", nRows):
+            records = self.inputAdapter(columns).records(X)
+            if timing.isEnabled():
+                # build the inputs up front to time them apart from the engine
+                records = list(records)
+        with timing.phase("predict", nRows), self.engines.engine() as engine:
+            action = engine.action
+            if not self.pfaOutputIsRecord:
+                return {names[0]: [action(datum) for datum in records]}
+            columnsOut = {name: [] for name in names}
+            appends = [(name, columnsOut[name].append) for name in names]
+            for datum in records:
+                result = action(datum)
+                for name, append in appends:
+                    append(result[name])
+            return columnsOut
+
+    def _predictBatchPMML(self, X, columns):
+        import numpy as np
+        from orangecontrib.scoring.lib.pmml import NativePMML
+        if isinstance(self.model, NativePMML):
+            return self.model.predictBatch(X, columns)
+        # The whole chunk goes to pypmml as one JSON document in the "split"
+        # layout, so it is scored with a single call into the JVM. The JSON is
+        # built here rather than by pypmml's DataFrame path, which rounds inputs
+        # to 10 digits and lets pandas re-infer the types of the outputs.
+        X = np.asarray(X)
+        with timing.phase("buildInput", len(X)):
+            rows = X.tolist()
+            if X.dtype.kind == "f":
+                for i, j in zip(*np.nonzero(np.isnan(X))):
+                    rows[i][j] = None
+            document = json.dumps({"columns": list(columns), "data": rows})
+        with timing.phase("predict", len(X)):
+            output = self.model.predict(document)
+        with timing.phase("decodeOutput", len(X)):
+            result = json.loads(output)
+            index = {name: i for i, name in enumerate(result["columns"])}
+            return {name: [row[index[name]] for row in result["data"]] if name in index else [None] * len(rows)
+                    for name, _ in self.outputFields}
@@ -0,0 +1,136 @@
+"""Scoring the same rows with several models in one pass.
+
+The input is prepared once for all models: categorical columns are turned
+into their values once for every distinct set of columns that models read as
+strings (see adapter.InputAdapter.prepare), not once per model. Rows are then
+scored chunk by chunk, each chunk by every model while it is in the cache, or
+by several models at a time on a pool of threads.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from orangecontrib.scoring.lib import timing
+from orangecontrib.scoring.lib.adapter import InputAdapter
+from orangecontrib.scoring.lib.results import ResultAssembler, memmapArray
+
+def modelNames(models, names=None):
+    """Return distinct names of models: the given names, else the models'
+    own, else model1, model2, ...; repeated names get a numeric suffix."""
+    result = []
+    seen = set()
+    for i, model in enumerate(models):
+        name = (names[i] if names else None) or model.name or "model{0}".format(i + 1)
+        unique, n = name, 1
+        while unique in seen:
+            n += 1
+            unique = "{0} ({1})".format(name, n)
+        seen.add(unique)
+        result.append(unique)
+    return result
+
+def namespaced(modelName, fieldName):
+    """Return the name of the output fieldName of the model modelName."""
+    return "{0}.{1}".format(modelName, fieldName)
+
+class MultiScorer(object):
+    """Scores the rows of an array with each of models.
+
+    Output fields of every model are prefixed with the model's name (see
+    modelNames and namespaced), so the outputs of all models can be put
+    into one table."""
+    def __init__(self, models, names=None):
+        self.models = list(models)
+        self.names = modelNames(self.models, names)
+        self.outputFields = [(namespaced(modelName, name), dataType)
+                             for modelName, model in zip(self.names, self.models)
+                             for name, dataType in model.outputFields]
+
+    def prepare(self, X, columns, categories=None):
+        """Return a pair (X, columns) for each model, to be passed to its
+        predictBatch; models reading the same columns as strings share one
+        prepared array."""
+        prepared = {}
+        result = []
+        for model in self.models:
+            adapter = InputAdapter(model, columns, categories)
+            key = tuple(j for j, _ in adapter.labelled)
+            if key not in prepared:
+                prepared[key] = adapter.prepare(X)
+            result.append(prepared[key])
+        return result
+
+    def iterPredict(self, X, columns, categories=None, workers=1, chunkSize=1000):
+        """Score X with every model in chunks of chunkSize rows and yield
+        (index of model, start, stop, batch) for each scored chunk.
+
+        With workers > 1, chunks are scored by that many threads; each model
+        scores one chunk at a time, or as many as the engines of a PFA model
+        built with several (see engines.EnginePool).
+        Closing the generator cancels the chunks not yet started."""
+        nRows = X.shape[0]
+        with timing.phase("buildInput", nRows):
+            inputs = self.prepare(X, columns, categories)
+        tasks = [(i, start, min(start + chunkSize, nRows))
+                 for start in range(0, nRows, chunkSize) for i in range(len(self.models))]
+        slots = [len(model.engines) if model.engines is not None else 1 for model in self.models]
+        if workers <= 1 or sum(slots) == 1:
+            for i, start, stop in tasks:
+                Xi, columnsi = inputs[i]
+                yield i, start, stop, self.models[i].predictBatch(Xi[start:stop], columnsi)
+            return
+
+        locks = [threading.BoundedSemaphore(n) for n in slots]
+
+        def score(i, start, stop):
+            Xi, columnsi = inputs[i]
+            with locks[i]:
+                return i, start, stop, self.models[i].predictBatch(Xi[start:stop], columnsi)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        # chunk by chunk, so the threads mostly score different models
+        pending = {executor.submit(score, *task) for task in tasks}
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def assemblers(self, nRows, scratch=None):
+        """Return a ResultAssembler for each model, all storing into the
+        columns of one (nRows, len(outputFields)) array, and the array; the
+        array is a memmapArray in the directory scratch, if given."""
+        shape = (nRows, len(self.outputFields))
+        Y = np.empty(shape) if scratch is None else memmapArray(shape, scratch)
+        assemblers = []
+        column = 0
+        for modelName, model in zip(self.names, self.models):
+            n = len(model.outputFields)
+            assemblers.append(ResultAssembler(model.outputFields, nRows, Y[:, column:column + n],
+                                              [namespaced(modelName, name) for name, _ in model.outputFields]))
+            column += n
+        return assemblers, Y
+
+    def predictBatch(self, X, columns, categories=None, workers=1, chunkSize=1000):
+        """Score X with every model; returns a dict mapping each namespaced
+        output field to the list of its values, one value per row of X."""
+        nRows = X.shape[0]
+        chunks = {}
+        batches = self.iterPredict(X, columns, categories, workers, chunkSize)
+        try:
+            for i, start, _, batch in batches:
+                chunks[(i, start)] = batch
+        finally:
+            batches.close()
+        result = {}
+        for i, (modelName, model) in enumerate(zip(self.names, self.models)):
+            for name, _ in model.outputFields:
+                values = result[namespaced(modelName, name)] = []
+                for start in range(0, nRows, chunkSize):
+                    values.extend(chunks[(i, start)][name])
+        return result
@@ -0,0 +1,179 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.results import ResultAssembler
+
+# Number of shards handed to each worker; more shards give finer progress
+# reports at the cost of more round-trips between processes
+SHARDS_PER_WORKER = 4
+
+# Model of a worker process, built once by _initWorker
+_worker = {}
+
+def _initWorker(modelType, document, ext):
+    _worker["model"] = ScoringModel.fromDocument(modelType, document, ext)
+
+def _scoreShard(shmName, shape, dtype, columns, start, stop):
+    shm = shared_memory.SharedMemory(name=shmName)
+    X = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        return start, stop, _worker["model"].predictBatch(X[start:stop], columns)
+    finally:
+        # the shared memory cannot be closed while an array uses its buffer
+        del X
+        shm.close()
+
+def _scoreRows(X, columns, start, stop):
+    return start, stop, _worker["model"].predictBatch(X, columns)
+
+def canRunParallel(model):
+    """Return True if model can be rebuilt in worker processes."""
+    return shared_memory is not None and model.document is not None
+
+class ScoringPool(object):
+    """Pool of worker processes, each of which rebuilds model from
+    model.document once and then scores the arrays it receives.
+
+    Numeric arrays are passed to the workers through shared memory; arrays
+    of Python objects, e.g. with string values, and the shards of sparse
+    matrices are pickled. Use the pool as
+    a context manager or call close when done."""
+    def __init__(self, model, workers=None):
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        # spawn rather than fork: the parent may hold Qt or JVM gateway threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initWorker, initargs=(model.type, model.document, model.documentExt))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def iterPredict(self, X, columns, shardSize):
+        """Split X into shards of shardSize rows and yield (start, stop, batch)
+        for every scored shard X[start:stop] in the order in which the shards
+        finish. Closing the generator cancels the shards not yet started."""
+        X = X.tocsr() if sp.issparse(X) else np.asarray(X)
+        nRows = X.shape[0]
+        columns = list(columns)
+        shm = None
+        if not sp.issparse(X) and not X.dtype.hasobject:
+            shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        pending = set()
+        try:
+            if shm is not None:
+                np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+                pending = {self.executor.submit(_scoreShard, shm.name, X.shape, X.dtype.str, columns,
+                                                start, min(start + shardSize, nRows))
+                           for start in range(0, nRows, shardSize)}
+            else:
+                pending = {self.executor.submit(_scoreRows, X[start:start + shardSize], columns,
+                                                start, min(start + shardSize, nRows))
+                           for start in range(0, nRows, shardSize)}
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            # shards that are already running still read the shared memory
+            wait(pending)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def predict(self, X, columns, shardSize=None):
+        """Score X and return the result in the form of ScoringModel.predictBatch."""
+        if shardSize is None:
+            shardSize = max(1, -(-X.shape[0] // (self.workers * SHARDS_PER_WORKER)))
+        shards = {start: batch for start, _, batch in self.iterPredict(X, columns, shardSize)}
+        return _mergeShards(self.model, [shards[start] for start in sorted(shards)])
+
+def predictParallel(model, X, columns, workers=None, chunkSize=1000, callback=None):
+    """Score the 2-D array X with a pool of worker processes.
+
+    The result has the same form as ScoringModel.predictBatch, with rows in
+    the order of X. callback, if given, is called with the number of rows
+    scored so far; an exception raised from it stops the scoring. See
+    iterPredict for the meaning of the other arguments."""
+    shards = {}
+    done = 0
+    batches = iterPredict(model, X, columns, workers, chunkSize)
+    try:
+        for start, stop, batch in batches:
+            shards[start] = batch
+            done += stop - start
+            if callback is not None:
+                callback(done)
+    finally:
+        batches.close()
+    return _mergeShards(model, [shards[start] for start in sorted(shards)])
+
+def predictToDisk(model, X, columns, directory=None, workers=None, chunkSize=1000, callback=None):
+    """Score the 2-D array X into a ResultAssembler whose predictions are
+    kept in a memory-mapped file in directory, the temporary directory by
+    default, so that they need not fit into memory.
+
+    Each shard is stored as soon as it is scored; the file is removed when
+    the assembler's Y and all arrays and tables built on it are released.
+    See predictParallel for the meaning of the other arguments."""
+    assembler = ResultAssembler.onDisk(model.outputFields, X.shape[0], directory)
+    batches = iterPredict(model, X, columns, workers, chunkSize)
+    try:
+        for start, stop, batch in batches:
+            assembler.add(start, batch)
+            if callback is not None:
+                callback(assembler.nScored)
+    finally:
+        batches.close()
+    return assembler
+
+def iterPredict(model, X, columns, workers=None, chunkSize=1000):
+    """Score the 2-D array X and yield (start, stop, batch) for every scored
+    shard X[start:stop] in the order in which the shards finish.
+
+    Shards are scored by a ScoringPool of the given number of workers, which
+    defaults to the number of CPUs. With a single worker, or when the model
+    cannot be rebuilt in another process, X is scored in this process in
+    chunks of chunkSize rows. Closing the generator stops the workers."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    nRows = X.shape[0]
+    if workers <= 1 or nRows <= chunkSize or not canRunParallel(model):
+        for start in range(0, nRows, chunkSize):
+            stop = min(start + chunkSize, nRows)
+            yield start, stop, model.predictBatch(X[start:stop], columns)
+        return
+
+    shardSize = max(chunkSize, -(-nRows // (workers * SHARDS_PER_WORKER)))
+    with ScoringPool(model, workers) as pool:
+        batches = pool.iterPredict(X, columns, shardSize)
+        try:
+            for shard in batches:
+                yield shard
+        finally:
+            batches.close()
+
+def _mergeShards(model, batches):
+    merged = {name: [] for name, _ in model.outputFields}
+    for batch in batches:
+        for name, values in merged.items():
+            values.extend(batch[name])
+    return merged
@@ -0,0 +1,1133 @@
+"""Native evaluation of PMML documents with NumPy.
+
+pypmml scores PMML models in a JVM. For documents built only from the
+elements below, compilePMML parses the document once into arrays and returns
+an evaluator scoring whole blocks of rows in this process, with the output
+fields and values pypmml gives:
+
+- RegressionModel with numeric and categorical predictors,
+- GeneralRegressionModel of the regression, generalLinear (identity link)
+  and multinomialLogistic types,
+- TreeModel with simple, set and compound (and, or, surrogate) predicates,
+- ClusteringModel with center-based clusters and (squared) Euclidean distance,
+- MiningModel segmentations of these models combined by averages, sums,
+  medians, majority votes or model chains, such as random forests and
+  boosted trees.
+
+Trees are flattened into arrays indexed by node and walked once per batch:
+each node tests only the rows that reach it. Missing output values are None,
+also those of integer fields, which pypmml reports as the smallest long.
+Documents using anything else, e.g. transformations or other model types,
+are left to pypmml.
+"""
+import re
+import sys
+import json
+import logging
+import operator
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# PMML data types of fields read by the evaluator
+NUMERIC_TYPES = ("double", "float", "integer")
+DATA_TYPES = NUMERIC_TYPES + ("string",)
+# Elements describing a model or a document that do not affect its predictions
+IGNORED_ELEMENTS = ("Extension", "Header", "MiningBuildTask", "ModelStats", "ModelExplanation",
+                    "ModelVerification")
+# Number of bytes of a document fed to the XML parser at once
+PARSE_BLOCK_SIZE = 1 << 20
+
+COMPARISONS = {
+    "equal": operator.eq,
+    "notEqual": operator.ne,
+    "lessThan": operator.lt,
+    "lessOrEqual": operator.le,
+    "greaterThan": operator.gt,
+    "greaterOrEqual": operator.ge,
+}
+
+def _ndtr(x):
+    from scipy.special import ndtr
+    return ndtr(x)
+
+# Normalizations of the results of regression models; the binary ones give the
+# probability of one of two categories of a classification
+BINARY_NORMALIZATIONS = {
+    "logit": lambda y: 1 / (1 + np.exp(-y)),
+    "probit": _ndtr,
+    "cloglog": lambda y: 1 - np.exp(-np.exp(y)),
+    "loglog": lambda y: np.exp(-np.exp(-y)),
+    "cauchit": lambda y: 0.5 + np.arctan(y) / np.pi,
+}
+REGRESSION_NORMALIZATIONS = {
+    "none": lambda y: y,
+    "softmax": BINARY_NORMALIZATIONS["logit"],
+    "logit": BINARY_NORMALIZATIONS["logit"],
+    "exp": np.exp,
+    "probit": _ndtr,
+    "cloglog": BINARY_NORMALIZATIONS["cloglog"],
+    "cauchit": BINARY_NORMALIZATIONS["cauchit"],
+}
+
+Field = namedtuple("Field", ("name", "dataType"))
+
+class Unsupported(Exception):
+    """An element of a PMML document which the native evaluator does not cover."""
+
+def _children(element, *tags):
+    return [child for child in element if child.tag in tags]
+
+def _child(element, tag):
+    children = _children(element, tag)
+    if len(children) > 1:
+        raise Unsupported("more than one {0} in {1}".format(tag, element.tag))
+    return children[0] if children else None
+
+def _checkChildren(element, allowed):
+    for child in element:
+        if child.tag not in allowed and child.tag not in IGNORED_ELEMENTS:
+            raise Unsupported("{0} in {1}".format(child.tag, element.tag))
+
+def _checkAttributes(element, allowed):
+    for name in element.attrib:
+        if name not in allowed:
+            raise Unsupported("attribute {0} of {1}".format(name, element.tag))
+
+def _valueOf(dataType, text):
+    """Convert the text of a value in a PMML document to a value of dataType."""
+    if dataType == "integer":
+        return int(float(text))
+    if dataType in NUMERIC_TYPES:
+        return float(text)
+    return text
+
+def _arrayValues(element, dataType):
+    """Return the values of an Array element converted to dataType."""
+    if element.get("type") not in ("int", "real", "string"):
+        raise Unsupported("Array of type {0}".format(element.get("type")))
+    tokens = re.findall(r'"((?:[^"\\]|\\.)*)"|(\S+)', element.text or "")
+    return [_valueOf(dataType, quoted.replace('\\"', '"') if quoted else plain) for quoted, plain in tokens]
+
+def _isNumeric(dataType):
+    return dataType in NUMERIC_TYPES
+
+def _argmax(probabilities):
+    """Index of the largest probability in each row, the first one on ties,
+    or -1 if the row has missing probabilities."""
+    index = np.argmax(np.where(np.isnan(probabilities), -np.inf, probabilities), axis=1)
+    index[np.isnan(probabilities).any(axis=1)] = -1
+    return index
+
+def _take(values, index):
+    """Pick values[index] for each row, None where index is -1."""
+    result = np.empty(len(index), dtype=object)
+    found = index >= 0
+    result[found] = np.asarray(values, dtype=object)[index[found]]
+    return result
+
+class _DataField(object):
+    __slots__ = ("name", "dataType", "values", "intervals")
+
+    def __init__(self, name, dataType, values=None, intervals=None):
+        self.name = name
+        self.dataType = dataType
+        # valid values of a categorical field, None if any value is valid
+        self.values = values
+        # (left, right, closure) triples of valid ranges of a numeric field
+        self.intervals = intervals or []
+
+    @classmethod
+    def parse(cls, element):
+        _checkChildren(element, ("Value", "Interval"))
+        _checkAttributes(element, ("name", "displayName", "optype", "dataType", "taxonomy", "isCyclic"))
+        dataType = element.get("dataType")
+        if dataType not in DATA_TYPES:
+            raise Unsupported("field {0} of type {1}".format(element.get("name"), dataType))
+        values = []
+        for value in _children(element, "Value"):
+            if value.get("property", "valid") != "valid":
+                raise Unsupported("{0} values of field {1}".format(value.get("property"), element.get("name")))
+            values.append(_valueOf(dataType, value.get("value")))
+        if values and element.get("optype") == "continuous":
+            raise Unsupported("values of continuous field {0}".format(element.get("name")))
+        intervals = []
+        for interval in _children(element, "Interval"):
+            if not _isNumeric(dataType):
+                raise Unsupported("intervals of field {0}".format(element.get("name")))
+            intervals.append((float(interval.get("leftMargin", "-inf")), float(interval.get("rightMargin", "inf")),
+                              interval.get("closure")))
+        return cls(element.get("name"), dataType, values or None, intervals)
+
+    def valid(self, values, missing):
+        """Return a mask of the values which are valid according to the field's
+        list of values or intervals."""
+        if self.values is not None:
+            if _isNumeric(self.dataType):
+                return np.isin(values, self.values)
+            valid = set(self.values)
+            return np.fromiter((value in valid for value in values), dtype=bool, count=len(values))
+        if self.intervals:
+            result = np.zeros(len(values), dtype=bool)
+            with np.errstate(invalid="ignore"):
+                for left, right, closure in self.intervals:
+                    leftTest = operator.le if closure in ("closedClosed", "closedOpen") else operator.lt
+                    rightTest = operator.le if closure in ("closedClosed", "openClosed") else operator.lt
+                    result |= leftTest(left, values) & rightTest(values, right)
+            return result | missing
+        return np.ones(len(values), dtype=bool)
+
+class _Inputs(object):
+    """Columns of a batch of rows: values of each field, with NaN or None
+    where missing, and masks of missing values."""
+    def __init__(self, nRows):
+        self.nRows = nRows
+        self.values = {}
+        self.missing = {}
+
+    def add(self, name, values, missing):
+        self.values[name] = values
+        self.missing[name] = missing
+
+def _column(values, dataType):
+    """Convert a column of raw values into the representation of dataType and
+    return it with its mask of missing values."""
+    if _isNumeric(dataType):
+        if values.dtype.kind in "biuf":
+            values = values.astype(float)
+        else:
+            values = np.array([np.nan if value is None else value for value in values], dtype=float)
+        return values, np.isnan(values)
+    result = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values.tolist()):
+        result[i] = None if value is None or value != value else str(value)
+    return result, np.equal(result, None)
+
+class _Scope(object):
+    """Fields a model can refer to: those of the data dictionary and outputs of
+    earlier segments of a model chain."""
+    def __init__(self, dataFields, treatments):
+        self.dataFields = dataFields
+        # (invalidValueTreatment, missingValueReplacement) of each input field
+        # in the outermost mining schema
+        self.treatments = treatments
+
+    def field(self, name):
+        if name not in self.dataFields:
+            raise Unsupported("unknown field {0}".format(name))
+        return self.dataFields[name]
+
+    def extended(self, fields):
+        dataFields = dict(self.dataFields)
+        dataFields.update((field.name, field) for field in fields)
+        return _Scope(dataFields, self.treatments)
+
+def _miningSchema(element, scope, outermost=False):
+    """Return the active fields and target fields of a MiningSchema, with
+    the treatments of invalid and missing values of the active fields."""
+    active = []
+    targets = []
+    treatments = {}
+    _checkChildren(element, ("MiningField",))
+    for miningField in _children(element, "MiningField"):
+        _checkAttributes(miningField, ("name", "usageType", "optype", "importance", "invalidValueTreatment",
+                                       "missingValueReplacement", "missingValueTreatment"))
+        field = scope.field(miningField.get("name"))
+        usage = miningField.get("usageType", "active")
+        if usage in ("target", "predicted"):
+            targets.append(field)
+        elif usage == "active":
+            active.append(field)
+            treatment = miningField.get("invalidValueTreatment", "returnInvalid")
+            if treatment not in ("returnInvalid", "asIs", "asMissing"):
+                raise Unsupported("invalid value treatment {0}".format(treatment))
+            treatments[field.name] = (treatment, miningField.get("missingValueReplacement"))
+        elif usage != "supplementary":
+            raise Unsupported("mining fields of usage type {0}".format(usage))
+    if not outermost:
+        # nested models must treat their inputs as the outermost model does
+        for name, treatment in treatments.items():
+            if name in scope.treatments and scope.treatments[name] != treatment:
+                raise Unsupported("field {0} treated differently by nested models".format(name))
+    return active, targets, treatments
+
+class _Prediction(object):
+    """Predictions of a model for a batch: values (floats with NaN or objects
+    with None where missing), probabilities of the target categories (rows by
+    categories, NaN where missing) and other model specific results."""
+    __slots__ = ("value", "probabilities", "extras")
+
+    def __init__(self, value, probabilities=None, extras=None):
+        self.value = value
+        self.probabilities = probabilities
+        self.extras = extras or {}
+
+class _Model(object):
+    """A model element of a PMML document; evaluate returns a _Prediction
+    for the rows of an _Inputs."""
+    ALLOWED_ATTRIBUTES = ("modelName", "functionName", "algorithmName", "isScorable")
+
+    def __init__(self, element, scope, outermost=False):
+        if element.get("isScorable", "true") != "true":
+            raise Unsupported("model is not scorable")
+        self.functionName = element.get("functionName")
+        if self.functionName not in ("regression", "classification", "clustering"):
+            raise Unsupported("{0} models".format(self.functionName))
+        self.scope = scope
+        self.active, targets, self.treatments = _miningSchema(_child(element, "MiningSchema"), scope, outermost)
+        if len(targets) > 1:
+            raise Unsupported("models with several targets")
+        self.target = targets[0] if targets else None
+        # models nested in a mining model may predict a value without a target field
+        self.targetType = self.target.dataType if self.target is not None else "double"
+        self.categories = None
+        self.rescale = None
+        if self.functionName in ("regression", "classification"):
+            if self.target is None and (outermost or self.functionName == "classification"):
+                raise Unsupported("models without a target")
+            if self.functionName == "classification":
+                self.categories = self.target.values
+            elif self.targetType not in ("double", "float"):
+                raise Unsupported("regression of a target of type {0}".format(self.targetType))
+            self.rescale = self._targets(_child(element, "Targets"))
+        # (Field, getter, isFinalResult) triples of the fields of the Output
+        # element, set by _model; None if there is no Output element
+        self.outputFields = None
+
+    def _targets(self, element):
+        if element is None:
+            return None
+        targets = _children(element, "Target")
+        _checkChildren(element, ("Target",))
+        if len(targets) != 1 or self.functionName != "regression":
+            raise Unsupported("Targets of classification models")
+        _checkAttributes(targets[0], ("field", "optype", "rescaleFactor", "rescaleConstant"))
+        _checkChildren(targets[0], ())
+        return float(targets[0].get("rescaleFactor", 1)), float(targets[0].get("rescaleConstant", 0))
+
+    def evaluate(self, inputs):
+        raise NotImplementedError
+
+    def regression(self, values):
+        """Rescale regression results as requested by the Targets element."""
+        if self.rescale is None:
+            return values
+        factor, constant = self.rescale
+        return values * factor + constant
+
+    def classification(self, probabilities):
+        """Predict the most probable target category of each row."""
+        return _Prediction(_take(self.categories, _argmax(probabilities)), probabilities)
+
+    def defaultOutputs(self):
+        """Output fields pypmml gives for a model without an Output element."""
+        name = "predicted_" + self.target.name
+        outputs = [(Field(name, self.target.dataType), _predictedValue)]
+        if self.functionName == "classification" and self.hasProbabilities():
+            outputs.append((Field("probability", "real"), _predictedProbability(self.categories)))
+            for i, category in enumerate(self.categories):
+                outputs.append((Field("probability_{0}".format(category), "real"), _probability(i)))
+        return outputs
+
+    def hasProbabilities(self):
+        return True
+
+    def parseOutput(self, element):
+        return _outputFields(self, element)
+
+def _predictedValue(prediction):
+    return prediction.value
+
+def _predictedProbability(categories):
+    index = {category: i for i, category in enumerate(categories)}
+    def get(prediction):
+        categoryIndex = np.fromiter((index.get(value, -1) if value is not None else -1 for value in prediction.value),
+                                    dtype=np.intp, count=len(prediction.value))
+        result = np.full(len(categoryIndex), np.nan)
+        found = categoryIndex >= 0
+        result[found] = prediction.probabilities[found, categoryIndex[found]]
+        return result
+    return get
+
+def _probability(i):
+    return lambda prediction: prediction.probabilities[:, i]
+
+def _targetName(model):
+    return model.target.name if model.target is not None else None
+
+def _outputFields(model, element):
+    """Return (Field, getter, isFinalResult) triples of the fields of an
+    Output element of model; None if there is no Output element."""
+    if element is None:
+        return None
+    _checkChildren(element, ("OutputField",))
+    fields = []
+    for outputField in _children(element, "OutputField"):
+        _checkAttributes(outputField, ("name", "displayName", "optype", "dataType", "targetField", "feature",
+                                       "value", "isFinalResult"))
+        _checkChildren(outputField, ())
+        feature = outputField.get("feature", "predictedValue")
+        dataType = outputField.get("dataType")
+        if outputField.get("targetField", _targetName(model)) != _targetName(model):
+            raise Unsupported("output of another target field")
+        if feature == "predictedValue" and model.functionName != "clustering":
+            if dataType is None or _isNumeric(dataType) != _isNumeric(model.targetType):
+                raise Unsupported("predicted value of type {0}".format(dataType))
+            getter = _predictedValue
+        elif feature == "probability" and model.functionName == "classification" and model.hasProbabilities():
+            if outputField.get("value") is None:
+                getter = _predictedProbability(model.categories)
+            else:
+                value = _valueOf(model.target.dataType, outputField.get("value"))
+                if value not in model.categories:
+                    raise Unsupported("probability of unknown category {0}".format(value))
+                getter = _probability(model.categories.index(value))
+            dataType = dataType or "double"
+        else:
+            raise Unsupported("output feature {0}".format(feature))
+        fields.append((Field(outputField.get("name"), dataType), getter,
+                       outputField.get("isFinalResult", "true") == "true"))
+    return fields
+
+class _RegressionModel(_Model):
+    def __init__(self, element, scope, outermost=False):
+        _checkAttributes(element, self.ALLOWED_ATTRIBUTES + ("modelType", "targetFieldName", "normalizationMethod"))
+        _checkChildren(element, ("MiningSchema", "Output", "Targets", "RegressionTable"))
+        _Model.__init__(self, element, scope, outermost)
+        self.normalization = element.get("normalizationMethod", "none")
+        tables = _children(element, "RegressionTable")
+        if self.functionName == "regression":
+            if len(tables) != 1 or self.normalization not in REGRESSION_NORMALIZATIONS:
+                raise Unsupported("regression normalized by {0}".format(self.normalization))
+        elif self.functionName == "classification":
+            if self.categories is None:
+                raise Unsupported("classification without target categories")
+            byCategory = {_valueOf(self.target.dataType, table.get("targetCategory")): table for table in tables}
+            if len(byCategory) != len(tables) or set(byCategory) != set(self.categories):
+                raise Unsupported("regression tables not matching the target categories")
+            tables = [byCategory[category] for category in self.categories]
+            if self.normalization in BINARY_NORMALIZATIONS and len(self.categories) == 2:
+                # the usual layout of binary models: the table of the reference
+                # category is empty and the other one gives its probability
+                empty = [len(table) == 0 and float(table.get("intercept", 0)) == 0 for table in tables]
+                if sum(empty) != 1:
+                    raise Unsupported("binary classification without an empty regression table")
+                self.modelled = empty.index(False)
+            elif self.normalization not in ("softmax", "simplemax"):
+                raise Unsupported("classification normalized by {0}".format(self.normalization))
+        else:
+            raise Unsupported("clustering with a RegressionModel")
+
+        # linear terms of all tables as a matrix applied to the columns of
+        # the numeric predictors, other terms as lists
+        self.linearNames = []
+        linear = {}
+        self.intercepts = np.zeros(len(tables))
+        self.powers = []
+        self.indicators = []
+        for t, table in enumerate(tables):
+            _checkChildren(table, ("NumericPredictor", "CategoricalPredictor"))
+            self.intercepts[t] = float(table.get("intercept", 0))
+            for predictor in _children(table, "NumericPredictor"):
+                field = scope.field(predictor.get("name"))
+                if not _isNumeric(field.dataType):
+                    raise Unsupported("numeric predictor of type {0}".format(field.dataType))
+                exponent = int(predictor.get("exponent", 1))
+                coefficient = float(predictor.get("coefficient"))
+                if exponent == 1:
+                    if field.name not in linear:
+                        linear[field.name] = len(self.linearNames)
+                        self.linearNames.append(field.name)
+                    self.powers.append((t, field.name, None, coefficient))
+                else:
+                    self.powers.append((t, field.name, exponent, coefficient))
+            for predictor in _children(table, "CategoricalPredictor"):
+                field = scope.field(predictor.get("name"))
+                self.indicators.append((t, field.name, _valueOf(field.dataType, predictor.get("value")),
+                                        float(predictor.get("coefficient"))))
+        self.coefficients = np.zeros((len(self.linearNames), len(tables)))
+        for t, name, exponent, coefficient in self.powers:
+            if exponent is None:
+                self.coefficients[linear[name], t] += coefficient
+        self.powers = [term for term in self.powers if term[2] is not None]
+
+    def linearPredictors(self, inputs):
+        """Results of the regression tables for each row, NaN where a numeric
+        predictor is missing."""
+        if self.linearNames:
+            matrix = np.column_stack([inputs.values[name] for name in self.linearNames])
+            results = matrix.dot(self.coefficients) + self.intercepts
+        else:
+            results = np.tile(self.intercepts, (inputs.nRows, 1))
+        for t, name, exponent, coefficient in self.powers:
+            results[:, t] += coefficient * inputs.values[name] ** exponent
+        # a missing categorical predictor adds nothing, as in pypmml
+        for t, name, value, coefficient in self.indicators:
+            results[:, t] += coefficient * (inputs.values[name] == value)
+        # a missing numeric predictor of any table makes the whole row missing
+        results[np.isnan(results).any(axis=1)] = np.nan
+        return results
+
+    def evaluate(self, inputs):
+        results = self.linearPredictors(inputs)
+        if self.functionName == "regression":
+            with np.errstate(over="ignore"):
+                return _Prediction(self.regression(REGRESSION_NORMALIZATIONS[self.normalization](results[:, 0])))
+        if self.normalization == "softmax":
+            with np.errstate(invalid="ignore"):
+                exp = np.exp(results - results.max(axis=1)[:, None])
+                probabilities = exp / exp.sum(axis=1)[:, None]
+        elif self.normalization == "simplemax":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                probabilities = results / results.sum(axis=1)[:, None]
+        else:
+            with np.errstate(over="ignore"):
+                modelled = BINARY_NORMALIZATIONS[self.normalization](results[:, self.modelled])
+            probabilities = np.empty_like(results)
+            probabilities[:, self.modelled] = modelled
+            probabilities[:, 1 - self.modelled] = 1 - modelled
+        return self.classification(probabilities)
+
+class _GeneralRegressionModel(_Model):
+    def __init__(self, element, scope, outermost=False):
+        _checkAttributes(element, self.ALLOWED_ATTRIBUTES + ("targetVariableName", "modelType", "linkFunction",
+                                                             "targetReferenceCategory", "cumulativeLink"))
+        _checkChildren(element, ("MiningSchema", "Output", "Targets", "ParameterList", "FactorList",
+                                 "CovariateList", "PPMatrix", "ParamMatrix"))
+        _Model.__init__(self, element, scope, outermost)
+        self.modelType = element.get("modelType")
+        if self.modelType == "generalLinear" and element.get("linkFunction", "identity") != "identity":
+            raise Unsupported("general linear models with {0} link".format(element.get("linkFunction")))
+        if self.functionName == "regression" and self.modelType in ("regression", "generalLinear"):
+            pass
+        elif self.functionName == "classification" and self.modelType == "multinomialLogistic":
+            if self.categories is None:
+                raise Unsupported("classification without target categories")
+        else:
+            raise Unsupported("general regression of type {0}".format(self.modelType))
+
+        self.parameters = [parameter.get("name") for parameter in
+                           _children(_child(element, "ParameterList"), "Parameter")]
+        factors = set()
+        covariates = set()
+        for tag, names in (("FactorList", factors), ("CovariateList", covariates)):
+            predictors = _child(element, tag)
+            if predictors is not None:
+                for predictor in _children(predictors, "Predictor"):
+                    _checkChildren(predictor, ())
+                    names.add(predictor.get("name"))
+        # terms of each parameter: (field name, exponent) of covariates and
+        # (field name, value) of factors
+        self.terms = {name: [] for name in self.parameters}
+        matrix = _child(element, "PPMatrix")
+        for cell in _children(matrix, "PPCell") if matrix is not None else []:
+            name = cell.get("predictorName")
+            field = scope.field(name)
+            if cell.get("parameterName") not in self.terms or cell.get("targetCategory") is not None:
+                raise Unsupported("PPCell of an unknown parameter")
+            if name in covariates:
+                if not _isNumeric(field.dataType):
+                    raise Unsupported("covariate of type {0}".format(field.dataType))
+                self.terms[cell.get("parameterName")].append((name, True, float(cell.get("value"))))
+            elif name in factors:
+                self.terms[cell.get("parameterName")].append((name, False, _valueOf(field.dataType, cell.get("value"))))
+            else:
+                raise Unsupported("predictor {0} neither factor nor covariate".format(name))
+
+        rows = self.categories if self.functionName == "classification" else [None]
+        self.betas = np.zeros((len(self.parameters), len(rows)))
+        index = {name: i for i, name in enumerate(self.parameters)}
+        # pypmml predicts the first category with parameters for rows with
+        # missing covariates
+        self.missingPrediction = self.categories[0] if self.categories else None
+        for i, cell in enumerate(_children(_child(element, "ParamMatrix"), "PCell")):
+            category = cell.get("targetCategory")
+            if self.functionName == "classification":
+                category = _valueOf(self.target.dataType, category)
+                if category not in self.categories:
+                    raise Unsupported("parameters of unknown category {0}".format(category))
+                if i == 0:
+                    self.missingPrediction = category
+            elif category is not None:
+                raise Unsupported("target categories of a regression")
+            if cell.get("parameterName") not in index:
+                raise Unsupported("PCell of an unknown parameter")
+            self.betas[index[cell.get("parameterName")], rows.index(category)] = float(cell.get("beta"))
+
+    def design(self, inputs):
+        """The value of each parameter for each row."""
+        matrix = np.ones((inputs.nRows, len(self.parameters)))
+        for j, name in enumerate(self.parameters):
+            for field, isCovariate, value in self.terms[name]:
+                if isCovariate:
+                    matrix[:, j] *= inputs.values[field] ** value
+                else:
+                    # zero where the factor is missing, as in pypmml
+                    matrix[:, j] *= inputs.values[field] == value
+        return matrix
+
+    def evaluate(self, inputs):
+        results = self.design(inputs).dot(self.betas)
+        if self.functionName == "regression":
+            return _Prediction(self.regression(results[:, 0]))
+        with np.errstate(invalid="ignore"):
+            exp = np.exp(results - results.max(axis=1)[:, None])
+            prediction = self.classification(exp / exp.sum(axis=1)[:, None])
+        prediction.value[np.equal(prediction.value, None)] = self.missingPrediction
+        return prediction
+
+def _predicate(element, scope):
+    """Compile a predicate into a function of an _Inputs and an array of row
+    indices returning masks of the rows for which the predicate is true and
+    for which it is unknown."""
+    tag = element.tag
+    if tag in ("True", "False"):
+        value = tag == "True"
+        return lambda inputs, rows: (np.full(len(rows), value), np.zeros(len(rows), dtype=bool))
+    if tag == "SimplePredicate":
+        _checkChildren(element, ())
+        field = scope.field(element.get("field"))
+        name = field.name
+        op = element.get("operator")
+        if op in ("isMissing", "isNotMissing"):
+            isMissing = op == "isMissing"
+            return lambda inputs, rows: (inputs.missing[name][rows] == isMissing, np.zeros(len(rows), dtype=bool))
+        if op not in COMPARISONS or (not _isNumeric(field.dataType) and op not in ("equal", "notEqual")):
+            raise Unsupported("operator {0} on field of type {1}".format(op, field.dataType))
+        compare = COMPARISONS[op]
+        value = _valueOf(field.dataType, element.get("value"))
+        def simple(inputs, rows):
+            missing = inputs.missing[name][rows]
+            with np.errstate(invalid="ignore"):
+                return compare(inputs.values[name][rows], value) & ~missing, missing
+        return simple
+    if tag == "SimpleSetPredicate":
+        field = scope.field(element.get("field"))
+        name = field.name
+        values = _arrayValues(_child(element, "Array"), field.dataType)
+        isIn = element.get("booleanOperator") == "isIn"
+        if not isIn and element.get("booleanOperator") != "isNotIn":
+            raise Unsupported("set predicate {0}".format(element.get("booleanOperator")))
+        valueSet = set(values)
+        def setPredicate(inputs, rows):
+            missing = inputs.missing[name][rows]
+            if _isNumeric(field.dataType):
+                found = np.isin(inputs.values[name][rows], values)
+            else:
+                found = np.fromiter((value in valueSet for value in inputs.values[name][rows]),
+                                    dtype=bool, count=len(rows))
+            return (found == isIn) & ~missing, missing
+        return setPredicate
+    if tag == "CompoundPredicate":
+        operands = [_predicate(child, scope) for child in element if child.tag not in IGNORED_ELEMENTS]
+        booleanOperator = element.get("booleanOperator")
+        if booleanOperator in ("and", "or"):
+            isAnd = booleanOperator == "and"
+            def compound(inputs, rows):
+                # Kleene logic: a single false (and) or true (or) operand decides
+                decided = np.zeros(len(rows), dtype=bool)
+                unknown = np.zeros(len(rows), dtype=bool)
+                for operand in operands:
+                    true, operandUnknown = operand(inputs, rows)
+                    decided |= ~operandUnknown & (true != isAnd)
+                    unknown |= operandUnknown
+                unknown &= ~decided
+                return (~decided & ~unknown) if isAnd else decided, unknown
+            return compound
+        if booleanOperator == "surrogate":
+            def surrogate(inputs, rows):
+                result = np.zeros(len(rows), dtype=bool)
+                decided = np.zeros(len(rows), dtype=bool)
+                for operand in operands:
+                    true, unknown = operand(inputs, rows)
+                    new = ~decided & ~unknown
+                    result |= new & true
+                    decided |= new
+                return result, ~decided
+            return surrogate
+        raise Unsupported("compound predicate {0}".format(booleanOperator))
+    raise Unsupported("predicate {0}".format(tag))
+
+PREDICATES = ("True", "False", "SimplePredicate", "SimpleSetPredicate", "CompoundPredicate")
+
+class _TreeModel(_Model):
+    def __init__(self, element, scope, outermost=False):
+        _checkAttributes(element, self.ALLOWED_ATTRIBUTES + ("missingValueStrategy", "missingValuePenalty",
+                                                             "noTrueChildStrategy", "splitCharacteristic"))
+        _checkChildren(element, ("MiningSchema", "Output", "Targets", "Node"))
+        _Model.__init__(self, element, scope, outermost)
+        if self.functionName == "clustering":
+            raise Unsupported("clustering with a TreeModel")
+        strategy = element.get("missingValueStrategy", "none")
+        if strategy not in ("none", "lastPrediction", "nullPrediction"):
+            raise Unsupported("missing value strategy {0}".format(strategy))
+        # pypmml treats nullPrediction as none
+        self.lastPrediction = strategy == "lastPrediction"
+        self.returnLast = element.get("noTrueChildStrategy", "returnNullPrediction") == "returnLastPrediction"
+
+        # the nodes flattened in preorder into lists indexed by node
+        self.ids = []
+        self.scores = []
+        self.predicates = []
+        self.children = []
+        distributions = []
+        stack = [(_child(element, "Node"), None)]
+        while stack:
+            node, parent = stack.pop()
+            _checkAttributes(node, ("id", "score", "recordCount", "defaultChild"))
+            _checkChildren(node, PREDICATES + ("ScoreDistribution", "Node"))
+            if node.get("id") is None or node.get("defaultChild") is not None:
+                raise Unsupported("node without an id or with a default child")
+            index = len(self.ids)
+            if parent is not None:
+                self.children[parent].append(index)
+            predicates = _children(node, *PREDICATES)
+            if len(predicates) != 1:
+                raise Unsupported("node {0} without a predicate".format(node.get("id")))
+            self.ids.append(node.get("id"))
+            score = node.get("score")
+            self.scores.append(None if score is None else _valueOf(self.targetType, score))
+            self.predicates.append(_predicate(predicates[0], scope))
+            self.children.append([])
+            distributions.append(_children(node, "ScoreDistribution"))
+            stack.extend((child, index) for child in reversed(_children(node, "Node")))
+        if self.functionName == "regression":
+            self.scores = np.array([np.nan if score is None else score for score in self.scores])
+
+        self.probabilities = None
+        self.confidences = None
+        leaves = [distribution for distribution, children in zip(distributions, self.children) if not children]
+        if self.functionName == "classification" and any(leaves):
+            if not all(leaves):
+                # pypmml gives no probabilities then
+                raise Unsupported("score distributions of some leaves")
+            if self.categories is None:
+                raise Unsupported("classification without target categories")
+            self.probabilities = np.full((len(self.ids), len(self.categories)), np.nan)
+            confidences = np.full(len(self.ids), np.nan)
+            for i, scoreDistributions in enumerate(distributions):
+                if not scoreDistributions:
+                    continue
+                counts = np.zeros(len(self.categories))
+                probabilities = np.zeros(len(self.categories))
+                given = [scoreDistribution.get("probability") is not None for scoreDistribution in scoreDistributions]
+                if any(given) and not all(given):
+                    raise Unsupported("probabilities given for some categories")
+                for scoreDistribution in scoreDistributions:
+                    category = _valueOf(self.target.dataType, scoreDistribution.get("value"))
+                    if category not in self.categories:
+                        raise Unsupported("distribution of unknown category {0}".format(category))
+                    j = self.categories.index(category)
+                    counts[j] = float(scoreDistribution.get("recordCount"))
+                    if all(given):
+                        probabilities[j] = float(scoreDistribution.get("probability"))
+                    if scoreDistribution.get("confidence") is not None:
+                        self.confidences = confidences
+                        if category == self.scores[i]:
+                            confidences[i] = float(scoreDistribution.get("confidence"))
+                self.probabilities[i] = probabilities if all(given) else counts / counts.sum()
+
+    def walk(self, inputs):
+        """Return the index of the node whose prediction each row gets, -1 if
+        its prediction is missing."""
+        node = np.full(inputs.nRows, -1, dtype=np.intp)
+        rows = np.arange(inputs.nRows)
+        true, _ = self.predicates[0](inputs, rows)
+        stack = [(0, rows[true])]
+        while stack:
+            index, rows = stack.pop()
+            children = self.children[index]
+            if not children:
+                node[rows] = index
+                continue
+            # as in pypmml, rows for which a child is UNKNOWN go on to the next
+            # children; with lastPrediction, they get this node if none is TRUE
+            unknown = np.zeros(len(rows), dtype=bool)
+            for child in children:
+                if not len(rows):
+                    break
+                true, childUnknown = self.predicates[child](inputs, rows)
+                if true.any():
+                    stack.append((child, rows[true]))
+                rows = rows[~true]
+                unknown = (unknown | childUnknown)[~true]
+            if self.lastPrediction:
+                node[rows[unknown]] = index
+                rows = rows[~unknown]
+            if self.returnLast:
+                node[rows] = index
+        return node
+
+    def evaluate(self, inputs):
+        node = self.walk(inputs)
+        found = node >= 0
+        if self.functionName == "regression":
+            value = np.full(len(node), np.nan)
+            value[found] = self.scores[node[found]]
+            value = self.regression(value)
+        else:
+            value = _take(self.scores, node)
+        probabilities = None
+        if self.probabilities is not None:
+            probabilities = np.full((len(node), len(self.categories)), np.nan)
+            probabilities[found] = self.probabilities[node[found]]
+        ids = _take(self.ids, node)
+        ids[~found] = ""
+        extras = {"node_id": ids}
+        if self.confidences is not None:
+            confidences = np.full(len(node), np.nan)
+            confidences[found] = self.confidences[node[found]]
+            extras["confidence"] = confidences
+        return _Prediction(value, probabilities, extras)
+
+    def hasProbabilities(self):
+        return self.probabilities is not None
+
+    def defaultOutputs(self):
+        outputs = _Model.defaultOutputs(self)
+        if self.confidences is not None:
+            outputs.insert(1, (Field("confidence", "real"), lambda prediction: prediction.extras["confidence"]))
+        return outputs + [(Field("node_id", "string"), lambda prediction: prediction.extras["node_id"])]
+
+class _ClusteringModel(_Model):
+    def __init__(self, element, scope, outermost=False):
+        _checkAttributes(element, self.ALLOWED_ATTRIBUTES + ("modelClass", "numberOfClusters"))
+        _checkChildren(element, ("MiningSchema", "ComparisonMeasure", "ClusteringField", "Cluster"))
+        _Model.__init__(self, element, scope, outermost)
+        if self.functionName != "clustering" or element.get("modelClass") != "centerBased":
+            raise Unsupported("clustering models of class {0}".format(element.get("modelClass")))
+        measure = _child(element, "ComparisonMeasure")
+        metrics = _children(measure, "squaredEuclidean", "euclidean")
+        _checkChildren(measure, ("squaredEuclidean", "euclidean"))
+        if measure.get("kind") != "distance" or len(metrics) != 1 or \
+                measure.get("compareFunction", "absDiff") != "absDiff":
+            raise Unsupported("comparison measure")
+        self.squared = metrics[0].tag == "squaredEuclidean"
+        self.fields = []
+        weights = []
+        for clusteringField in _children(element, "ClusteringField"):
+            _checkAttributes(clusteringField, ("field", "isCenterField", "fieldWeight", "compareFunction"))
+            _checkChildren(clusteringField, ())
+            if clusteringField.get("compareFunction", "absDiff") != "absDiff" or \
+                    clusteringField.get("isCenterField", "true") != "true":
+                raise Unsupported("clustering field compared by {0}".format(clusteringField.get("compareFunction")))
+            field = scope.field(clusteringField.get("field"))
+            if not _isNumeric(field.dataType):
+                raise Unsupported("clustering field of type {0}".format(field.dataType))
+            self.fields.append(field.name)
+            weights.append(float(clusteringField.get("fieldWeight", 1)))
+        if not self.fields:
+            raise Unsupported("clustering without clustering fields")
+        self.weights = np.array(weights)
+        clusters = _children(element, "Cluster")
+        self.centers = np.empty((len(clusters), len(self.fields)))
+        self.clusterIds = []
+        self.clusterNames = []
+        for i, cluster in enumerate(clusters):
+            _checkChildren(cluster, ("Array",))
+            center = _arrayValues(_child(cluster, "Array"), "double")
+            if len(center) != len(self.fields):
+                raise Unsupported("cluster without a center")
+            self.centers[i] = center
+            self.clusterIds.append(cluster.get("id", str(i + 1)))
+            self.clusterNames.append(cluster.get("name"))
+
+    def evaluate(self, inputs):
+        X = np.column_stack([inputs.values[name] for name in self.fields])
+        missing = np.isnan(X)
+        distances = np.zeros((inputs.nRows, len(self.centers)))
+        for j in range(len(self.fields)):
+            present = ~missing[:, j]
+            distances[present] += self.weights[j] * (X[present, j, None] - self.centers[:, j]) ** 2
+        # distances ignore missing values and are scaled up to all fields
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distances *= (len(self.fields) / (~missing).sum(axis=1))[:, None]
+        if not self.squared:
+            distances = np.sqrt(distances)
+        closest = np.where(missing.all(axis=1), -1, np.argmin(distances, axis=1))
+        found = closest >= 0
+        distance = np.full(inputs.nRows, np.nan)
+        distance[found] = distances[found, closest[found]]
+        return _Prediction(_take(self.clusterIds, closest), None,
+                           {"cluster_name": _take(self.clusterNames, closest), "distance": distance})
+
+    def defaultOutputs(self):
+        return [(Field("cluster", "string"), _predictedValue),
+                (Field("cluster_name", "string"), lambda prediction: prediction.extras["cluster_name"]),
+                (Field("distance", "real"), lambda prediction: prediction.extras["distance"])]
+
+class _MiningModel(_Model):
+    REGRESSION_METHODS = ("average", "weightedAverage", "sum", "median")
+    CLASSIFICATION_METHODS = ("majorityVote", "weightedMajorityVote", "average", "weightedAverage")
+
+    def __init__(self, element, scope, outermost=False):
+        _checkAttributes(element, self.ALLOWED_ATTRIBUTES)
+        _checkChildren(element, ("MiningSchema", "Output", "Targets", "Segmentation"))
+        _Model.__init__(self, element, scope, outermost)
+        segmentation = _child(element, "Segmentation")
+        _checkChildren(segmentation, ("Segment",))
+        _checkAttributes(segmentation, ("multipleModelMethod",))
+        self.method = segmentation.get("multipleModelMethod")
+        if self.method == "modelChain":
+            pass
+        elif self.functionName == "regression" and self.method in self.REGRESSION_METHODS:
+            pass
+        elif self.functionName == "classification" and self.method in self.CLASSIFICATION_METHODS:
+            if self.categories is None:
+                raise Unsupported("classification without target categories")
+        else:
+            raise Unsupported("{0} of {1} models".format(self.method, self.functionName))
+
+        self.segments = []
+        weights = []
+        segments = _children(segmentation, "Segment")
+        for i, segment in enumerate(segments):
+            _checkAttributes(segment, ("id", "weight"))
+            if len(segment) != 2 or segment[0].tag != "True":
+                raise Unsupported("segments selected by predicates")
+            model = _model(segment[1], scope)
+            last = i == len(segments) - 1
+            if self.method == "modelChain":
+                # outputs of a segment are fields of the following ones
+                if not last:
+                    if model.outputFields is None:
+                        raise Unsupported("model chain segment without outputs")
+                    scope = scope.extended(_DataField(field.name, "double") for field, _, _ in model.outputFields)
+                elif model.functionName != self.functionName:
+                    raise Unsupported("model chain ending in a {0} model".format(model.functionName))
+            elif model.functionName != self.functionName or _targetName(model) not in (None, _targetName(self)):
+                raise Unsupported("segments of another function or target")
+            elif self.method in ("average", "weightedAverage") and self.functionName == "classification" \
+                    and not model.hasProbabilities():
+                raise Unsupported("averages of models without probabilities")
+            self.segments.append(model)
+            weights.append(float(segment.get("weight", 1)))
+        if not self.segments:
+            raise Unsupported("empty segmentation")
+        self.weights = np.array(weights)
+
+    def evaluate(self, inputs):
+        if self.method == "modelChain":
+            for model in self.segments[:-1]:
+                prediction = model.evaluate(inputs)
+                for field, getter, _ in model.outputFields:
+                    values = np.asarray(getter(prediction), dtype=float)
+                    inputs.add(field.name, values, np.isnan(values))
+            prediction = self.segments[-1].evaluate(inputs)
+            if self.functionName == "regression":
+                prediction.value = self.regression(prediction.value)
+            return prediction
+        predictions = [model.evaluate(inputs) for model in self.segments]
+        if self.functionName == "regression":
+            values = np.array([prediction.value for prediction in predictions])
+            if self.method == "average":
+                result = values.mean(axis=0)
+            elif self.method == "weightedAverage":
+                result = self.weights.dot(values) / self.weights.sum()
+            elif self.method == "sum":
+                result = values.sum(axis=0)
+            else:
+                result = np.median(values, axis=0)
+            return _Prediction(self.regression(result))
+        if self.method in ("majorityVote", "weightedMajorityVote"):
+            index = {category: i for i, category in enumerate(self.categories)}
+            votes = np.zeros((inputs.nRows, len(self.categories)))
+            rows = np.arange(inputs.nRows)
+            for weight, prediction in zip(self.weights, predictions):
+                vote = np.fromiter((index.get(value, -1) for value in prediction.value), dtype=np.intp,
+                                   count=inputs.nRows)
+                voted = vote >= 0
+                votes[rows[voted], vote[voted]] += weight if self.method == "weightedMajorityVote" else 1
+            # pypmml divides the (weighted) votes by the number of segments
+            probabilities = votes / len(self.segments)
+            probabilities[votes.sum(axis=1) == 0] = np.nan
+            return self.classification(probabilities)
+        probabilities = np.array([prediction.probabilities for prediction in predictions])
+        if self.method == "average":
+            return self.classification(probabilities.mean(axis=0))
+        return self.classification(np.tensordot(self.weights, probabilities, axes=1) / self.weights.sum())
+
+    def hasProbabilities(self):
+        if self.method == "modelChain":
+            return self.segments[-1].hasProbabilities()
+        return True
+
+    def parseOutput(self, element):
+        if element is None and self.method == "modelChain":
+            # pypmml gives the outputs of the last segment of a chain
+            return self.segments[-1].outputFields
+        return _Model.parseOutput(self, element)
+
+MODELS = {
+    "RegressionModel": _RegressionModel,
+    "GeneralRegressionModel": _GeneralRegressionModel,
+    "TreeModel": _TreeModel,
+    "ClusteringModel": _ClusteringModel,
+    "MiningModel": _MiningModel,
+}
+
+def _model(element, scope, outermost=False):
+    if element.tag not in MODELS:
+        raise Unsupported(element.tag)
+    model = MODELS[element.tag](element, scope, outermost)
+    model.outputFields = model.parseOutput(_child(element, "Output"))
+    return model
+
+class NativePMML(object):
+    """A PMML model scored with NumPy; has the fields and the predict method
+    of a pypmml Model and scores batches with predictBatch."""
+    def __init__(self, model, outputs):
+        self.model = model
+        self.inputFields = [Field(field.name, field.dataType) for field in model.active]
+        self.targetFields = [Field(model.target.name, model.target.dataType)] if model.target is not None else []
+        # (Field, getter) pairs of the output fields
+        self.outputs = outputs
+        self.outputFields = [field for field, _ in outputs]
+
+    @classmethod
+    def parse(cls, pmmlDoc, progress=None):
+        """Parse a PMML document; raises Unsupported if the document uses
+        elements the evaluator does not cover. progress, if given, is called
+        with the fraction of the document parsed so far."""
+        if isinstance(pmmlDoc, str):
+            pmmlDoc = pmmlDoc.encode("utf-8")
+        parser = ET.XMLParser()
+        try:
+            for start in range(0, len(pmmlDoc), PARSE_BLOCK_SIZE):
+                parser.feed(pmmlDoc[start:start + PARSE_BLOCK_SIZE])
+                if progress is not None:
+                    progress(min(start + PARSE_BLOCK_SIZE, len(pmmlDoc)) / len(pmmlDoc))
+            root = parser.close()
+        except ET.ParseError as ex:
+            raise Unsupported(str(ex))
+        for element in root.iter():
+            # element names without the namespace of the PMML version
+            if isinstance(element.tag, str):
+                element.tag = element.tag.rpartition("}")[2]
+        models = [child for child in root if child.tag not in IGNORED_ELEMENTS + ("DataDictionary",)]
+        if len(models) != 1:
+            raise Unsupported("{0} besides the model".format(", ".join(child.tag for child in models[:-1])))
+        dataFields = {}
+        for element in _children(_child(root, "DataDictionary"), "DataField"):
+            field = _DataField.parse(element)
+            dataFields[field.name] = field
+        scope = _Scope(dataFields, {})
+        miningSchema = _child(models[0], "MiningSchema")
+        if miningSchema is None:
+            raise Unsupported("model without a mining schema")
+        scope.treatments = _miningSchema(miningSchema, scope, outermost=True)[2]
+        model = _model(models[0], scope, outermost=True)
+        if model.outputFields is None:
+            outputs = model.defaultOutputs()
+        else:
+            outputs = [(field, getter) for field, getter, isFinal in model.outputFields if isFinal]
+        return cls(model, outputs)
+
+    def prepare(self, X, columns):
+        """Return the _Inputs of the rows of the 2-D array X whose columns are
+        named by columns, and the mask of rows with invalid values."""
+        X = np.asarray(X)
+        inputs = _Inputs(len(X))
+        invalid = np.zeros(len(X), dtype=bool)
+        index = {name: j for j, name in enumerate(columns)}
+        for field in self.model.active:
+            if field.name in index:
+                values, missing = _column(X[:, index[field.name]], field.dataType)
+            else:
+                values, missing = _column(np.full(len(X), None, dtype=object), field.dataType)
+            treatment, replacement = self.model.treatments[field.name]
+            if treatment != "asIs":
+                invalidValues = ~field.valid(values, missing) & ~missing
+                if treatment == "returnInvalid":
+                    invalid |= invalidValues
+                else:
+                    values[invalidValues] = np.nan if _isNumeric(field.dataType) else None
+                    missing = missing | invalidValues
+            if replacement is not None and missing.any():
+                values[missing] = _valueOf(field.dataType, replacement)
+                missing = np.zeros(len(X), dtype=bool)
+            inputs.add(field.name, values, missing)
+        return inputs, invalid
+
+    def predictBatch(self, X, columns):
+        """Score every row of the 2-D array X whose columns are named by columns.
+
+        Returns a dict mapping each output field name to the list of its values,
+        one value per row of X."""
+        from orangecontrib.scoring.lib import timing
+        with timing.phase("buildInput", len(X)):
+            inputs, invalid = self.prepare(X, columns)
+        with timing.phase("predict", len(X)):
+            prediction = self.model.evaluate(inputs)
+        with timing.phase("decodeOutput", len(X)):
+            result = {}
+            for field, getter in self.outputs:
+                values = np.asarray(getter(prediction))
+                if values.dtype.kind == "f":
+                    missing = np.isnan(values)
+                    values = values.astype(object)
+                    values[missing] = None
+                else:
+                    values = values.astype(object)
+                values[invalid] = None
+                result[field.name] = values.tolist()
+            return result
+
+    def predict(self, data):
+        """Score data given in a form pypmml's Model.predict accepts; the
+        result has the same form. data is a dict mapping field names to
+        values, a list or 1-D array of values in the order of the input
+        fields, a list of such lists or a 2-D array, a JSON string in pandas'
+        "split" orientation, or a pandas Series or DataFrame."""
+        inputNames = [field.name for field in self.inputFields]
+        outputNames = [field.name for field, _ in self.outputs]
+
+        def score(rows, columns):
+            X = np.empty((len(rows), len(columns)), dtype=object)
+            for i, row in enumerate(rows):
+                X[i] = list(row)
+            result = self.predictBatch(X, columns)
+            return [list(values) for values in zip(*(result[name] for name in outputNames))]
+
+        if isinstance(data, dict):
+            return dict(zip(outputNames, score([[data.get(name) for name in inputNames]], inputNames)[0]))
+        if isinstance(data, str):
+            parsed = json.loads(data)
+            if isinstance(parsed, dict) and "columns" in parsed:
+                return json.dumps({"columns": outputNames, "data": score(parsed["data"], parsed["columns"])})
+            return json.dumps(self.predict(parsed))
+        if isinstance(data, (list, tuple)):
+            if not data:
+                return []
+            if isinstance(data[0], (list, tuple)):
+                return score(data, inputNames)
+            return score([data], inputNames)[0]
+        if isinstance(data, np.ndarray):
+            if data.ndim == 1:
+                return score([data.tolist()], inputNames)[0]
+            if data.ndim == 2:
+                return np.array(score(data.tolist(), inputNames), dtype=object).reshape(len(data), len(outputNames))
+            raise ValueError("Arrays of at most 2 dimensions can be scored")
+        pandas = sys.modules.get("pandas")
+        if pandas is not None and isinstance(data, pandas.DataFrame):
+            rows = score(data.values.tolist(), [str(column) for column in data.columns])
+            return pandas.DataFrame(rows, columns=outputNames, index=data.index)
+        if pandas is not None and isinstance(data, pandas.Series):
+            return pandas.Series(self.predict(data.to_dict()), name=data.name)
+        raise ValueError("Data of type {0} cannot be scored".format(type(data).__name__))
+
+def compilePMML(pmmlDoc, progress=None):
+    """Return a NativePMML scoring the PMML document, or None if the document
+    uses elements the evaluator does not cover. progress is passed to
+    NativePMML.parse."""
+    try:
+        return NativePMML.parse(pmmlDoc, progress)
+    except Unsupported as ex:
+        log.debug("PMML document is scored by pypmml: unsupported %s", ex)
+    except Exception:  # pylint: disable=broad-except
+        # malformed documents are left to pypmml, which reports the error
+        log.debug("PMML document is scored by pypmml", exc_info=True)
+    return None
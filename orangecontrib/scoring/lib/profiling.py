@@ -0,0 +1,167 @@
+"""cProfile hook for scoring with a ScoringModel.
+
+ScoringProfile profiles the calls of a model's predict and predictBatch made
+within it, up to a number of rows, and reports the functions with the most
+cumulative time. Functions are grouped by origin, so that the Python code
+titus generates for a PFA document stands apart from titus itself and from
+calls into pypmml's JVM through py4j.
+"""
+import cProfile
+import os
+import pstats
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Number of rows profiled by profileSample
+DEFAULT_ROWS = 1000
+# Origins of profiled functions, see origin, with their headings in ScoringProfile.format
+ORIGINS = (("pfa", "PFA functions generated by titus"),
+           ("titus", "titus"),
+           ("pmml", "pypmml/py4j"),
+           ("scoring", "orange3-scoring"),
+           ("builtin", "built-in"),
+           ("other", "other"))
+
+HotSpot = namedtuple("HotSpot", ["function", "filename", "line", "origin", "calls", "seconds", "cumulativeSeconds"])
+
+def origin(filename):
+    """Return the origin of a profiled function defined in filename: "pfa"
+    for code titus generated for a PFA document, "titus", "pmml" for pypmml
+    and py4j, "scoring" for this add-on, "builtin" or "other"."""
+    if filename == "<string>":
+        # titus compiles the code it generates from a string
+        return "pfa"
+    if filename == "~":
+        return "builtin"
+    path = filename.replace(os.sep, "/")
+    if "/titus/" in path:
+        return "titus"
+    if "/pypmml/" in path or "/py4j/" in path:
+        return "pmml"
+    if "/orangecontrib/scoring/" in path:
+        return "scoring"
+    return "other"
+
+def defaultProfilePath(model):
+    """Return a path in the temporary directory for the profile of model."""
+    name = "{0}-{1}.prof".format(model.name or model.type.lower(), time.strftime("%Y%m%d-%H%M%S"))
+    return os.path.join(tempfile.gettempdir(), "orange-scoring", name)
+
+class ScoringProfile(object):
+    """Context manager profiling the calls of model.predict and
+    model.predictBatch with cProfile until rows rows, all by default, are
+    profiled; the calls made after that are not profiled.
+
+    Calls from one thread at a time are profiled; calls made in other
+    threads meanwhile, and calls scored by worker processes, are not."""
+    def __init__(self, model, rows=None):
+        self.model = model
+        self.maxRows = rows
+        self.rows = 0
+        self.profiler = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._saved = None
+        # file the profile was last saved into
+        self.filename = None
+
+    def __enter__(self):
+        model = self.model
+        # methods set on the instance, e.g. by tests, are restored on exit
+        self._saved = {name: model.__dict__[name] for name in ("predict", "predictBatch") if name in model.__dict__}
+        model.predict = self._wrap(model.predict, lambda data: 1)
+        model.predictBatch = self._wrap(model.predictBatch, lambda X, columns: X.shape[0])
+        return self
+
+    def __exit__(self, *exc_info):
+        for name in ("predict", "predictBatch"):
+            if name in self._saved:
+                setattr(self.model, name, self._saved[name])
+            else:
+                delattr(self.model, name)
+
+    def _wrap(self, method, countRows):
+        def profiled(*args, **kwargs):
+            if self.maxRows is not None and self.rows >= self.maxRows:
+                return method(*args, **kwargs)
+            # the lock is held while profiling, which also covers nested calls
+            if not self._lock.acquire(blocking=False):
+                return method(*args, **kwargs)
+            try:
+                self.rows += countRows(*args, **kwargs)
+                self.profiler.enable()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.profiler.disable()
+            finally:
+                self._lock.release()
+        return profiled
+
+    def stats(self):
+        """Return the pstats.Stats of the profile."""
+        return pstats.Stats(self.profiler)
+
+    def save(self, filename=None):
+        """Save the profile, readable by pstats and tools like snakeviz, into
+        filename, by default one given by defaultProfilePath; returns the
+        name of the file."""
+        filename = filename or defaultProfilePath(self.model)
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.profiler.dump_stats(filename)
+        self.filename = filename
+        return filename
+
+    def hotSpots(self, n=10, origins=None):
+        """Return the n functions with the most cumulative time, of the given
+        origins (see origin) only, if any."""
+        try:
+            stats = self.stats().stats
+        except TypeError:
+            # nothing was profiled
+            return []
+        spots = [HotSpot(function, filename, line, origin(filename), calls, seconds, cumulative)
+                 for (filename, line, function), (_, calls, seconds, cumulative, _) in stats.items()]
+        if origins is not None:
+            spots = [spot for spot in spots if spot.origin in origins]
+        spots.sort(key=lambda spot: -spot.cumulativeSeconds)
+        return spots[:n]
+
+    def format(self, n=10):
+        """Return lines of text with the top n hot spots overall and those
+        of the PFA functions generated by titus and of pypmml/py4j."""
+        def spotLine(spot):
+            location = os.path.basename(spot.filename) if spot.origin != "builtin" else "built-in"
+            return "{0:.3f} s cumulative, {1:.3f} s own, {2} calls: {3} ({4}:{5})".format(
+                spot.cumulativeSeconds, spot.seconds, spot.calls, spot.function, location, spot.line)
+
+        lines = ["Rows profiled: {0}".format(self.rows), "Top cumulative:"]
+        lines += ["- " + spotLine(spot) for spot in self.hotSpots(n)]
+        headings = dict(ORIGINS)
+        for key in ("pfa", "pmml"):
+            spots = self.hotSpots(n, (key,))
+            if spots:
+                lines.append(headings[key] + ":")
+                lines += ["- " + spotLine(spot) for spot in spots]
+        return lines
+
+def sampleRows(nRows, rows=DEFAULT_ROWS, seed=0):
+    """Return the sorted indices of a random sample of rows of nRows rows,
+    or of all rows if there are no more than rows."""
+    if rows >= nRows:
+        return np.arange(nRows)
+    return np.sort(np.random.RandomState(seed).choice(nRows, rows, replace=False))
+
+def profileSample(model, X, columns, rows=DEFAULT_ROWS, seed=0):
+    """Score a random sample of rows rows of the 2-D array X, whose columns
+    are named by columns, with model under the profiler; returns the
+    ScoringProfile. The sampled rows keep their order."""
+    X = X[sampleRows(X.shape[0], rows, seed)]
+    with ScoringProfile(model) as profile:
+        model.predictBatch(X, columns)
+    return profile
@@ -1,10 +1,118 @@
+import io
 import os
+import bz2
+import gzip
+import hashlib
+import zipfile
+from contextlib import ExitStack
+from orangecontrib.scoring.lib import timing
 from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.cache import defaultCache
+
+# Size of the blocks in which model files are read
+BLOCK_SIZE = 1 << 20
+# Extensions of compressed model files, added to those of the formats
+COMPRESSIONS = (".gz", ".bz2", ".zip")
+# Share of the progress of reading a model spent on reading the file; the
+# rest is spent on parsing and compiling the document
+READ_SHARE = 0.5
+
+def _withCompressions(extensions):
+    return extensions + tuple(ext + compression for compression in COMPRESSIONS for ext in extensions)
+
+def splitExtension(filename):
+    """Return (root, ext, compression) of filename, e.g. ("model", ".pmml", ".gz")
+    for "model.pmml.gz"; compression is "" for uncompressed files."""
+    root, compression = os.path.splitext(filename)
+    if compression.lower() not in COMPRESSIONS:
+        root, compression = filename, ""
+    root, ext = os.path.splitext(root)
+    return root, ext, compression.lower()
+
+def fileDigest(filename):
+    """Return the SHA-256 hex digest of the content of filename, read in blocks."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _ProgressStream(io.RawIOBase):
+    """Binary stream over f that hashes the bytes read and reports the
+    fraction of the size bytes read so far to progress."""
+    def __init__(self, f, size, progress=None):
+        super().__init__()
+        self.f = f
+        self.size = max(size, 1)
+        self.progress = progress
+        self.digest = hashlib.sha256()
+        self.done = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.f.readinto(buffer)
+        if n:
+            self.digest.update(memoryview(buffer)[:n])
+            self.done += n
+            if self.progress is not None:
+                self.progress(min(self.done / self.size, 1.0))
+        return n
+
+def _zipMember(archive, ext):
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    if len(names) != 1:
+        # several files: take the one with the extension of the archive's name
+        names = [name for name in names if name.lower().endswith(ext.lower())] if ext else []
+    if not names:
+        raise IOError('No model file in "{}"'.format(archive.filename))
+    return archive.getinfo(names[0])
+
+def readModelFile(filename, progress=None):
+    """Return the text of the model file filename, which may be compressed with
+    gzip, bzip2 or zip, and the fileDigest of the file.
+
+    The file is read and decoded in blocks; progress, if given, is called with
+    the fraction of the file read so far. The text is decoded as
+    open(filename, 'r') would."""
+    _, ext, compression = splitExtension(filename)
+    with ExitStack() as stack:
+        raw = stack.enter_context(open(filename, 'rb', buffering=0))
+        if compression == ".zip":
+            digest = fileDigest(filename)
+            archive = stack.enter_context(zipfile.ZipFile(raw))
+            member = _zipMember(archive, ext)
+            stream = _ProgressStream(stack.enter_context(archive.open(member)), member.file_size, progress)
+            binary = io.BufferedReader(stream, BLOCK_SIZE)
+        else:
+            stream = _ProgressStream(raw, os.fstat(raw.fileno()).st_size, progress)
+            binary = io.BufferedReader(stream, BLOCK_SIZE)
+            if compression == ".gz":
+                binary = gzip.GzipFile(fileobj=binary)
+            elif compression == ".bz2":
+                binary = bz2.BZ2File(binary)
+        text = stack.enter_context(io.TextIOWrapper(binary))
+        blocks = list(iter(lambda: text.read(BLOCK_SIZE), ""))
+        if compression != ".zip":
+            # the compressed stream may stop short of trailing bytes
+            for _ in iter(lambda: stream.read(BLOCK_SIZE), b""):
+                pass
+            digest = stream.digest.hexdigest()
+    return "".join(blocks), digest
+
+def _modelName(filename):
+    return os.path.basename(splitExtension(filename)[0])
+
+def _scaled(progress, start, stop):
+    if progress is None:
+        return None
+    return lambda fraction: progress(start + (stop - start) * fraction)
 
 class PMMLFormat(object):
     PRIORITY = 1
     DESCRIPTION = "PMML file"
-    EXTENSIONS = (".xml", ".xsd", ".pmml")
+    EXTENSIONS = _withCompressions((".xml", ".xsd", ".pmml"))
     
     def __init__(self, filename):
         self.filename = filename
@@ -23,7 +131,7 @@ class PMMLFormat(object):
 class PFAFormat(object):
     PRIORITY = 2
     DESCRIPTION = "PFA file"
-    EXTENSIONS = (".pfa", ".json", ".yml", ".yaml")
+    EXTENSIONS = _withCompressions((".pfa", ".json", ".yml", ".yaml"))
     
     def __init__(self, filename):
         self.filename = filename
@@ -43,17 +151,52 @@ class PMMLReader(object):
     """Reader for PMML files"""
     def __init__(self, filename):
         self.filename = filename
+        # fileDigest of the content last read, None before the first read
+        self.digest = None
 
-    def read(self):
-        pmml = open(self.filename, 'r').read()      
-        return ScoringModel.fromPMML(pmml)
+    def read(self, progress=None):
+        """Read the model; progress, if given, is called with the fraction of
+        reading and parsing done so far."""
+        with timing.phase("read"):
+            pmml, self.digest = readModelFile(self.filename, _scaled(progress, 0, READ_SHARE))
+        model = ScoringModel.fromPMML(pmml, progress=_scaled(progress, READ_SHARE, 1))
+        model.name = _modelName(self.filename)
+        if progress is not None:
+            progress(1.0)
+        return model
 
 class PFAReader(object):
     """Reader for PFA files"""
     def __init__(self, filename):
         self.filename = filename
+        # ModelCache holding the code generated for PFA documents; None disables caching
+        self.cache = defaultCache()
+        # fileDigest of the content last read, None before the first read
+        self.digest = None
+
+    def read(self, progress=None):
+        """Read the model; progress, if given, is called with the fraction of
+        reading and parsing done so far."""
+        with timing.phase("read"):
+            pfa, self.digest = readModelFile(self.filename, _scaled(progress, 0, READ_SHARE))
+        _, ext, _ = splitExtension(self.filename)
+        model = ScoringModel.fromPFA(pfa, ext.lower(), cache=self.cache, progress=_scaled(progress, READ_SHARE, 1))
+        model.name = _modelName(self.filename)
+        if progress is not None:
+            progress(1.0)
+        return model
+
+def formatOf(filename):
+    """Return the format of filename chosen by its extension, or None."""
+    _, ext, compression = splitExtension(filename)
+    for fileFormat in (PMMLFormat, PFAFormat):
+        if (ext + compression).lower() in fileFormat.EXTENSIONS:
+            return fileFormat
+    return None
 
-    def read(self):
-        pfa = open(self.filename, 'r').read()
-        _, ext = os.path.splitext(self.filename)
-        return ScoringModel.fromPFA(pfa, ext)
+def getReader(filename):
+    """Return a reader for filename chosen by its extension."""
+    fileFormat = formatOf(filename)
+    if fileFormat is None:
+        raise IOError('No readers for file "{}"'.format(filename))
+    return fileFormat.get_reader(filename)
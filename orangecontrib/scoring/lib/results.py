@@ -0,0 +1,116 @@
+import tempfile
+
+import numpy as np
+
+from Orange.data import Table, Domain, DiscreteVariable, ContinuousVariable
+
+# Avro/PMML data types of outputs turned into categorical variables
+DISCRETE_TYPES = ("string", "bytes")
+
+def memmapArray(shape, directory=None):
+    """Return an uninitialized float array of the given shape stored in a
+    memory-mapped file in directory, the temporary directory by default.
+
+    The file has no name, or is deleted on close on Windows, so it is
+    removed when the array and all arrays referring to its memory, such as
+    the columns of tables built on it, are released."""
+    if not np.prod(shape):
+        # empty files cannot be mapped
+        return np.empty(shape)
+    with tempfile.TemporaryFile(prefix="predictions-", dir=directory) as f:
+        # the map keeps the file open after f is closed
+        return np.memmap(f, dtype=float, mode="w+", shape=shape)
+
+class ResultAssembler(object):
+    """Collects the predictions of nRows rows into a preallocated array.
+
+    Every output field gets a column of Y. String outputs are stored as
+    category indices; the index of a value is looked up in a dict, so the
+    cost does not grow with the number of categories. Batches, as returned
+    by ScoringModel.predictBatch, may be added in any order.
+
+    Y, if given, is the (nRows, len(outputFields)) array, possibly a view of
+    a larger one, to store the predictions into. names are the names of the
+    output variables, by default those of the fields. See onDisk for
+    predictions that do not fit into memory."""
+    def __init__(self, outputFields, nRows, Y=None, names=None):
+        self.outputFields = outputFields
+        self.nRows = nRows
+        self.nScored = 0
+        if Y is None:
+            Y = np.empty((nRows, len(outputFields)))
+        Y[:] = np.nan
+        self.Y = Y
+        self.names = names or [name for name, _ in outputFields]
+        # dicts keep insertion order, so the index of a value is its position
+        self.categories = {name: {} for name, type in outputFields if type in DISCRETE_TYPES}
+
+    @classmethod
+    def onDisk(cls, outputFields, nRows, directory=None, names=None):
+        """Return an assembler storing into a memmapArray in directory."""
+        return cls(outputFields, nRows, memmapArray((nRows, len(outputFields)), directory), names)
+
+    @classmethod
+    def extending(cls, previous, nRows, Y=None):
+        """Return an assembler for nRows rows, the first of which are the rows
+        already scored by previous, storing into Y if given."""
+        assembler = cls(previous.outputFields, nRows, Y, names=previous.names)
+        assembler.Y[:previous.nRows] = previous.Y
+        assembler.categories = {name: dict(index) for name, index in previous.categories.items()}
+        assembler.nScored = previous.nScored
+        return assembler
+
+    def add(self, start, batch):
+        """Store batch, the predictions of rows start, start + 1, ..."""
+        nRows = 0
+        for column, (name, _) in enumerate(self.outputFields):
+            values = batch[name]
+            nRows = len(values)
+            if name in self.categories:
+                index = self.categories[name]
+                values = [np.nan if value is None else index.setdefault(value, len(index))
+                          for value in values]
+            self.Y[start:start + nRows, column] = np.array(values, dtype=float)
+        self.nScored += nRows
+
+    def outputVariables(self):
+        """Return an Orange variable for each output field."""
+        return [DiscreteVariable(varName, values=[str(value) for value in self.categories[name]])
+                if name in self.categories else ContinuousVariable(varName)
+                for (name, _), varName in zip(self.outputFields, self.names)]
+
+def targetsAsMetas(data):
+    """Return the class values of data as an object array of meta values.
+
+    Orange keeps metas in object arrays, which would normally hold a new
+    Python float for every value. Values of discrete variables are instead
+    picked from a few shared floats, one per category, so they only cost
+    a pointer per row."""
+    classVars = data.domain.class_vars
+    Y = np.asarray(data._Y).reshape(len(data), len(classVars))
+    metas = np.empty(Y.shape, dtype=object)
+    for column, var in enumerate(classVars):
+        values = Y[:, column]
+        if var.is_discrete:
+            shared = np.array([float(i) for i in range(len(var.values))] + [np.nan], dtype=object)
+            metas[:, column] = shared[np.where(np.isnan(values), len(var.values), values).astype(np.intp)]
+        else:
+            metas[:, column] = values
+    return metas
+
+def predictionTable(data, outputVariables, Y, metaVariables=(), metas=None):
+    """Return a table with the attributes of data, the predictions Y of
+    outputVariables as class variables and the class variables of data as
+    metas, followed by metaVariables with the values in the columns of metas.
+
+    The table refers to the arrays of attribute values and row ids of data
+    and to Y instead of copying them."""
+    domain = Domain(data.domain.attributes, class_vars=outputVariables,
+                    metas=tuple(data.domain.class_vars) + tuple(metaVariables))
+    if Y.ndim == 2 and Y.shape[1] == 1:
+        # Table copies a single class column unless it is given as a 1-D array
+        Y = Y[:, 0]
+    tableMetas = targetsAsMetas(data)
+    if metaVariables:
+        tableMetas = np.hstack((tableMetas, np.asarray(metas, dtype=object)))
+    return Table.from_numpy(domain, data.X, Y=Y, metas=tableMetas, ids=data.ids)
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+# Number of rows hashed at once when fingerprinting an array
+HASH_CHUNK_ROWS = 65536
+
+def modelKey(model):
+    """Return a key identifying the source document of model, or None if
+    the model has no document."""
+    if model.document is None:
+        return None
+    document = model.document
+    digest = hashlib.sha256((model.type + "\0" + (model.documentExt or "") + "\0").encode("utf-8"))
+    digest.update(document.encode("utf-8") if isinstance(document, str) else document)
+    return digest.hexdigest()
+
+class Fingerprint(object):
+    """Identifies the predictions of a model for the rows of an array."""
+    __slots__ = ("model", "columns", "categories", "nRows", "digest")
+
+    def __init__(self, model, columns, categories, nRows, digest):
+        self.model = model
+        self.columns = columns
+        self.categories = categories
+        self.nRows = nRows
+        self.digest = digest
+
+class PredictionCache(object):
+    """Predictions (ResultAssembler instances) of the last maxEntries scored
+    arrays, keyed by the model document, the column names, the values of
+    categorical columns and the content of the array.
+
+    Besides exact matches, lookup finds the predictions of the longest
+    cached array that is a prefix of the given one, so that only rows
+    appended since can be scored."""
+    def __init__(self, maxEntries=2):
+        self.maxEntries = maxEntries
+        # pairs of (Fingerprint, ResultAssembler), least recently used first
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def lookup(self, model, columns, X, categories=None):
+        """Return the fingerprint of X and a pair (fingerprint, predictions)
+        cached for the longest prefix of X, or None if there is none.
+
+        categories are the values of categorical columns by column name;
+        X holds indices into them, so the same X with other values is
+        scored anew. The fingerprint of X is None if X cannot be
+        cached."""
+        key = modelKey(model)
+        if key is None or sp.issparse(X):
+            return None, None
+        columns = tuple(columns)
+        categories = tuple(sorted((name, tuple(values)) for name, values in (categories or {}).items()))
+        nRows = len(X)
+        with self._lock:
+            candidates = sorted((entry for entry in self.entries
+                                 if entry[0].model == key and entry[0].columns == columns
+                                 and entry[0].categories == categories and entry[0].nRows <= nRows),
+                                key=lambda entry: entry[0].nRows)
+        # hash X once, comparing the digest of each candidate's prefix on the way
+        digest = hashlib.blake2b()
+        digest.update(str(X.dtype).encode("ascii") + str(X.shape[1:]).encode("ascii"))
+        hashed = 0
+        found = None
+        for fingerprint, assembler in candidates:
+            _hashRows(digest, X, hashed, fingerprint.nRows)
+            hashed = fingerprint.nRows
+            if digest.hexdigest() == fingerprint.digest:
+                found = fingerprint, assembler
+        _hashRows(digest, X, hashed, nRows)
+        if found is not None:
+            self._touch(found[0])
+        return Fingerprint(key, columns, categories, nRows, digest.hexdigest()), found
+
+    def store(self, fingerprint, assembler, replaces=None):
+        """Cache the predictions assembler of the array with the given
+        fingerprint, removing the entry with fingerprint replaces, e.g. the
+        predictions of a prefix that assembler extends."""
+        if fingerprint is None:
+            return
+        with self._lock:
+            self.entries = [entry for entry in self.entries
+                            if entry[0] is not replaces and
+                            (entry[0].model, entry[0].columns, entry[0].categories, entry[0].digest) !=
+                            (fingerprint.model, fingerprint.columns, fingerprint.categories,
+                             fingerprint.digest)]
+            self.entries.append((fingerprint, assembler))
+            if len(self.entries) > self.maxEntries:
+                del self.entries[:len(self.entries) - self.maxEntries]
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+
+    def _touch(self, fingerprint):
+        with self._lock:
+            for i, entry in enumerate(self.entries):
+                if entry[0] is fingerprint:
+                    self.entries.append(self.entries.pop(i))
+                    break
+
+def _hashRows(digest, X, start, stop):
+    for chunkStart in range(start, stop, HASH_CHUNK_ROWS):
+        digest.update(np.ascontiguousarray(X[chunkStart:min(chunkStart + HASH_CHUNK_ROWS, stop)]))
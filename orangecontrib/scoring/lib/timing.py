@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+log = logging.getLogger(__name__)
+
+# Set the environment variable to any non-empty value to record timings from the start
+ENV_VARIABLE = "ORANGE_SCORING_TIMING"
+
+class Phase(object):
+    """Wall time, number of calls and number of rows recorded for a phase."""
+    __slots__ = ("seconds", "calls", "rows")
+
+    def __init__(self, seconds=0.0, calls=0, rows=0):
+        self.seconds = seconds
+        self.calls = calls
+        self.rows = rows
+
+    def __repr__(self):
+        return "Phase(seconds={0!r}, calls={1!r}, rows={2!r})".format(self.seconds, self.calls, self.rows)
+
+class Timings(object):
+    """Wall time and row counts of the phases of loading and scoring models,
+    such as "parse", "buildInput" or "predict", in the order in which the
+    phases were first recorded."""
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=0):
+        with self._lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = Phase()
+            phase.seconds += seconds
+            phase.calls += 1
+            phase.rows += rows
+        log.debug("%s: %.6f s, %d rows", name, seconds, rows)
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        """Record the wall time spent in the with block as the given phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, rows)
+
+    def snapshot(self):
+        """Return a copy of the timings recorded so far."""
+        copy = Timings()
+        with self._lock:
+            copy.phases = {name: Phase(phase.seconds, phase.calls, phase.rows)
+                           for name, phase in self.phases.items()}
+        return copy
+
+    def since(self, snapshot):
+        """Return the timings recorded after snapshot was taken."""
+        difference = Timings()
+        for name, phase in self.snapshot().phases.items():
+            before = snapshot.phases.get(name, Phase())
+            if phase.calls > before.calls:
+                difference.phases[name] = Phase(phase.seconds - before.seconds, phase.calls - before.calls,
+                                                phase.rows - before.rows)
+        return difference
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+
+    def format(self):
+        """Return a line per phase with its time, rows and rows per second."""
+        lines = []
+        for name, phase in self.phases.items():
+            line = "{0}: {1:.3f} s".format(name, phase.seconds)
+            if phase.rows:
+                line += ", {0} rows".format(phase.rows)
+                if phase.seconds > 0:
+                    line += " ({0:.0f} rows/s)".format(phase.rows / phase.seconds)
+            lines.append(line)
+        return lines
+
+_timings = Timings()
+_enabled = bool(os.environ.get(ENV_VARIABLE))
+_disabledPhase = nullcontext()
+
+def timings():
+    """Return the process-wide Timings."""
+    return _timings
+
+def enable(enabled=True):
+    """Turn recording of timings on or off."""
+    global _enabled
+    _enabled = enabled
+
+def isEnabled():
+    return _enabled
+
+def phase(name, rows=0):
+    """Return a context manager recording the with block as the given phase
+    into the process-wide Timings; does nothing when recording is off."""
+    if not _enabled:
+        return _disabledPhase
+    return _timings.phase(name, rows)
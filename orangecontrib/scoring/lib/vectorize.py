@@ -0,0 +1,482 @@
+"""Compilation of PFA documents into NumPy evaluators.
+
+titus runs the action of a PFA document once per datum. For documents built
+only from the constructs below, compilePFA returns an evaluator that scores
+a whole block of rows with array operations instead:
+
+- literals, input fields, local variables (let), read-only cells,
+- if and cond, do, new records, maps and arrays, upcast,
+- arithmetic, comparisons and logical operators,
+- m.* math functions and the logit and softmax links,
+- a.argmax, a.argmin, map.argmax and map.argmin,
+- model.reg.linear and model.tree.simpleWalk with model.tree.simpleTest.
+
+Values are compiled into constants, dicts of compiled values (records and
+maps) or functions computing an array with a value per row. The branches of
+if and tree nodes are evaluated only for the rows that reach them.
+"""
+import math
+import json
+import logging
+import operator
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Avro types of input fields the evaluator reads from the columns of an array
+PRIMITIVE_TYPES = ("double", "float", "int", "long", "string", "boolean")
+# Tags of Avro unions holding primitive values or arrays in JSON-encoded cells
+UNION_TAGS = PRIMITIVE_TYPES + ("array",)
+# Largest magnitudes of int and long outputs; longs beyond 2**53 are not exact
+# in the float arrays the evaluator computes with, so titus scores them
+INTEGER_LIMITS = {"int": (-2 ** 31, 2 ** 31 - 1), "long": (-2 ** 53, 2 ** 53)}
+
+class Unsupported(Exception):
+    """A construct of a PFA document which the NumPy evaluator does not cover,
+    or, raised by VectorizedPFA.predictBatch, values it cannot score exactly."""
+
+class _Const(object):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        if isinstance(value, np.generic):
+            value = value.item()
+        self.value = value
+
+class _Env(object):
+    """Rows of the input array scored by a compiled function, and the values
+    of local variables computed for them."""
+    __slots__ = ("X", "index", "rows", "n", "locals", "columns")
+
+    def __init__(self, X, index, rows=None):
+        self.X = X
+        self.index = index
+        self.rows = rows
+        self.n = len(X) if rows is None else len(rows)
+        self.locals = {}
+        self.columns = {}
+
+    def column(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            j = self.index[name] if name is not None else 0
+            column = self.columns[name] = self.X[:, j] if self.rows is None else self.X[self.rows, j]
+        return column
+
+    def matrix(self):
+        return self.X if self.rows is None else self.X[self.rows]
+
+    def local(self, slot, fcn):
+        value = self.locals.get(slot)
+        if value is None:
+            value = self.locals[slot] = fcn(self)
+        return value
+
+    def restrict(self, idx):
+        env = _Env(self.X, self.index, idx if self.rows is None else self.rows[idx])
+        env.locals = {slot: value[idx] for slot, value in self.locals.items()}
+        env.columns = {name: column[idx] for name, column in self.columns.items()}
+        return env
+
+class _Local(object):
+    __slots__ = ("slot", "fcn")
+
+    def __init__(self, slot, fcn):
+        self.slot = slot
+        self.fcn = fcn
+
+def _perRow(value, env):
+    """Return the array of values of a compiled value for the rows of env."""
+    if isinstance(value, _Const):
+        array = np.asarray(value.value, dtype=object if isinstance(value.value, str) else None)
+        return np.broadcast_to(array, (env.n,) + array.shape)
+    if isinstance(value, dict):
+        raise Unsupported("record or map used as a column")
+    return value(env)
+
+def _raw(value, env):
+    return value.value if isinstance(value, _Const) else value(env)
+
+def _unwrap(value):
+    if isinstance(value, dict) and len(value) == 1 and next(iter(value)) in UNION_TAGS:
+        return next(iter(value.values()))
+    return value
+
+def _signum(x):
+    return np.where(np.isnan(x), 0, np.sign(x)).astype(int)
+
+def _round(x):
+    return np.floor(np.asarray(x, dtype=float) + 0.5)
+
+def _logit(x):
+    return 1. / (1. + np.exp(-np.asarray(x, dtype=float)))
+
+def _logBase(x, base):
+    return np.log(x) / np.log(base)
+
+def _softmax(x):
+    x = np.asarray(x, dtype=float)
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+# Functions applied to their arguments elementwise
+ELEMENTWISE = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "%": np.mod, "**": np.power, "u-": operator.neg,
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+    "&&": np.logical_and, "||": np.logical_or, "^^": np.logical_xor, "!": np.logical_not,
+    "m.abs": np.abs, "m.exp": np.exp, "m.expm1": np.expm1, "m.ln": np.log, "m.log10": np.log10,
+    "m.ln1p": np.log1p, "m.log": _logBase, "m.sqrt": np.sqrt, "m.hypot": np.hypot,
+    "m.sin": np.sin, "m.cos": np.cos, "m.tan": np.tan, "m.asin": np.arcsin, "m.acos": np.arccos,
+    "m.atan": np.arctan, "m.atan2": np.arctan2, "m.sinh": np.sinh, "m.cosh": np.cosh, "m.tanh": np.tanh,
+    "m.floor": np.floor, "m.ceil": np.ceil, "m.rint": np.rint, "m.round": _round, "m.signum": _signum,
+    "m.link.logit": _logit,
+}
+CONSTANTS = {"m.pi": math.pi, "m.e": math.e}
+
+# Comparisons of model.tree.simpleTest
+TREE_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+                  "==": operator.eq, "!=": operator.ne}
+
+class _Compiler(object):
+    def __init__(self, engine):
+        import titus.pfaast
+        self.P = titus.pfaast
+        self.engine = engine
+        self.config = engine.config
+        self.slots = 0
+
+    def compile(self):
+        return self.sequence(self.config.action, {"input": self.inputValue()})
+
+    def inputValue(self):
+        inputType = json.loads(self.config.input.toJson())
+        if inputType in PRIMITIVE_TYPES:
+            return lambda env: env.column(None)
+        if isinstance(inputType, dict) and inputType.get("type") == "array":
+            return lambda env: env.matrix()
+        if isinstance(inputType, dict) and inputType.get("type") == "record":
+            fields = inputType["fields"]
+            if len(fields) == 1 and isinstance(fields[0]["type"], dict) and fields[0]["type"].get("type") == "array":
+                return {fields[0]["name"]: lambda env: env.matrix()}
+            record = {}
+            for field in fields:
+                if field["type"] not in PRIMITIVE_TYPES:
+                    raise Unsupported("input field of type {0}".format(field["type"]))
+                record[field["name"]] = lambda env, name=field["name"]: env.column(name)
+            return record
+        raise Unsupported("input of type {0}".format(inputType))
+
+    def sequence(self, exprs, scope):
+        scope = dict(scope)
+        for expr in exprs[:-1]:
+            if isinstance(expr, self.P.Let):
+                for name, value in expr.values.items():
+                    value = self.expr(value, scope)
+                    if callable(value):
+                        self.slots += 1
+                        value = _Local(self.slots, value)
+                    scope[name] = value
+            else:
+                # without side effects, only the value of the last expression matters
+                self.expr(expr, scope)
+        return self.expr(exprs[-1], scope)
+
+    def expr(self, node, scope):
+        P = self.P
+        if isinstance(node, (P.LiteralInt, P.LiteralLong, P.LiteralFloat, P.LiteralDouble,
+                             P.LiteralString, P.LiteralBoolean)):
+            return _Const(node.value)
+        if isinstance(node, P.Ref):
+            if node.name not in scope:
+                raise Unsupported("reference to {0}".format(node.name))
+            value = scope[node.name]
+            if isinstance(value, _Local):
+                return lambda env, slot=value.slot, fcn=value.fcn: env.local(slot, fcn)
+            return value
+        if isinstance(node, P.AttrGet):
+            return self.path(self.expr(node.expr, scope), node.path, scope)
+        if isinstance(node, P.CellGet):
+            cell = self.config.cells.get(node.cell)
+            if cell is None or cell.shared:
+                # other engines may write shared cells
+                raise Unsupported("cell {0}".format(node.cell))
+            return self.path(_Const(self.engine.cells[node.cell].value), node.path, scope)
+        if isinstance(node, P.If):
+            if node.elseClause is None:
+                raise Unsupported("if without else")
+            return self.select(self.expr(node.predicate, scope), self.sequence(node.thenClause, scope),
+                               self.sequence(node.elseClause, scope))
+        if isinstance(node, P.Cond):
+            if node.elseClause is None:
+                raise Unsupported("cond without else")
+            value = self.sequence(node.elseClause, scope)
+            for ifThen in reversed(node.ifthens):
+                value = self.select(self.expr(ifThen.predicate, scope), self.sequence(ifThen.thenClause, scope),
+                                    value)
+            return value
+        if isinstance(node, P.Do):
+            return self.sequence(node.body, scope)
+        if isinstance(node, P.NewObject):
+            return {name: self.expr(value, scope) for name, value in node.fields.items()}
+        if isinstance(node, P.NewArray):
+            items = [self.expr(item, scope) for item in node.items]
+            if any(isinstance(item, dict) for item in items):
+                raise Unsupported("array of records or maps")
+            if all(isinstance(item, _Const) for item in items):
+                return _Const([item.value for item in items])
+            return lambda env: np.column_stack([_perRow(item, env) for item in items])
+        if isinstance(node, P.Upcast):
+            return self.expr(node.expr, scope)
+        if isinstance(node, P.Call):
+            return self.call(node, scope)
+        raise Unsupported(type(node).__name__)
+
+    def path(self, value, path, scope):
+        for step in path:
+            key = self.expr(step, scope)
+            if not isinstance(key, _Const):
+                raise Unsupported("computed path")
+            key = key.value
+            if isinstance(value, dict):
+                if key not in value:
+                    raise Unsupported("field {0}".format(key))
+                value = value[key]
+            elif isinstance(value, _Const):
+                try:
+                    value = _Const(value.value[key])
+                except (KeyError, IndexError, TypeError):
+                    raise Unsupported("path {0}".format(key))
+            elif isinstance(key, int):
+                value = lambda env, array=value, key=key: array(env)[:, key]
+            else:
+                raise Unsupported("path {0}".format(key))
+        return value
+
+    def select(self, predicate, then, otherwise):
+        if isinstance(predicate, _Const):
+            return then if predicate.value else otherwise
+        if isinstance(predicate, dict) or isinstance(then, dict) or isinstance(otherwise, dict):
+            raise Unsupported("if with records or maps")
+
+        def evaluate(env):
+            mask = np.asarray(predicate(env), dtype=bool)
+            if mask.all():
+                return _perRow(then, env)
+            if not mask.any():
+                return _perRow(otherwise, env)
+            thenRows, otherRows = np.flatnonzero(mask), np.flatnonzero(~mask)
+            thenValues = _perRow(then, env.restrict(thenRows))
+            otherValues = _perRow(otherwise, env.restrict(otherRows))
+            out = np.empty((env.n,) + thenValues.shape[1:], dtype=np.result_type(thenValues, otherValues))
+            out[thenRows] = thenValues
+            out[otherRows] = otherValues
+            return out
+        return evaluate
+
+    def call(self, node, scope):
+        name = node.name
+        if name in CONSTANTS and not node.args:
+            return _Const(CONSTANTS[name])
+        if name == "model.tree.simpleWalk":
+            return self.simpleWalk(node, scope)
+        args = [self.expr(arg, scope) for arg in node.args]
+        if name == "model.reg.linear":
+            return self.linear(*args)
+        if name in ("map.argmax", "map.argmin"):
+            return self.mapArg(args[0], np.argmax if name == "map.argmax" else np.argmin)
+        if any(isinstance(arg, dict) for arg in args):
+            raise Unsupported("{0} of a record or map".format(name))
+        if name in ("a.argmax", "a.argmin"):
+            fcn = np.argmax if name == "a.argmax" else np.argmin
+            return self.apply(lambda a: fcn(np.asarray(a), axis=-1), args)
+        if name == "m.link.softmax":
+            return self.apply(_softmax, args)
+        if name not in ELEMENTWISE:
+            raise Unsupported("function {0}".format(name))
+        return self.apply(ELEMENTWISE[name], args)
+
+    @staticmethod
+    def apply(fcn, args):
+        if all(isinstance(arg, _Const) for arg in args):
+            try:
+                with np.errstate(all="ignore"):
+                    value = fcn(*[np.asarray(arg.value) if isinstance(arg.value, list) else arg.value
+                                  for arg in args])
+            except Exception as ex:  # pylint: disable=broad-except
+                # leave the error to titus, which raises it at run time
+                raise Unsupported(str(ex))
+            return _Const(value.tolist() if isinstance(value, np.ndarray) else value)
+        return lambda env: fcn(*[_raw(arg, env) for arg in args])
+
+    def linear(self, datum, model):
+        if not isinstance(model, _Const) or isinstance(datum, dict):
+            raise Unsupported("model.reg.linear with computed coefficients or a map")
+        try:
+            coeff = np.asarray(model.value["coeff"], dtype=float)
+            const = np.asarray(model.value["const"], dtype=float)
+        except (KeyError, TypeError, ValueError):
+            raise Unsupported("model.reg.linear model")
+        if coeff.ndim == 2:
+            coeff = coeff.T
+        elif coeff.ndim != 1:
+            raise Unsupported("model.reg.linear coefficients")
+        return self.apply(lambda X: np.dot(np.asarray(X, dtype=float), coeff) + const, [datum])
+
+    def mapArg(self, value, fcn):
+        if isinstance(value, _Const) and isinstance(value.value, dict):
+            value = {key: _Const(item) for key, item in value.value.items()}
+        if not isinstance(value, dict) or not value:
+            raise Unsupported("argmax of a computed map")
+        # titus breaks ties by the smallest key, argmax by the first column
+        items = sorted(value.items())
+        keys = np.empty(len(items), dtype=object)
+        keys[:] = [key for key, _ in items]
+        values = [item for _, item in items]
+        if all(isinstance(item, _Const) for item in values):
+            return _Const(keys[fcn([item.value for item in values])])
+        return lambda env: keys[fcn(np.column_stack([_perRow(item, env) for item in values]), axis=1)]
+
+    def simpleWalk(self, node, scope):
+        P = self.P
+        datumNode, treeNode, testNode = node.args
+        datum = self.expr(datumNode, scope)
+        if not isinstance(datum, dict) or not isinstance(treeNode, P.CellGet) or treeNode.path:
+            raise Unsupported("model.tree.simpleWalk of a computed tree")
+        if isinstance(testNode, P.FcnRef):
+            simple = testNode.name == "model.tree.simpleTest"
+        elif isinstance(testNode, P.FcnDef):
+            params = [next(iter(param)) for param in testNode.paramsPlaceholder]
+            body = testNode.body
+            simple = len(body) == 1 and isinstance(body[0], P.Call) and body[0].name == "model.tree.simpleTest" \
+                and [getattr(arg, "name", None) for arg in body[0].args] == params
+        else:
+            simple = False
+        if not simple:
+            raise Unsupported("model.tree.simpleWalk with a test other than model.tree.simpleTest")
+        self.expr(treeNode, scope)
+        tree = self.engine.cells[treeNode.cell].value
+        treeType = self.config.cells[treeNode.cell].avroPlaceholder.avroType.name
+
+        leaves = []
+        stack = [tree]
+        while stack:
+            treeNode = stack.pop()
+            if treeNode["field"] not in datum:
+                raise Unsupported("tree field {0}".format(treeNode["field"]))
+            if treeNode["operator"] not in TREE_OPERATORS and \
+                    treeNode["operator"] not in ("in", "notIn", "alwaysTrue", "alwaysFalse", "isMissing", "notMissing"):
+                raise Unsupported("tree operator {0}".format(treeNode["operator"]))
+            for branch in (treeNode["pass"], treeNode["fail"]):
+                if not isinstance(branch, dict):
+                    raise Unsupported("tree branch {0}".format(branch))
+                (tag, child), = branch.items()
+                if tag == treeType:
+                    stack.append(child)
+                elif isinstance(child, (dict, list)) or child is None:
+                    raise Unsupported("tree leaf {0}".format(child))
+                else:
+                    leaves.append(child)
+        if all(isinstance(leaf, bool) for leaf in leaves):
+            dtype = bool
+        elif all(isinstance(leaf, int) and not isinstance(leaf, bool) for leaf in leaves):
+            dtype = np.int64
+        elif all(isinstance(leaf, (int, float)) and not isinstance(leaf, bool) for leaf in leaves):
+            dtype = float
+        else:
+            dtype = object
+
+        def walk(env):
+            out = np.empty(env.n, dtype=dtype)
+            fields = {}
+            stack = [(tree, np.arange(env.n))]
+            while stack:
+                treeNode, rows = stack.pop()
+                field = treeNode["field"]
+                if field not in fields:
+                    fields[field] = _perRow(datum[field], env)
+                passed = _simpleTest(fields[field][rows], treeNode["operator"], _unwrap(treeNode["value"]))
+                for branch, branchRows in ((treeNode["pass"], rows[passed]), (treeNode["fail"], rows[~passed])):
+                    if len(branchRows):
+                        (tag, child), = branch.items()
+                        if tag == treeType:
+                            stack.append((child, branchRows))
+                        else:
+                            out[branchRows] = child
+            return out
+        return walk
+
+def _simpleTest(values, op, value):
+    if op in TREE_OPERATORS:
+        return np.asarray(TREE_OPERATORS[op](values, value), dtype=bool)
+    if op in ("in", "notIn"):
+        contained = np.isin(values, _unwrap(value))
+        return contained if op == "in" else ~contained
+    if op in ("alwaysTrue", "alwaysFalse"):
+        return np.full(len(values), op == "alwaysTrue")
+    missing = np.array([item is None for item in values], dtype=bool)
+    return missing if op == "isMissing" else ~missing
+
+class VectorizedPFA(object):
+    """NumPy evaluator of a PFA document, compiled by compilePFA.
+
+    outputFields are the names and Avro types of the outputs; int and long
+    outputs are returned as Python ints. predictBatch raises Unsupported for
+    int and long values out of their range, which titus reports as
+    overflows."""
+    def __init__(self, value, outputFields, outputIsRecord):
+        self.value = value
+        self.outputFields = outputFields
+        self.outputIsRecord = outputIsRecord
+
+    def predictBatch(self, X, columns):
+        """Score the rows of the 2-D array X whose columns are named by columns;
+        returns the same as ScoringModel.predictBatch."""
+        X = np.asarray(X)
+        env = _Env(X, {name: j for j, name in enumerate(columns)})
+        with np.errstate(all="ignore"):
+            if not self.outputIsRecord:
+                name, dataType = self.outputFields[0]
+                return {name: self._column(self.value, dataType, env)}
+            if isinstance(self.value, _Const):
+                return {name: self._column(_Const(self.value.value[name]), dataType, env)
+                        for name, dataType in self.outputFields}
+            if not isinstance(self.value, dict):
+                raise Unsupported("record output")
+            return {name: self._column(self.value[name], dataType, env) for name, dataType in self.outputFields}
+
+    @staticmethod
+    def _column(value, dataType, env):
+        limits = INTEGER_LIMITS.get(dataType)
+        if isinstance(value, _Const):
+            if limits is not None:
+                return [_integer(np.array([value.value], dtype=float), limits)[0]] * env.n
+            return [value.value] * env.n
+        values = _perRow(value, env)
+        if limits is not None:
+            return _integer(values, limits)
+        return values.tolist()
+
+def _integer(values, limits):
+    values = np.asarray(values, dtype=float)
+    if not (np.isfinite(values).all() and (values >= limits[0]).all() and (values <= limits[1]).all()):
+        raise Unsupported("integer out of range")
+    return values.astype(np.int64).tolist()
+
+def compilePFA(engine, outputFields, outputIsRecord):
+    """Return a VectorizedPFA for the titus engine, or None if its document
+    uses constructs the evaluator does not cover. outputFields are the names
+    and Avro types of its outputs."""
+    try:
+        compiler = _Compiler(engine)
+        value = compiler.compile()
+        if outputIsRecord and not isinstance(value, (dict, _Const)):
+            raise Unsupported("record output")
+        if not outputIsRecord and isinstance(value, dict):
+            raise Unsupported("map output")
+    except Unsupported as ex:
+        log.debug("PFA document is scored by titus: %s is not vectorized", ex)
+        return None
+    return VectorizedPFA(value, outputFields, outputIsRecord)
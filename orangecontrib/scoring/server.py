@@ -0,0 +1,389 @@
+"""Local HTTP scoring service with dynamic micro-batching.
+
+Usage::
+
+    orange-scoring serve model.pfa --port 8000 --max-batch-size 256 --max-wait 5
+
+Rows are posted as JSON to ``/predict``: an object mapping the model's input
+fields to values scores one row, a list of such objects (or of lists of values
+in the order of the input fields) scores many. For PFA models whose input is
+an array, a list of values scores one row and a list of lists many. Rows of concurrent requests are
+coalesced into batches of at most max-batch-size rows, waiting at most
+max-wait milliseconds for the batch to fill, and each batch is scored with a
+single ``predictBatch`` call on an executor thread. ``/stats`` reports the
+queue depth, the batch sizes and the request latency, and for models scored
+by pypmml the start time and memory of the JVM; ``/model`` the input and
+output fields.
+
+The server only speaks plain HTTP/1.1 and is meant for local use and load
+tests, not for exposure to untrusted networks.
+"""
+import asyncio
+import collections
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from orangecontrib.scoring.lib.gateway import pmmlGateway
+from orangecontrib.scoring.lib.parallel import ScoringPool, canRunParallel
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT = 0.005
+# Number of most recent requests whose latency is used for the percentiles in stats
+LATENCY_WINDOW = 10000
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+class RequestError(ValueError):
+    """Error in a request, reported to the client with the given HTTP status."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def _jsonValue(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _jsonValue(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonValue(item) for item in value]
+    return value
+
+def toArray(rows):
+    """Convert rows of JSON values into an array; a float array if all values
+    are numbers or null, else an object array."""
+    if all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+           for row in rows for value in row):
+        return np.array(rows, dtype=float).reshape(len(rows), -1)
+    X = np.empty((len(rows), len(rows[0]) if rows else 0), dtype=object)
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            X[i, j] = value
+    return X
+
+class MicroBatcher(object):
+    """Coalesce the rows of concurrent predict calls into batches of at most
+    maxBatchSize rows and score each batch with one model.predictBatch call
+    on executor.
+
+    A batch is scored as soon as it is full or maxWait seconds after its first
+    request arrived. Batches are scored one at a time; requests arriving
+    meanwhile form the next batch. If a batch fails, its requests are scored
+    separately, so an invalid request does not fail the others."""
+    def __init__(self, model, maxBatchSize=DEFAULT_MAX_BATCH_SIZE, maxWait=DEFAULT_MAX_WAIT,
+                 executor=None, pool=None):
+        self.model = model
+        self.pool = pool
+        self.columns = [name for name, _ in model.inputFields]
+        # the input of the model is a single array, whose values form a row
+        self.arrayInput = (model.type == "PFA" and not model.pfaInputIsRecord
+                           and model.inputFields[0][1].startswith("array"))
+        self.outputNames = [name for name, _ in model.outputFields]
+        self.maxBatchSize = maxBatchSize
+        self.maxWait = maxWait
+        self.executor = executor
+        self.queue = None
+        self.task = None
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.failedBatches = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.batchSeconds = 0.0
+        self.queuedRows = 0
+        self._carry = None
+
+    def start(self):
+        """Start batching; must be called from within the running event loop."""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def parseRows(self, rows):
+        """Return the list of value lists of rows, given as dicts keyed by input
+        fields or as lists of values in the order of the input fields. If the
+        input of the model is an array, a list is the value of the array, as in
+        ScoringModel.datumBuilder; all arrays of rows must be of equal length."""
+        if self.arrayInput:
+            return self._parseArrays(rows)
+        values = []
+        for row in rows:
+            if isinstance(row, dict):
+                missing = [name for name in self.columns if name not in row]
+                if missing:
+                    raise RequestError("Row has no value for model field(s) {0}".format(", ".join(missing)))
+                values.append([row[name] for name in self.columns])
+            elif isinstance(row, list):
+                if len(row) != len(self.columns):
+                    raise RequestError("Row has {0} values, model has {1} input fields".format(
+                        len(row), len(self.columns)))
+                values.append(row)
+            else:
+                raise RequestError("Rows must be JSON objects or arrays")
+        return values
+
+    def _parseArrays(self, rows):
+        name = self.columns[0]
+        values = []
+        for row in rows:
+            if isinstance(row, dict):
+                if name not in row:
+                    raise RequestError("Row has no value for model field {0}".format(name))
+                row = row[name]
+            if not isinstance(row, list):
+                raise RequestError("Rows must be JSON arrays or objects with an array {0}".format(name))
+            if values and len(row) != len(values[0]):
+                raise RequestError("Rows have arrays of {0} and {1} values".format(len(values[0]), len(row)))
+            values.append(row)
+        return values
+
+    async def predict(self, rows):
+        """Score the list of rows (see parseRows) and return the list of their
+        predictions, each a dict mapping output fields to values."""
+        values = self.parseRows(rows)
+        if not values:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self.queuedRows += len(values)
+        await self.queue.put((time.perf_counter(), values, future))
+        return await future
+
+    async def _next(self, timeout=None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._next()
+            batch = [first]
+            size = len(first[1])
+            deadline = first[0] + self.maxWait
+            while size < self.maxBatchSize:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self.queue.get_nowait() if timeout <= 0 else await self._next(timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if size + len(item[1]) > self.maxBatchSize:
+                    self._carry = item
+                    break
+                batch.append(item)
+                size += len(item[1])
+            self.queuedRows -= size
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self._scoreBatch, batch)
+            except Exception:  # pylint: disable=broad-except
+                log.debug("Batch of %d requests failed, scoring them separately", len(batch), exc_info=True)
+                self.failedBatches += 1
+                results = []
+                for item in batch:
+                    try:
+                        results.append(await loop.run_in_executor(self.executor, self._scoreBatch, [item]))
+                    except Exception as ex:  # pylint: disable=broad-except
+                        results.append(ex)
+                results = [result[0] if isinstance(result, list) else result for result in results]
+            finished = time.perf_counter()
+            self.batchSeconds += finished - started
+            self.batches += 1
+            self.rows += size
+            for (arrived, _, future), result in zip(batch, results):
+                self.requests += 1
+                self.latencies.append(finished - arrived)
+                if future.done():  # the client went away
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _scoreBatch(self, batch):
+        rows = [row for _, values, _ in batch for row in values]
+        X = toArray(rows)
+        columns = self.columns
+        if self.arrayInput:
+            # rows of requests with arrays of different lengths fail together
+            # and are scored separately
+            columns = ["{0}_{1}".format(columns[0], j) for j in range(X.shape[1])]
+        if self.pool is not None:
+            predictions = self.pool.predict(X, columns)
+        else:
+            predictions = self.model.predictBatch(X, columns)
+        columns = [predictions[name] for name in self.outputNames]
+        results = []
+        start = 0
+        for _, values, _ in batch:
+            stop = start + len(values)
+            results.append([dict(zip(self.outputNames, row))
+                            for row in zip(*[column[start:stop] for column in columns])])
+            start = stop
+        return results
+
+    def stats(self):
+        """Return a dict with the queue depth, counts of scored requests, rows
+        and batches, and the latency of recent requests in milliseconds."""
+        latencies = np.array(self.latencies) * 1000
+        latency = {"mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+        if len(latencies):
+            latency = dict(zip(("p50", "p95", "p99"), np.percentile(latencies, [50, 95, 99]).tolist()))
+            latency.update(mean=float(latencies.mean()), max=float(latencies.max()))
+        return {
+            "queueDepth": self.queue.qsize() + (self._carry is not None) if self.queue is not None else 0,
+            "queuedRows": self.queuedRows,
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "failedBatches": self.failedBatches,
+            "meanBatchSize": self.rows / self.batches if self.batches else None,
+            "meanBatchMilliseconds": self.batchSeconds * 1000 / self.batches if self.batches else None,
+            "latencyMilliseconds": latency,
+        }
+
+class ScoringServer(object):
+    """HTTP server scoring the JSON rows posted to /predict with model
+    through a MicroBatcher.
+
+    Use start and stop from within an event loop, or serveForever to run the
+    server in a new one. workers > 1 scores batches in a ScoringPool of
+    that many processes, if the model can be rebuilt in them."""
+    def __init__(self, model, host="127.0.0.1", port=8000, maxBatchSize=DEFAULT_MAX_BATCH_SIZE,
+                 maxWait=DEFAULT_MAX_WAIT, workers=1):
+        self.model = model
+        self.host = host
+        self.port = port
+        self.maxBatchSize = maxBatchSize
+        self.maxWait = maxWait
+        self.workers = workers
+        self.executor = None
+        self.pool = None
+        self.batcher = None
+        self.server = None
+
+    async def start(self):
+        # one thread: models are not guaranteed to be thread-safe
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        if self.workers > 1 and canRunParallel(self.model):
+            self.pool = ScoringPool(self.model, self.workers)
+        self.batcher = MicroBatcher(self.model, self.maxBatchSize, self.maxWait, self.executor, self.pool)
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # the actual port if port 0 was given
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.batcher is not None:
+            await self.batcher.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def serveForever(self):
+        async def serve():
+            await self.start()
+            log.info("Serving on http://%s:%d", self.host, self.port)
+            try:
+                await self.server.serve_forever()
+            finally:
+                await self.stop()
+        asyncio.run(serve())
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                method, path, version = (requestLine.decode("latin-1").split() + ["", "", ""])[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keepAlive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_SIZE:
+                        raise RequestError("Request body is larger than {0} bytes".format(MAX_BODY_SIZE), 413)
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = 200, await self._respond(method, path.split("?")[0], body)
+                except RequestError as ex:
+                    status, response = ex.status, {"error": str(ex)}
+                    keepAlive = keepAlive and ex.status != 413
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as ex:  # pylint: disable=broad-except
+                    log.debug("Scoring request failed", exc_info=True)
+                    status, response = 500, {"error": "{0}: {1}".format(type(ex).__name__, ex)}
+                payload = json.dumps(_jsonValue(response)).encode("utf-8")
+                writer.write("HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n"
+                             "Connection: {3}\r\n\r\n".format(status, REASONS[status], len(payload),
+                                                              "keep-alive" if keepAlive else "close")
+                             .encode("latin-1") + payload)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        if path == "/predict":
+            if method != "POST":
+                raise RequestError("Use POST to score rows", 405)
+            try:
+                data = json.loads(body.decode("utf-8"))
+            except ValueError as ex:
+                raise RequestError("Invalid JSON: {0}".format(ex))
+            if isinstance(data, dict):
+                return (await self.batcher.predict([data]))[0]
+            if isinstance(data, list):
+                if self.batcher.arrayInput and data and not isinstance(data[0], (list, dict)):
+                    # the values of the array of a single row
+                    return (await self.batcher.predict([data]))[0]
+                return await self.batcher.predict(data)
+            raise RequestError("Post a JSON object or a list of rows")
+        if method != "GET":
+            raise RequestError("Use GET for {0}".format(path), 405)
+        if path == "/stats":
+            stats = self.batcher.stats()
+            if self.model.usesJVM:
+                stats["jvm"] = pmmlGateway().stats()
+            return stats
+        if path == "/model":
+            return {"type": self.model.type,
+                    "inputFields": [list(field) for field in self.model.inputFields],
+                    "outputFields": [list(field) for field in self.model.outputFields]}
+        raise RequestError("Unknown path {0}".format(path), 404)
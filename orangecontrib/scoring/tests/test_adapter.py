@@ -0,0 +1,150 @@
+import json
+import os
+import unittest
+import numpy as np
+import scipy.sparse as sp
+
+from Orange.data import Domain, ContinuousVariable, DiscreteVariable
+
+from orangecontrib.scoring.lib import adapter as adapterModule
+from orangecontrib.scoring.lib.adapter import InputAdapter, coerceColumn
+from orangecontrib.scoring.lib.memo import RowMemo
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import getReader
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+RECORD = {
+    "input": {"type": "record", "name": "Input", "fields": [
+        {"name": "n", "type": "int"},
+        {"name": "l", "type": ["long", "null"]},
+        {"name": "b", "type": "boolean"},
+        {"name": "s", "type": "string"},
+        {"name": "x", "type": ["double", "null"]},
+    ]},
+    "output": "string",
+    "action": [
+        {"s.concat": [
+            {"s.concat": ["input.s", {"s.int": {"+": ["input.n", {"ifnotnull": {"v": "input.l"}, "then": "v",
+                                                                  "else": -1}]}}]},
+            {"if": {"&&": ["input.b", {"ifnotnull": {"v": "input.x"}, "then": True, "else": False}]},
+             "then": {"string": "+"}, "else": {"string": "-"}}]}
+    ]
+}
+
+class InputAdapterTests(unittest.TestCase):
+    def setUp(self):
+        self.model = ScoringModel.fromPFA(json.dumps(RECORD), ".json")
+        # columns in another order than the fields, categories of s as indices
+        self.columns = ["x", "s", "b", "l", "n", "unused"]
+        self.X = np.array([[0.5, 0, 1, 2, 3, 9],
+                           [np.nan, 1, 1, np.nan, 4, 9],
+                           [1.5, 2, 0, 5, 6, 9]])
+        self.categories = {"s": ("a", "b", "c")}
+
+    def test_coerce_column(self):
+        column = np.array([1.0, np.nan, 3.0])
+        self.assertEqual(coerceColumn(column, "int"), [1, None, 3])
+        self.assertIsInstance(coerceColumn(column, "int")[0], int)
+        self.assertEqual(coerceColumn(column, "bool"), [True, None, True])
+        self.assertEqual(coerceColumn(column, "str"), ["1", None, "3"])
+        self.assertEqual(coerceColumn(column, "float", nullable=True), [1.0, None, 3.0])
+        self.assertTrue(np.isnan(coerceColumn(column, "float")[1]))
+        self.assertEqual(coerceColumn(column, "str", categories=("a", "b", "c", "d")), ["b", None, "d"])
+        self.assertEqual(coerceColumn(np.array(["1", None, 2.5], dtype=object), "str"), ["1", None, "2.5"])
+        self.assertRaises(ValueError, coerceColumn, np.array([1.5]), "int")
+
+    def test_records(self):
+        adapter = InputAdapter(self.model, self.columns, self.categories)
+        records = list(adapter.records(self.X))
+        self.assertEqual(records[1], {"n": 4, "l": None, "b": True, "s": "b", "x": None})
+        self.assertEqual([self.model.predict(record) for record in records], ["a5+", "b3-", "c11-"])
+
+    def test_predict_batch(self):
+        X = self.X.astype(object)
+        X[:, 1] = ["a", "b", "c"]
+        self.assertIsNone(self.model.vectorized)
+        self.assertEqual(self.model.predictBatch(X, self.columns)["output_value"], ["a5+", "b3-", "c11-"])
+        self.assertIs(self.model.inputAdapter(self.columns), self.model.inputAdapter(self.columns))
+        self.assertRaises(ValueError, self.model.predictBatch, X[:, :3], self.columns[:3])
+
+    def test_prepare(self):
+        domain = Domain([ContinuousVariable("x"), DiscreteVariable("s", values=("a", "b", "c")),
+                         ContinuousVariable("b"), ContinuousVariable("l"), ContinuousVariable("n")])
+        adapter = InputAdapter.fromDomain(self.model, domain)
+        X, columns = adapter.prepare(self.X[:, :5])
+        self.assertEqual(columns, self.columns[:5])
+        self.assertEqual(X[:, 1].tolist(), ["a", "b", "c"])
+        self.assertIsNone(X[1, 0])
+        self.assertEqual(self.model.predictBatch(X, columns)["output_value"], ["a5+", "b3-", "c11-"])
+
+        domain = Domain([ContinuousVariable(name) for name in self.columns[:5]])
+        X = self.X[:, :5]
+        self.assertIs(InputAdapter.fromDomain(self.model, domain).prepare(X)[0], X)
+
+    def test_primitive_and_array_inputs(self):
+        model = ScoringModel.fromPFA('{"input": ["int", "null"], "output": "int", "action": '
+                                     '[{"ifnotnull": {"v": "input"}, "then": "v", "else": 0}]}', ".json")
+        self.assertEqual(list(model.inputAdapter(["a"]).records(np.array([[2.0], [np.nan]]))), [2, None])
+        model = ScoringModel.fromPFA('{"input": {"type": "array", "items": "long"}, "output": "long", '
+                                     '"action": [{"a.sum": ["input"]}]}', ".json")
+        self.assertEqual(model.predictBatch(np.array([[1.0, 2.0], [3.0, 4.0]]), ["a", "b"])["output_value"], [3, 7])
+
+
+class SparseInputTests(unittest.TestCase):
+    def setUp(self):
+        self.pfa = getReader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        self.pmml = getReader(os.path.join(TESTS_DIR, "sample_pmml.xml")).read()
+        # the fields of both models among many empty columns
+        fields = [name for name, _ in self.pfa.inputFields + self.pmml.inputFields]
+        self.columns = ["w{0}".format(j) for j in range(5000)]
+        self.positions = [17, 4000, 230, 9, 1234, 4999, 0, 2500]
+        for name, j in zip(fields, self.positions):
+            self.columns[j] = name
+        dense = np.random.RandomState(0).uniform(0, 7, size=(300, 8))
+        dense[dense < 1] = 0
+        self.dense = dense
+        X = sp.lil_matrix((300, 5000))
+        X[:, self.positions] = dense
+        self.X = X.tocsr()
+
+    def test_predict_batch(self):
+        for model, fields in ((self.pfa, slice(0, 4)), (self.pmml, slice(4, 8))):
+            names = [name for name, _ in model.inputFields]
+            expected = model.predictBatch(self.dense[:, fields], names)
+            self.assertEqual(model.predictBatch(self.X, self.columns), expected)
+            self.assertEqual(model.inputAdapter(self.columns).used, sorted(self.positions[fields]))
+
+    def test_blocks(self):
+        blockSize = adapterModule.SPARSE_BLOCK_SIZE
+        adapterModule.SPARSE_BLOCK_SIZE = 100
+        shapes = []
+        predictBatch = self.pfa.predictBatch
+        self.pfa.predictBatch = lambda X, columns: shapes.append(X.shape) or predictBatch(X, columns)
+        try:
+            result = self.pfa.predictBatch(self.X, self.columns)
+        finally:
+            adapterModule.SPARSE_BLOCK_SIZE = blockSize
+        self.assertEqual(shapes[0], (300, 5000))
+        self.assertEqual(shapes[1:], [(25, 4)] * 12)
+        self.assertEqual(len(result["output_value"]), 300)
+
+    def test_memo(self):
+        memo = RowMemo(self.pmml)
+        X = sp.vstack([self.X, self.X]).tocsr()
+        result = memo.predictBatch(X, self.columns)
+        self.assertEqual(result, self.pmml.predictBatch(X, self.columns))
+        self.assertEqual(memo.misses, 300)
+
+    def test_prepare(self):
+        domain = Domain([ContinuousVariable("x"), DiscreteVariable("s", values=("a", "b", "c")),
+                         ContinuousVariable("b"), ContinuousVariable("l"), ContinuousVariable("n"),
+                         ContinuousVariable("unused")])
+        model = ScoringModel.fromPFA(json.dumps(RECORD), ".json")
+        adapter = InputAdapter.fromDomain(model, domain)
+        X = sp.csr_matrix(np.array([[0.5, 0, 1, 2, 3, 9], [0, 1, 1, 0, 4, 9]]))
+        prepared, columns = adapter.prepare(X)
+        self.assertEqual(columns, ["x", "s", "b", "l", "n"])
+        self.assertEqual(prepared[:, 1].tolist(), ["a", "b"])
+        self.assertEqual(model.predictBatch(prepared, columns)["output_value"], ["a5+", "b4+"])
+        self.assertIs(InputAdapter(model, [var.name for var in domain.attributes]).prepare(X)[0], X)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib import arrowio
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class ArrowIOTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.table = pa.table({"x": pa.array([1.5, 2.5, 3.5, 4.5]),
+                               "n": pa.array([1, None, 3, 4]),
+                               "b": pa.array([True, False, None, True]),
+                               "s": pa.array(["a", "b", None, "a"]).dictionary_encode()})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_to_array(self):
+        batch = self.table.to_batches()[0]
+        X = arrowio.toArray(batch, ["x", "n", "b"])
+        self.assertEqual(X.dtype, float)
+        np.testing.assert_array_equal(X, [[1.5, 1, 1], [2.5, np.nan, 0], [3.5, 3, np.nan], [4.5, 4, 1]])
+        X = arrowio.toArray(batch, ["s", "x"])
+        self.assertEqual(X[:, 0].tolist(), ["a", "b", None, "a"])
+        self.assertEqual(X[:, 1].tolist(), [1.5, 2.5, 3.5, 4.5])
+
+    def test_iter_batches(self):
+        for name in ("input.parquet", "input.arrow"):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".parquet"):
+                pq.write_table(self.table, path)
+            else:
+                with pa.ipc.new_file(path, self.table.schema) as writer:
+                    writer.write_table(self.table)
+            self.assertEqual(arrowio.columnNames(path), ["x", "n", "b", "s"])
+            batches = list(arrowio.iterBatches(path, ["n", "x"], batchSize=3))
+            self.assertEqual([batch.num_rows for batch in batches], [3, 1])
+            self.assertEqual(arrowio.toArray(batches[1], ["x"]).tolist(), [[4.5]])
+
+    def test_prediction_writer(self):
+        outputFields = [("label", "string"), ("score", "double"), ("count", "int"), ("flag", "boolean")]
+        for name in ("output.parquet", "output.arrow"):
+            path = os.path.join(self.directory, name)
+            with arrowio.PredictionWriter(path, outputFields, ["label", "score", "count"]) as writer:
+                writer.write({"label": ["b", "a"], "score": [0.5, None], "count": [1, 2]})
+                writer.write({"label": ["c", None, "a"], "score": [1.0, 2.0, 3.0], "count": [3, 4, 5]})
+            if name.endswith(".parquet"):
+                table = pq.read_table(path)
+            else:
+                with pa.memory_map(path) as source:
+                    table = pa.ipc.open_file(source).read_all()
+            self.assertEqual(table.column_names, ["label", "score", "count"])
+            self.assertTrue(pa.types.is_dictionary(table.schema.field("label").type))
+            self.assertEqual(table.column("label").to_pylist(), ["b", "a", "c", None, "a"])
+            self.assertEqual(table.column("score").to_pylist(), [0.5, None, 1.0, 2.0, 3.0])
+            self.assertEqual(table.schema.field("count").type, pa.int64())
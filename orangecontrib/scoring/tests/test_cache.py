@@ -0,0 +1,69 @@
+import unittest, os, shutil, tempfile, time
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.cache import ModelCache
+
+PFA_WITH_CELLS_AND_FCNS = """
+input: double
+output: double
+cells:
+  offset: {type: double, init: 10}
+fcns:
+  square:
+    params: [{x: double}]
+    ret: double
+    do: {"*": [x, x]}
+action:
+  - {"+": [{u.square: input}, {cell: offset}]}
+"""
+
+
+class ModelCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ModelCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key = ModelCache.key("doc", "PFA", ".json")
+        self.assertEqual(key, ModelCache.key("doc", "PFA", ".json"))
+        self.assertNotEqual(key, ModelCache.key("doc2", "PFA", ".json"))
+        self.assertNotEqual(key, ModelCache.key("doc", "PFA", ".yaml"))
+
+    def test_store_load(self):
+        self.assertIsNone(self.cache.load("a"))
+        self.cache.store("a", b"123")
+        self.assertEqual(self.cache.load("a"), b"123")
+        self.cache.invalidate("a")
+        self.assertIsNone(self.cache.load("a"))
+
+    def test_lru_eviction(self):
+        self.cache.maxSize = 35
+        for i, key in enumerate("abc"):
+            self.cache.store(key, b"0123456789")
+            os.utime(os.path.join(self.directory, key), (i, i))
+        self.assertEqual(self.cache.load("a"), b"0123456789")
+        self.cache.store("d", b"0123456789")
+        self.assertIsNone(self.cache.load("b"))
+        self.assertIsNotNone(self.cache.load("c"))
+        self.assertIsNotNone(self.cache.load("a"))
+        self.assertIsNotNone(self.cache.load("d"))
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_pfa(self):
+        expected = ScoringModel.fromPFA(PFA_WITH_CELLS_AND_FCNS, ".yaml").predict(3.)
+        for _ in range(2):
+            model = ScoringModel.fromPFA(PFA_WITH_CELLS_AND_FCNS, ".yaml", cache=self.cache)
+            self.assertEqual(model.predict(3.), expected)
+            self.assertEqual(model.inputFields, [("input_value", "double")])
+        self.assertEqual(len(self.cache.entries()), 1)
+
+    def test_corrupt_entry(self):
+        key = ModelCache.key(PFA_WITH_CELLS_AND_FCNS, "PFA", ".yaml")
+        self.cache.store(key, b"not bytecode")
+        model = ScoringModel.fromPFA(PFA_WITH_CELLS_AND_FCNS, ".yaml", cache=self.cache)
+        self.assertEqual(model.predict(3.), 19.)
+        self.assertNotEqual(self.cache.load(key), b"not bytecode")
@@ -0,0 +1,97 @@
+import unittest, os, csv, json, shutil, tempfile
+import numpy as np
+
+from orangecontrib.scoring.cli import score, toArray, main
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class ScoreCommandTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, "input.csv")
+        self.output = os.path.join(self.directory, "output.csv")
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(25, 4))
+        with open(self.input, "w", newline="") as f:
+            writer = csv.writer(f)
+            # columns in another order than in the model, plus one the model does not use
+            writer.writerow(["petal_width_cm", "sepal_length_cm", "sepal_width_cm", "petal_length_cm", "id"])
+            writer.writerows([list(row[[3, 0, 1, 2]]) + ["row{0}".format(i)] for i, row in enumerate(self.X)])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_output(self):
+        with open(self.output, newline="") as f:
+            return list(csv.reader(f))
+
+    def test_score(self):
+        irisFile = os.path.join(TESTS_DIR, "sample_iris.json")
+        self.assertEqual(score(irisFile, self.input, self.output, chunkSize=7), 25)
+        model = PFAFormat.get_reader(irisFile).read()
+        expected = model.predictBatch(self.X, [name for name, _ in model.inputFields])["output_value"]
+        self.assertEqual(self.read_output(), [["output_value"]] + [[value] for value in expected])
+
+    @unittest.skipIf(pa is None, "pyarrow is not installed")
+    def test_arrow(self):
+        irisFile = os.path.join(TESTS_DIR, "sample_iris.json")
+        model = PFAFormat.get_reader(irisFile).read()
+        expected = model.predictBatch(self.X, [name for name, _ in model.inputFields])["output_value"]
+        columns = {name: self.X[:, j] for j, (name, _) in enumerate(model.inputFields)}
+        columns["id"] = ["row{0}".format(i) for i in range(25)]
+        parquetFile = os.path.join(self.directory, "input.parquet")
+        pq.write_table(pa.table(columns), parquetFile, row_group_size=10)
+        arrowFile = os.path.join(self.directory, "output.arrow")
+        self.assertEqual(score(irisFile, parquetFile, arrowFile, chunkSize=7), 25)
+        with pa.memory_map(arrowFile) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("output_value").type))
+        self.assertEqual(table.column("output_value").to_pylist(), expected)
+        main(["score", irisFile, parquetFile, "-o", self.output])
+        self.assertEqual(self.read_output(), [["output_value"]] + [[value] for value in expected])
+
+    def test_primitive_input(self):
+        with open(self.input, "w") as f:
+            f.write("x\n1\n2.5\n")
+        main(["score", os.path.join(TESTS_DIR, "sample_pfa.json"), self.input, "-o", self.output])
+        self.assertEqual(self.read_output(), [["output_value"], ["101.0"], ["102.5"]])
+
+    def test_errors(self):
+        irisFile = os.path.join(TESTS_DIR, "sample_iris.json")
+        self.assertRaisesRegex(ValueError, "no output field", lambda: score(irisFile, self.input, self.output,
+                                                                          columns=["cluster"]))
+        with open(self.input, "w") as f:
+            f.write("sepal_length_cm,sepal_width_cm\n1,2\n")
+        self.assertRaisesRegex(ValueError, "no column for model field", lambda: score(irisFile, self.input, self.output))
+        with self.assertRaises(SystemExit):
+            main(["score", irisFile, self.input, "-o", self.output])
+
+    def test_to_array(self):
+        X = toArray([["1", "?"], ["", "2.5"]], [True, True])
+        self.assertEqual(X.dtype, float)
+        np.testing.assert_array_equal(X, [[1, np.nan], [np.nan, 2.5]])
+        X = toArray([["1", "a"], ["2", "NA"]], [True, False])
+        self.assertEqual(X.tolist(), [[1., "a"], [2., None]])
+        # the dtype follows the fields, not the values of a chunk
+        self.assertEqual(toArray([["1", "2"]], [True, False]).tolist(), [[1., "2"]])
+
+    def test_string_fields(self):
+        doc = {"input": {"type": "record", "name": "Input", "fields": [
+            {"name": "zip", "type": "string"}, {"name": "x", "type": "double"}]},
+               "output": {"type": "record", "name": "Output", "fields": [
+                   {"name": "zip", "type": "string"}, {"name": "y", "type": "double"}]},
+               "action": [{"new": {"zip": "input.zip", "y": {"*": [2, "input.x"]}}, "type": "Output"}]}
+        modelFile = os.path.join(self.directory, "model.json")
+        with open(modelFile, "w") as f:
+            json.dump(doc, f)
+        with open(self.input, "w") as f:
+            f.write("x,zip\n1,01234\n2.5,ab12\n")
+        score(modelFile, self.input, self.output, chunkSize=1)
+        self.assertEqual(self.read_output(), [["zip", "y"], ["01234", "2.0"], ["ab12", "5.0"]])
@@ -0,0 +1,91 @@
+import os
+import shutil
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.compare import compareModels, latencySummary, pairFields
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import getReader
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class CompareModelsTests(unittest.TestCase):
+    def setUp(self):
+        irisFile = os.path.join(TESTS_DIR, "sample_iris.json")
+        self.incumbent = getReader(irisFile).read()
+        with open(irisFile) as f:
+            # moves the boundary between versicolor and virginica
+            self.challenger = ScoringModel.fromPFA(f.read().replace("4.8", "5.0"), ".json")
+        self.columns = [name for name, _ in self.incumbent.inputFields]
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(200, 4))
+
+    def test_agreement(self):
+        comparison = compareModels(self.incumbent, self.challenger, self.X, self.columns, names=["old", "new"])
+        expected = [self.incumbent.predictBatch(self.X, self.columns)["output_value"],
+                    self.challenger.predictBatch(self.X, self.columns)["output_value"]]
+        self.assertEqual([outputs["output_value"] for outputs in comparison.outputs], expected)
+        agreement, = comparison.agreements
+        differ = np.array([a != b for a, b in zip(*expected)])
+        self.assertTrue(differ.any())
+        self.assertAlmostEqual(agreement.rate, 1 - differ.mean())
+        np.testing.assert_array_equal(comparison.disagreeing(), differ)
+        self.assertEqual(agreement.labels, ["Iris-setosa", "Iris-versicolor", "Iris-virginica"])
+        self.assertEqual(agreement.confusion.sum(), 200)
+        self.assertEqual(agreement.confusion[2, 1], differ.sum())
+        lines = comparison.format(slowest=3)
+        self.assertTrue(lines[0].startswith("old: "))
+        self.assertIn("- {0} rows: Iris-virginica vs Iris-versicolor".format(differ.sum()), lines)
+
+    def test_latencies(self):
+        calls = []
+        for name, model in (("a", self.incumbent), ("b", self.challenger)):
+            model.predict = lambda datum, name=name, predict=model.predict: calls.append(name) or predict(datum)
+        comparison = compareModels(self.incumbent, self.challenger, self.X, self.columns, warmup=5)
+        self.assertEqual(len(calls), 2 * (5 + 200))
+        # the model scoring a row first alternates
+        self.assertEqual(calls[10:16], ["a", "b", "b", "a", "a", "b"])
+        self.assertEqual(comparison.latencies.shape, (200, 2))
+        self.assertTrue((comparison.latencies > 0).all())
+        slowest = comparison.slowest(5)
+        maxima = comparison.latencies.max(axis=1)
+        self.assertEqual(maxima[slowest[0]], maxima.max())
+        self.assertEqual(list(maxima[slowest]), sorted(maxima[slowest], reverse=True))
+        summary = comparison.summary(0)
+        self.assertEqual(summary["rows"], 200)
+        self.assertLessEqual(summary["p50"], summary["p99"])
+        self.assertLessEqual(summary["p99"], summary["max"])
+        self.assertAlmostEqual(summary["rowsPerSecond"], 200 / comparison.latencies[:, 0].sum())
+
+    def test_numeric_fields(self):
+        with open(os.path.join(TESTS_DIR, "sample_pmml.xml")) as f:
+            pmmlDoc = f.read()
+        native = ScoringModel.fromPMML(pmmlDoc)
+        columns = [name for name, _ in native.inputFields]
+        self.assertEqual(pairFields(native, native), [("cluster", "cluster"), ("cluster_name", "cluster_name"),
+                                                       ("distance", "distance")])
+        self.assertEqual(pairFields(native, self.incumbent), [("cluster", "output_value")])
+        self.assertRaises(ValueError, pairFields, native, self.incumbent, [("cluster", "label")])
+        comparison = compareModels(native, ScoringModel.fromPMML(pmmlDoc), self.X[:50], columns)
+        self.assertEqual(comparison.names, ["model1", "model2"])
+        self.assertEqual([agreement.rate for agreement in comparison.agreements], [1.0, 1.0, 1.0])
+        self.assertEqual(comparison.agreements[2].maxAbsDifference, 0)
+
+    @unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+    def test_pypmml(self):
+        with open(os.path.join(TESTS_DIR, "sample_pmml.xml")) as f:
+            pmmlDoc = f.read()
+        native = ScoringModel.fromPMML(pmmlDoc)
+        columns = [name for name, _ in native.inputFields]
+        comparison = compareModels(native, ScoringModel.fromPMML(pmmlDoc, native=False), self.X[:50], columns)
+        self.assertEqual([agreement.rate for agreement in comparison.agreements], [1.0, 1.0, 1.0])
+        distance = comparison.agreements[2]
+        self.assertFalse(distance.discrete)
+        self.assertLess(distance.maxAbsDifference, 1e-9)
+
+    def test_latency_summary(self):
+        self.assertEqual(latencySummary([]), {"rows": 0})
+        summary = latencySummary([0.001] * 99 + [0.1])
+        self.assertAlmostEqual(summary["p50"], 0.001)
+        self.assertAlmostEqual(summary["max"], 0.1)
+        self.assertAlmostEqual(summary["rowsPerSecond"], 100 / 0.199)
@@ -0,0 +1,80 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from orangecontrib.scoring.lib.cache import ModelCache
+from orangecontrib.scoring.lib.engines import EnginePool
+from orangecontrib.scoring.lib.model import ScoringModel
+
+# counts the scored rows in an unshared and a shared cell
+COUNTER = json.dumps({
+    "input": "double",
+    "output": "double",
+    "cells": {"mine": {"type": "int", "init": 0},
+              "all": {"type": "int", "init": 0, "shared": True}},
+    "action": [
+        {"cell": "mine", "to": {"params": [{"x": "int"}], "ret": "int", "do": {"+": ["x", 1]}}},
+        {"cell": "all", "to": {"params": [{"x": "int"}], "ret": "int", "do": {"+": ["x", 1]}}},
+        {"+": ["input", 1]}
+    ]
+})
+
+
+class EnginePoolTests(unittest.TestCase):
+    def test_checkout(self):
+        pool = EnginePool(["a", "b"])
+        self.assertEqual(len(pool), 2)
+        first = pool.checkout()
+        self.assertEqual(first, "a")
+        with pool.engine() as engine:
+            self.assertEqual(engine, "b")
+            self.assertEqual(pool.nFree, 0)
+            self.assertRaises(RuntimeError, pool.checkout, 0.01)
+        pool.checkin(first)
+        self.assertEqual(pool.nFree, 2)
+        # the engine used last is handed out first
+        self.assertEqual(pool.checkout(), "a")
+        self.assertRaises(ValueError, pool.checkin, "c")
+
+    def test_from_pfa(self):
+        model = ScoringModel.fromPFA(COUNTER, ".json", engines=4)
+        self.assertEqual(len(model.engines), 4)
+        self.assertIs(model.model, model.engines.engines[0])
+        # one compiled document, distinct engines
+        self.assertEqual(len({type(engine) for engine in model.engines.engines}), 1)
+        self.assertEqual(len({id(engine) for engine in model.engines.engines}), 4)
+        self.assertEqual(len(ScoringModel.fromPFA(COUNTER, ".json").engines), 1)
+
+        directory = tempfile.mkdtemp()
+        try:
+            cache = ModelCache(directory)
+            for _ in range(2):
+                model = ScoringModel.fromPFA(COUNTER, ".json", cache=cache, engines=3)
+                self.assertEqual(len(model.engines), 3)
+                self.assertEqual(model.predict(1.0), 2.0)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_concurrent_scoring(self):
+        model = ScoringModel.fromPFA(COUNTER, ".json", engines=4)
+        X = np.arange(4000, dtype=float).reshape(-1, 1)
+        barrier = threading.Barrier(4)
+
+        def score(start):
+            barrier.wait()
+            return model.predictBatch(X[start:start + 100], ["x"])["output_value"]
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(score, range(0, 4000, 100)))
+        self.assertEqual(sum(results, []), (X[:, 0] + 1).tolist())
+        engines = model.engines.engines
+        self.assertEqual(model.engines.nFree, 4)
+        # shared cells see the updates of all engines, others only their own
+        self.assertEqual(engines[0].cells["all"].value, 4000)
+        self.assertIs(engines[0].cells["all"], engines[3].cells["all"])
+        self.assertEqual(sum(engine.cells["mine"].value for engine in engines), 4000)
@@ -0,0 +1,62 @@
+import unittest, os, gc, shutil, time
+
+from orangecontrib.scoring.lib import gateway
+from orangecontrib.scoring.lib.gateway import PMMLGateway, formatStats
+from orangecontrib.scoring.lib.model import ScoringModel
+
+
+@unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+class PMMLGatewayTests(unittest.TestCase):
+    def setUp(self):
+        pmmlFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_pmml.xml")
+        with open(pmmlFile) as f:
+            self.pmml = f.read()
+        self.gateway = PMMLGateway(idleTimeout=0.1)
+
+    def tearDown(self):
+        self.gateway.shutdown()
+
+    def load(self):
+        model = ScoringModel(self.gateway.load(self.pmml), "PMML")
+        self.gateway.register(model)
+        return model
+
+    def test_shared_jvm(self):
+        first, second = self.load(), self.load()
+        stats = self.gateway.stats()
+        self.assertTrue(stats["running"])
+        self.assertEqual(stats["liveModels"], 2)
+        self.assertGreater(stats["coldStart"], 0)
+        self.assertGreater(stats["heapUsed"], 0)
+        self.assertGreater(stats["nonHeapCommitted"], 0)
+        if os.path.exists("/proc/self/status"):
+            self.assertGreater(stats["resident"], stats["heapUsed"])
+        self.assertIn("2 model(s)", formatStats(stats))
+        self.assertTrue(first.usesJVM)
+        self.assertEqual(first.predict({"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}),
+                         second.predict({"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}))
+
+    def test_idle_shutdown(self):
+        model = self.load()
+        del model
+        gc.collect()
+        self.assertEqual(self.gateway.liveModels, 0)
+        time.sleep(0.5)
+        self.assertFalse(self.gateway.stats()["running"])
+        model = self.load()
+        self.assertTrue(self.gateway.stats()["running"])
+
+    def test_configure(self):
+        saved = gateway._gateway
+        try:
+            os.environ[gateway.ENV_VARIABLE] = "-Xmx2g -Dname='a b'"
+            gateway._gateway = None
+            self.assertEqual(gateway.pmmlGateway().javaOpts, ["-Xmx2g", "-Dname=a b"])
+            self.assertIs(gateway.configure(["-Xmx4g"], idleTimeout=1), gateway.pmmlGateway())
+            self.assertEqual(gateway.pmmlGateway().javaOpts, ["-Xmx4g"])
+            self.assertEqual(gateway.pmmlGateway().idleTimeout, 1)
+            self.assertFalse(gateway.pmmlGateway().stats()["running"])
+            self.assertEqual(formatStats(gateway.pmmlGateway().stats()), "JVM not running")
+        finally:
+            del os.environ[gateway.ENV_VARIABLE]
+            gateway._gateway = saved
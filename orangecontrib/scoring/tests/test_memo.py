@@ -0,0 +1,62 @@
+import os
+import json
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.memo import RowMemo, isStateless, uniqueRows
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+
+class RowMemoTests(unittest.TestCase):
+    def setUp(self):
+        irisFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_iris.json")
+        self.model = PFAFormat.get_reader(irisFile).read()
+        self.columns = [name for name, _ in self.model.inputFields]
+        self.scored = []
+        predictBatch = self.model.predictBatch
+        self.model.predictBatch = lambda X, columns: self.scored.append(len(X)) or predictBatch(X, columns)
+        rand = np.random.RandomState(0)
+        self.X = rand.randint(0, 8, size=(2000, 4)).astype(float) / 2
+        self.X[::10, 1] = np.nan
+
+    def test_unique_rows(self):
+        X = np.array([[1., 2.], [3., np.nan], [1., 2.], [3., np.nan]])
+        keys, first, inverse = uniqueRows(X)
+        self.assertEqual(len(keys), 2)
+        np.testing.assert_array_equal(X[first][inverse], X)
+        keys, first, inverse = uniqueRows(np.array([["a", 1], ["b", 1], ["a", 1]], dtype=object))
+        self.assertEqual(keys, [("a", 1), ("b", 1)])
+        np.testing.assert_array_equal(inverse, [0, 1, 0])
+
+    def test_predict_batch(self):
+        expected = ScoringModel.predictBatch(self.model, self.X, self.columns)
+        self.scored.clear()
+        memo = RowMemo(self.model)
+        self.assertEqual(memo.predictBatch(self.X, self.columns), expected)
+        nUnique = len(uniqueRows(self.X)[0])
+        self.assertEqual(self.scored, [nUnique])
+        self.assertEqual(memo.misses, nUnique)
+        self.assertEqual(memo.predictBatch(self.X[::-1], self.columns)["output_value"], expected["output_value"][::-1])
+        self.assertEqual(self.scored, [nUnique])
+
+    def test_bounded(self):
+        memo = RowMemo(self.model, maxRows=10)
+        memo.predictBatch(self.X, self.columns)
+        self.assertEqual(len(memo._memo), 10)
+        memo.predictBatch(self.X[:1], self.columns[::-1])
+        self.assertEqual(len(memo._memo), 1)
+
+    def test_refuse_stateful(self):
+        doc = {"input": "double", "output": "double", "method": "map",
+               "cells": {"total": {"type": "double", "init": 0}},
+               "action": [{"cell": "total", "to": {"+": [{"cell": "total"}, "input"]}}]}
+        model = ScoringModel.fromPFA(json.dumps(doc), ".json")
+        self.assertFalse(isStateless(model))
+        self.assertRaises(NotImplementedError, RowMemo, model)
+        doc = {"input": "double", "output": "double", "action": [{"+": ["input", {"rand.double": [0, 1]}]}]}
+        self.assertFalse(isStateless(ScoringModel.fromPFA(json.dumps(doc), ".json")))
+        doc = {"input": "double", "output": "double",
+               "cells": {"scale": {"type": "double", "init": 2}},
+               "action": [{"*": ["input", {"cell": "scale"}]}]}
+        self.assertTrue(isStateless(ScoringModel.fromPFA(json.dumps(doc), ".json")))
@@ -0,0 +1,61 @@
+import unittest, os
+import numpy as np
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat
+
+
+class PredictBatchTests(unittest.TestCase):
+    def setUp(self):
+        irisFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_iris.json")
+        self.model = PFAFormat.get_reader(irisFile).read()
+        self.columns = [name for name, _ in self.model.inputFields]
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(50, 4))
+
+    def test_pfa_record_input(self):
+        batch = self.model.predictBatch(self.X, self.columns)
+        self.assertEqual(list(batch.keys()), ["output_value"])
+        expected = [self.model.predict(dict(zip(self.columns, row))) for row in self.X]
+        self.assertEqual(batch["output_value"], expected)
+
+    def test_pfa_column_order(self):
+        order = [3, 1, 0, 2]
+        batch = self.model.predictBatch(self.X[:, order], [self.columns[i] for i in order])
+        self.assertEqual(batch, self.model.predictBatch(self.X, self.columns))
+
+    def test_pfa_primitive_input(self):
+        model = ScoringModel.fromPFA('{"input": "double", "output": "double", "action": [{"+": ["input", 100]}]}', ".json")
+        batch = model.predictBatch(np.array([[1.], [2.5]]), ["input_value"])
+        self.assertEqual(batch, {"output_value": [101., 102.5]})
+
+    def test_pfa_array_input(self):
+        model = ScoringModel.fromPFA('{"input": {"type": "array", "items": "double"}, "output": "double", '
+                                     '"action": [{"a.sum": ["input"]}]}', ".json")
+        batch = model.predictBatch(np.array([[1., 2.], [3., 4.]]), ["a", "b"])
+        self.assertEqual(batch, {"output_value": [3., 7.]})
+
+    def test_pfa_record_output(self):
+        model = ScoringModel.fromPFA("""{
+    "input": {"type": "record", "name": "In", "fields": [{"name": "x", "type": "double"}]},
+    "output": {"type": "record", "name": "Out", "fields": [{"name": "y", "type": "double"},
+                                                            {"name": "z", "type": "double"}]},
+    "action": [{"new": {"y": {"+": ["input.x", 1]}, "z": {"*": ["input.x", 2]}}, "type": "Out"}]
+}""", ".json")
+        batch = model.predictBatch(np.array([[1.], [2.]]), ["x"])
+        self.assertEqual(batch, {"y": [2., 3.], "z": [2., 4.]})
+
+    def test_empty(self):
+        self.assertEqual(self.model.predictBatch(np.empty((0, 4)), self.columns), {"output_value": []})
+
+    def test_pmml(self):
+        pmmlFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_pmml.xml")
+        model = PMMLFormat.get_reader(pmmlFile).read()
+        columns = [name for name, _ in model.inputFields]
+        X = self.X.copy()
+        X[3, 1] = np.nan
+        batch = model.predictBatch(X, columns)
+        self.assertEqual(list(batch.keys()), ["cluster", "cluster_name", "distance"])
+        for i, row in enumerate(X):
+            expected = model.predict({name: None if np.isnan(value) else value for name, value in zip(columns, row)})
+            for name in batch:
+                self.assertEqual(batch[name][i], expected[name])
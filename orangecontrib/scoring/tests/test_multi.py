@@ -0,0 +1,53 @@
+import os
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.multi import MultiScorer, modelNames
+from orangecontrib.scoring.lib.readers import getReader
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class MultiScorerTests(unittest.TestCase):
+    def setUp(self):
+        self.pfa = getReader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        self.pmml = getReader(os.path.join(TESTS_DIR, "sample_pmml.xml")).read()
+        pfaColumns = [name for name, _ in self.pfa.inputFields]
+        pmmlColumns = [name for name, _ in self.pmml.inputFields]
+        # the columns of both models, in another order
+        self.columns = pmmlColumns[::-1] + pfaColumns
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(2500, 8))
+        self.expected = [self.pmml.predictBatch(self.X[:, 3::-1], pmmlColumns),
+                         self.pfa.predictBatch(self.X[:, 4:], pfaColumns)]
+
+    def test_names(self):
+        self.assertEqual(modelNames([self.pfa, self.pmml, self.pfa]), ["sample_iris", "sample_pmml", "sample_iris (2)"])
+        self.assertEqual(modelNames([self.pfa, self.pmml], ["champion", None]), ["champion", "sample_pmml"])
+
+    def test_predict_batch(self):
+        scorer = MultiScorer([self.pmml, self.pfa, self.pfa])
+        self.assertEqual([name for name, _ in scorer.outputFields],
+                         ["sample_pmml.cluster", "sample_pmml.cluster_name", "sample_pmml.distance",
+                          "sample_iris.output_value", "sample_iris (2).output_value"])
+        for workers in (1, 3):
+            result = scorer.predictBatch(self.X, self.columns, workers=workers, chunkSize=1000)
+            self.assertEqual(result["sample_pmml.distance"], self.expected[0]["distance"])
+            self.assertEqual(result["sample_iris.output_value"], self.expected[1]["output_value"])
+            self.assertEqual(result["sample_iris (2).output_value"], self.expected[1]["output_value"])
+
+    def test_assemblers(self):
+        scorer = MultiScorer([self.pmml, self.pfa])
+        assemblers, Y = scorer.assemblers(len(self.X))
+        for i, start, _, batch in scorer.iterPredict(self.X, self.columns, workers=2, chunkSize=700):
+            assemblers[i].add(start, batch)
+        self.assertEqual(Y.shape, (2500, 4))
+        np.testing.assert_array_equal(Y[:, 2], self.expected[0]["distance"])
+        variables = [var for assembler in assemblers for var in assembler.outputVariables()]
+        self.assertEqual(variables[3].name, "sample_iris.output_value")
+        self.assertEqual([variables[3].values[int(i)] for i in Y[:5, 3]], self.expected[1]["output_value"][:5])
+
+    def test_prepare_once(self):
+        scorer = MultiScorer([self.pfa, self.pmml])
+        inputs = scorer.prepare(self.X, self.columns)
+        self.assertIs(inputs[0][0], self.X)
+        self.assertIs(inputs[0], inputs[1])
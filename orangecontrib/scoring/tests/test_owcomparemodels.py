@@ -0,0 +1,56 @@
+import os
+import numpy as np
+
+from Orange.data import Table, Domain, ContinuousVariable
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.scoring.widgets.owcomparemodels import OWCompareModels
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class TestOWCompareModels(WidgetTest):
+    def setUp(self):
+        self.widget = self.create_widget(OWCompareModels)
+        irisFile = os.path.join(TESTS_DIR, "sample_iris.json")
+        self.incumbent = PFAFormat.get_reader(irisFile).read()
+        with open(irisFile) as f:
+            self.challenger = ScoringModel.fromPFA(f.read().replace("4.8", "5.0"), ".json")
+        iris = Table("iris")
+        domain = Domain([ContinuousVariable(name) for name, _ in self.incumbent.inputFields],
+                        iris.domain.class_var)
+        self.data = Table.from_numpy(domain, iris.X, iris.Y)
+
+    def test_compare(self):
+        self.send_signal(self.widget.Inputs.data, self.data)
+        self.send_signal(self.widget.Inputs.incumbent, self.incumbent)
+        self.assertFalse(self.widget.apply_button.isEnabled())
+        self.send_signal(self.widget.Inputs.challenger, self.challenger)
+        self.assertTrue(self.widget.apply_button.isEnabled())
+        self.widget.compare()
+        output = self.get_output(self.widget.Outputs.comparison)
+        self.assertEqual([var.name for var in output.domain.class_vars],
+                         ["sample_iris.output_value", "model2.output_value"])
+        self.assertEqual([var.name for var in output.domain.metas],
+                         ["iris", "sample_iris latency (ms)", "model2 latency (ms)", "agree"])
+        self.assertIs(output.X, self.data.X)
+        comparison = self.widget.comparison
+        np.testing.assert_array_equal(output.get_column("agree"), ~comparison.disagreeing())
+        disagreements = self.get_output(self.widget.Outputs.disagreements)
+        self.assertEqual(len(disagreements), comparison.disagreeing().sum())
+        self.assertEqual(len(self.get_output(self.widget.Outputs.slowest)), 10)
+        self.widget.controls.n_slowest.setValue(3)
+        self.assertEqual(len(self.get_output(self.widget.Outputs.slowest)), 3)
+
+        self.send_signal(self.widget.Inputs.challenger, None)
+        self.assertIsNone(self.get_output(self.widget.Outputs.comparison))
+        self.assertFalse(self.widget.apply_button.isEnabled())
+
+    def test_missing_fields(self):
+        self.send_signal(self.widget.Inputs.data, Table("iris"))
+        self.send_signal(self.widget.Inputs.incumbent, self.incumbent)
+        self.send_signal(self.widget.Inputs.challenger, self.challenger)
+        self.assertTrue(self.widget.Error.fields.is_shown())
+        self.assertFalse(self.widget.apply_button.isEnabled())
@@ -0,0 +1,232 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import scipy.sparse as sp
+
+from Orange.data import Table, Domain, ContinuousVariable, DiscreteVariable
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.scoring.lib import timing
+from orangecontrib.scoring.lib.tablecache import PredictionCache
+from orangecontrib.scoring.widgets.owevaluate import Cancelled, OWEvaluate, run
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+
+class TestOWEvaluate(WidgetTest):
+    def setUp(self):
+        self.widget = self.create_widget(OWEvaluate)
+        irisFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_iris.json")
+        self.model = PFAFormat.get_reader(irisFile).read()
+        iris = Table("iris")
+        domain = Domain([ContinuousVariable(name) for name, _ in self.model.inputFields])
+        self.data = Table.from_numpy(domain, iris.X)
+
+    def test_score(self):
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.assertTrue(self.widget.apply_button.isEnabled())
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual(len(output), len(self.data))
+        self.assertEqual(output.domain.class_var.name, "output_value")
+        self.assertEqual(output.domain.class_var.values, ("Iris-setosa", "Iris-versicolor", "Iris-virginica"))
+        np.testing.assert_array_equal(output.X, self.data.X)
+        self.assertEqual(self.widget.apply_button.text(), "Score")
+
+    def test_score_sparse(self):
+        data = Table.from_numpy(self.data.domain, sp.csr_matrix(self.data.X))
+        self.widget.set_model(self.model)
+        self.widget.set_data(data)
+        self.assertTrue(self.widget.apply_button.isEnabled())
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertTrue(sp.issparse(output.X))
+        self.widget.set_data(self.data)
+        self.widget.score()
+        np.testing.assert_array_equal(output.Y, self.get_output(self.widget.Outputs.predictions).Y)
+
+    def test_score_data_with_class(self):
+        domain = Domain([ContinuousVariable(name) for name, _ in self.model.inputFields],
+                        Table("iris").domain.class_var)
+        data = Table.from_numpy(domain, self.data.X, Table("iris").Y)
+        self.widget.set_model(self.model)
+        self.widget.set_data(data)
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual(output.domain.metas, data.domain.class_vars)
+        np.testing.assert_array_equal(output.metas[:, 0].astype(float), data.Y)
+        self.assertIsNotNone(self.get_output(self.widget.Outputs.evaluations_results))
+
+    def test_rescore_appended_rows(self):
+        scored = []
+        predictBatch = self.model.predictBatch
+        self.model.predictBatch = lambda X, columns: scored.append(len(X)) or predictBatch(X, columns)
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data[:100])
+        self.widget.score()
+        first = self.get_output(self.widget.Outputs.predictions)
+        self.widget.set_data(self.data[:100])
+        self.widget.score()
+        self.get_output(self.widget.Outputs.predictions)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual(scored, [100, 50])
+        self.assertEqual(len(output), len(self.data))
+        np.testing.assert_array_equal(output.Y[:100], first.Y)
+
+    def test_rescore_reordered_values(self):
+        model = ScoringModel.fromPFA('{"input": {"type": "record", "name": "Input", "fields": '
+                                     '[{"name": "color", "type": "string"}]}, "output": "string", '
+                                     '"action": {"s.concat": ["input.color", {"string": "!"}]}}', ".json")
+        self.widget.set_model(model)
+        for values, expected in ((("red", "blue"), ("red!", "blue!")), (("blue", "red"), ("blue!", "red!"))):
+            domain = Domain([DiscreteVariable("color", values=values)])
+            self.widget.set_data(Table.from_numpy(domain, np.array([[0.], [1.]])))
+            self.widget.score()
+            output = self.get_output(self.widget.Outputs.predictions)
+            self.assertEqual(tuple(str(row.get_class()) for row in output), expected)
+
+    def test_rescore_on_model_change(self):
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.set_model(self.model)
+        self.assertIsNone(self.widget.task)
+        self.widget.score()
+        self.get_output(self.widget.Outputs.predictions)
+        self.widget.controls.rescore.setChecked(True)
+        self.widget.set_model(self.model)
+        self.assertIsNotNone(self.widget.task)
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual(len(output), len(self.data))
+
+    def test_deduplicate(self):
+        scored = []
+        predictBatch = self.model.predictBatch
+        self.model.predictBatch = lambda X, columns: scored.append(len(X)) or predictBatch(X, columns)
+        self.widget.controls.deduplicate.setChecked(True)
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual(scored, [len(np.unique(self.data.X, axis=0))])
+        self.assertEqual(len(output), len(self.data))
+        self.assertFalse(self.widget.Warning.deduplication.is_shown())
+
+    def test_new_signal_discards_running_task(self):
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        self.assertIsNotNone(self.widget.task)
+        self.widget.set_data(None)
+        self.assertIsNone(self.widget.task)
+        self.assertIsNone(self.get_output(self.widget.Outputs.predictions))
+
+    def test_cancel(self):
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        self.assertEqual(self.widget.apply_button.text(), "Cancel")
+        self.widget.score()
+        self.assertIsNone(self.widget.task)
+        self.assertEqual(self.widget.apply_button.text(), "Score")
+
+    def test_cancelled_task(self):
+        class State:
+            def is_interruption_requested(self):
+                return True
+
+        cache = PredictionCache()
+        self.assertRaises(Cancelled, run, self.data, self.model, 10, 1, cache, None, 0, None, state=State())
+        self.assertEqual(cache.entries, [])
+        self.widget.on_exception(Cancelled())
+        self.assertFalse(self.widget.Error.scoring.is_shown())
+
+    def test_profile(self):
+        self.widget.controls.profile.setChecked(True)
+        self.widget.controls.profile_rows.setValue(20)
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        self.assertEqual(len(self.get_output(self.widget.Outputs.predictions)), len(self.data))
+        text = self.widget.profileLabel.text()
+        self.assertIn("Rows profiled: 20", text)
+        filename = text.split("<br/>")[0][len("Profile saved to "):]
+        self.assertTrue(os.path.exists(filename))
+        os.remove(filename)
+
+        self.widget.controls.profile.setChecked(False)
+        self.widget.set_data(self.data[:10])
+        self.widget.score()
+        self.assertEqual(self.widget.profileLabel.text(), "")
+
+    def test_profile_stateful_model(self):
+        model = ScoringModel.fromPFA('{"input": "double", "output": "double", '
+                                     '"cells": {"n": {"type": "double", "init": 0}}, '
+                                     '"action": [{"cell": "n", "to": {"+": [{"cell": "n"}, 1]}}, {"cell": "n"}]}',
+                                     ".json")
+        data = Table.from_numpy(Domain([ContinuousVariable("x")]), np.zeros((5, 1)))
+        self.widget.controls.profile.setChecked(True)
+        self.widget.controls.profile_rows.setValue(3)
+        self.widget.set_model(model)
+        self.widget.set_data(data)
+        self.widget.score()
+        np.testing.assert_array_equal(self.get_output(self.widget.Outputs.predictions).Y, [1, 2, 3, 4, 5])
+        self.assertIn("Rows profiled: 3", self.widget.profileLabel.text())
+        os.remove(self.widget.profileLabel.text().split("<br/>")[0][len("Profile saved to "):])
+
+        # cached predictions are neither scored nor profiled
+        self.widget.set_data(data)
+        self.widget.score()
+        np.testing.assert_array_equal(self.get_output(self.widget.Outputs.predictions).Y, [1, 2, 3, 4, 5])
+        self.assertEqual(self.widget.profileLabel.text(), "")
+
+    def test_on_disk(self):
+        self.widget.controls.on_disk.setChecked(True)
+        self.widget.set_model(self.model)
+        self.widget.set_data(self.data)
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        base = output.Y
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+        self.assertEqual(output.domain.class_var.values, ("Iris-setosa", "Iris-versicolor", "Iris-virginica"))
+
+    def test_on_disk_cache_hit(self):
+        class State:
+            def is_interruption_requested(self):
+                return False
+
+            def set_progress_value(self, value):
+                pass
+
+            def set_status(self, text):
+                pass
+
+        cache = PredictionCache()
+        scratch = tempfile.gettempdir()
+        assembler, _ = run(self.data, self.model, 100, 1, cache, None, 0, scratch, state=State())
+        # predictions of the same data are taken from the cache without
+        # allocating another file
+        with patch("orangecontrib.scoring.widgets.owevaluate.memmapArray") as memmapArray:
+            self.assertIs(run(self.data, self.model, 100, 1, cache, None, 0, scratch, state=State())[0], assembler)
+        memmapArray.assert_not_called()
+
+    def test_record_timings(self):
+        wasEnabled = timing.isEnabled()
+        try:
+            self.widget.controls.record_timings.setChecked(True)
+            self.assertTrue(timing.isEnabled())
+            self.widget.set_model(self.model)
+            self.widget.set_data(self.data)
+            self.widget.score()
+            self.get_output(self.widget.Outputs.predictions)
+            text = self.widget.timingsLabel.text()
+            for name in ("predict", "encodeOutput", "score", "buildTable"):
+                self.assertIn(name, text)
+        finally:
+            timing.enable(wasEnabled)
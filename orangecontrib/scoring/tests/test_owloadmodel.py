@@ -1,8 +1,9 @@
-import unittest, os
+import unittest, os, shutil, tempfile
 from Orange.widgets.tests.base import WidgetTest
 
-from orangecontrib.scoring.widgets.owloadmodel import getPFAField, OWLoadModel, ScoringModel, \
-    PFAFormat, PMMLFormat, PFAReader, PMMLReader
+from orangecontrib.scoring.widgets.owloadmodel import OWLoadModel, ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat, PFAReader, PMMLReader, fileDigest
+from orangecontrib.scoring.lib.utils import getPFAField
 
 
 class PFAFieldTests(unittest.TestCase):
@@ -290,6 +291,13 @@ class ReaderTests(unittest.TestCase):
         pfaFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_pfa.json")
         self.assertEqual(PFAFormat.get_reader(pfaFile).read().type, "PFA")
 
+    def test_digest(self):
+        pfaFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_pfa.json")
+        reader = PFAFormat.get_reader(pfaFile)
+        self.assertIsNone(reader.digest)
+        reader.read()
+        self.assertEqual(reader.digest, fileDigest(pfaFile))
+
 class TestOWLoadModel(WidgetTest):
     def setUp(self):
         self.widget = self.create_widget(OWLoadModel)
@@ -304,4 +312,77 @@ class TestOWLoadModel(WidgetTest):
     def test_describe_pmml(self):
         self.assertEqual(
             OWLoadModel._describe(PMMLFormat.get_reader(self.pmmlFile).read()), 
-            'Input fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;sepal_length (double), sepal_width (double), petal_length (double), petal_width (double)<br/>Output fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;cluster (string), cluster_name (string), distance (real)<br/>Target fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;None')
\ No newline at end of file
+            'Input fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;sepal_length (double), sepal_width (double), petal_length (double), petal_width (double)<br/>Output fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;cluster (string), cluster_name (string), distance (real)<br/>Target fields(s):<br/>&nbsp;&nbsp;&nbsp;&nbsp;None')
+
+    @unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+    def test_describe_jvm(self):
+        with open(self.pmmlFile) as f:
+            model = ScoringModel.fromPMML(f.read(), native=False)
+        self.assertIn("JVM:<br/>&nbsp;&nbsp;&nbsp;&nbsp;started in ", OWLoadModel._describe(model))
+
+    def test_watch(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "model.json")
+            shutil.copy(self.pfaFile, path)
+            self.widget.add_path(path)
+            self.widget.load_data()
+            self.widget.controls.watch.setChecked(True)
+            self.assertIn(path, self.widget.watcher.files())
+            model = self.widget.data
+            self.assertEqual(model.predict(1), 101)
+
+            # unchanged content is not parsed again
+            os.utime(path)
+            self.widget.check_file()
+            self.assertIs(self.widget.data, model)
+
+            # the new model is swapped in and sent
+            with open(path) as f:
+                document = f.read().replace("100", "200")
+            with open(path + ".tmp", "w") as f:
+                f.write(document)
+            os.replace(path + ".tmp", path)
+            self.widget.check_file()
+            self.assertEqual(self.widget.data.predict(1), 201)
+            self.assertIs(self.get_output(self.widget.Outputs.data), self.widget.data)
+
+            # an invalid file keeps the previous model
+            model = self.widget.data
+            with open(path, "w") as f:
+                f.write("{")
+            self.widget.check_file()
+            self.assertIs(self.widget.data, model)
+            self.assertTrue(self.widget.Warning.reload_failed.is_shown())
+
+            self.widget.controls.watch.setChecked(False)
+            self.assertEqual(self.widget.watcher.files(), [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_no_check_while_loading(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "model.json")
+            shutil.copy(self.pfaFile, path)
+            self.widget.add_path(path)
+            self.widget.controls.watch.setChecked(True)
+            self.widget.load_data()
+            model = self.widget.data
+            reads = []
+
+            class SlowReader(object):
+                # a check due while the file is read, e.g. by a timer
+                def read(reader, progress=None):
+                    reads.append(path)
+                    with open(path, "a") as f:
+                        f.write(" ")
+                    self.widget.check_file()
+                    return model
+
+            self.assertIs(self.widget._read(SlowReader()), model)
+            self.assertEqual(reads, [path])
+            self.assertFalse(self.widget.loading)
+            self.assertTrue(self.widget.watch_timer.isActive())
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+
+from Orange.data import Table, Domain, ContinuousVariable
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.scoring.widgets.owmultievaluate import OWMultiEvaluate
+from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class TestOWMultiEvaluate(WidgetTest):
+    def setUp(self):
+        self.widget = self.create_widget(OWMultiEvaluate)
+        self.pfa = PFAFormat.get_reader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        self.pmml = PMMLFormat.get_reader(os.path.join(TESTS_DIR, "sample_pmml.xml")).read()
+        iris = Table("iris")
+        names = [name for name, _ in self.pfa.inputFields + self.pmml.inputFields]
+        domain = Domain([ContinuousVariable(name) for name in names], iris.domain.class_var)
+        self.data = Table.from_numpy(domain, np.hstack((iris.X, iris.X)), iris.Y)
+
+    def test_score(self):
+        self.send_signal(self.widget.Inputs.data, self.data)
+        self.send_signal(self.widget.Inputs.models, self.pfa, 0)
+        self.send_signal(self.widget.Inputs.models, self.pmml, 1)
+        self.assertTrue(self.widget.apply_button.isEnabled())
+        self.widget.score()
+        output = self.get_output(self.widget.Outputs.predictions)
+        self.assertEqual([var.name for var in output.domain.class_vars],
+                         ["sample_iris.output_value", "sample_pmml.cluster", "sample_pmml.cluster_name",
+                          "sample_pmml.distance"])
+        self.assertEqual(output.domain.metas, self.data.domain.class_vars)
+        self.assertIs(output.X, self.data.X)
+        expected = self.pfa.predictBatch(self.data.X[:, :4], [name for name, _ in self.pfa.inputFields])
+        var = output.domain.class_vars[0]
+        self.assertEqual([var.values[int(i)] for i in output.Y[:, 0]], expected["output_value"])
+
+        self.send_signal(self.widget.Inputs.models, None, 1)
+        self.assertIsNone(self.get_output(self.widget.Outputs.predictions))
+        self.assertTrue(self.widget.apply_button.isEnabled())
+
+    def test_missing_fields(self):
+        self.send_signal(self.widget.Inputs.data, Table("iris"))
+        self.send_signal(self.widget.Inputs.models, self.pfa, 0)
+        self.assertTrue(self.widget.Error.fields.is_shown())
+        self.assertFalse(self.widget.apply_button.isEnabled())
@@ -0,0 +1,61 @@
+import unittest, os, tempfile
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+from orangecontrib.scoring.lib.parallel import predictParallel, predictToDisk, canRunParallel
+
+
+class PredictParallelTests(unittest.TestCase):
+    def setUp(self):
+        irisFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_iris.json")
+        self.model = PFAFormat.get_reader(irisFile).read()
+        self.columns = [name for name, _ in self.model.inputFields]
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(500, 4))
+
+    def test_row_order(self):
+        progress = []
+        result = predictParallel(self.model, self.X, self.columns, workers=2, chunkSize=50,
+                                 callback=progress.append)
+        self.assertEqual(result, self.model.predictBatch(self.X, self.columns))
+        self.assertEqual(progress[-1], len(self.X))
+        self.assertEqual(progress, sorted(progress))
+
+    def test_sparse(self):
+        X = sp.csr_matrix(np.where(self.X < 3, 0, self.X))
+        result = predictParallel(self.model, X, self.columns, workers=2, chunkSize=50)
+        self.assertEqual(result, self.model.predictBatch(X.toarray(), self.columns))
+
+    def test_sequential(self):
+        progress = []
+        result = predictParallel(self.model, self.X, self.columns, workers=1, chunkSize=200,
+                                 callback=progress.append)
+        self.assertEqual(result, self.model.predictBatch(self.X, self.columns))
+        self.assertEqual(progress, [200, 400, 500])
+
+    def test_interrupt(self):
+        def callback(scored):
+            raise RuntimeError("interrupted")
+        self.assertRaisesRegex(RuntimeError, "interrupted",
+                               lambda: predictParallel(self.model, self.X, self.columns, workers=2,
+                                                       chunkSize=50, callback=callback))
+
+    def test_to_disk(self):
+        expected = self.model.predictBatch(self.X, self.columns)["output_value"]
+        with tempfile.TemporaryDirectory() as directory:
+            progress = []
+            assembler = predictToDisk(self.model, self.X, self.columns, directory, workers=2, chunkSize=50,
+                                      callback=progress.append)
+            self.assertIsInstance(assembler.Y, np.memmap)
+            self.assertEqual(progress[-1], len(self.X))
+            values = assembler.outputVariables()[0].values
+            self.assertEqual([values[int(i)] for i in assembler.Y[:, 0]], expected)
+            del assembler
+
+    def test_model_without_document(self):
+        model = ScoringModel(self.model.model, "PFA")
+        self.assertFalse(canRunParallel(model))
+        self.assertTrue(canRunParallel(self.model))
+        self.assertEqual(predictParallel(model, self.X, self.columns, workers=2, chunkSize=50),
+                         self.model.predictBatch(self.X, self.columns))
@@ -0,0 +1,311 @@
+import os
+import json
+import shutil
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.pmml import NativePMML, compilePMML
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<PMML version="4.3" xmlns="http://www.dmg.org/PMML-4_3">
+  <Header/>
+  <DataDictionary>
+    <DataField name="x1" optype="continuous" dataType="double">
+      <Interval closure="closedClosed" leftMargin="-6" rightMargin="6"/>
+    </DataField>
+    <DataField name="x2" optype="continuous" dataType="double"/>
+    <DataField name="c" optype="categorical" dataType="string">
+      <Value value="a"/><Value value="b"/><Value value="c"/>
+    </DataField>
+    <DataField name="y" optype="categorical" dataType="string">
+      <Value value="p"/><Value value="q"/>
+    </DataField>
+    <DataField name="t" optype="continuous" dataType="double"/>
+  </DataDictionary>
+"""
+
+def schema(target, fields=("x1", "x2", "c")):
+    return "<MiningSchema>{0}{1}</MiningSchema>".format(
+        "".join('<MiningField name="{0}"/>'.format(name) for name in fields),
+        '<MiningField name="{0}" usageType="target"/>'.format(target) if target else "")
+
+def document(model):
+    return HEADER + model + "</PMML>"
+
+CLASSIFICATION_TREE = document("""
+  <TreeModel functionName="classification" missingValueStrategy="lastPrediction">""" + schema("y") + """
+    <Node id="0" score="p" recordCount="10">
+      <True/>
+      <ScoreDistribution value="p" recordCount="6"/><ScoreDistribution value="q" recordCount="4"/>
+      <Node id="1" score="q" recordCount="4">
+        <CompoundPredicate booleanOperator="and">
+          <SimplePredicate field="x1" operator="lessThan" value="1"/>
+          <SimpleSetPredicate field="c" booleanOperator="isIn"><Array type="string">a "c"</Array></SimpleSetPredicate>
+        </CompoundPredicate>
+        <ScoreDistribution value="p" recordCount="1"/><ScoreDistribution value="q" recordCount="3"/>
+        <Node id="3" score="p" recordCount="1">
+          <SimplePredicate field="x2" operator="greaterOrEqual" value="0"/>
+          <ScoreDistribution value="p" recordCount="1"/><ScoreDistribution value="q" recordCount="0"/>
+        </Node>
+        <Node id="4" score="q" recordCount="3">
+          <CompoundPredicate booleanOperator="surrogate">
+            <SimplePredicate field="x2" operator="lessThan" value="0"/>
+            <SimplePredicate field="x1" operator="greaterThan" value="-1"/>
+          </CompoundPredicate>
+          <ScoreDistribution value="p" recordCount="0"/><ScoreDistribution value="q" recordCount="3"/>
+        </Node>
+      </Node>
+      <Node id="2" score="p" recordCount="6">
+        <CompoundPredicate booleanOperator="or">
+          <SimplePredicate field="x2" operator="isNotMissing"/>
+          <SimplePredicate field="c" operator="notEqual" value="b"/>
+        </CompoundPredicate>
+        <ScoreDistribution value="p" recordCount="5"/><ScoreDistribution value="q" recordCount="1"/>
+      </Node>
+    </Node>
+  </TreeModel>""")
+
+REGRESSION = document("""
+  <RegressionModel functionName="regression" normalizationMethod="exp">""" + schema("t") + """
+    <RegressionTable intercept="0.5">
+      <NumericPredictor name="x1" coefficient="0.2"/>
+      <NumericPredictor name="x2" exponent="2" coefficient="-0.05"/>
+      <CategoricalPredictor name="c" value="a" coefficient="0.3"/>
+      <CategoricalPredictor name="c" value="b" coefficient="-0.1"/>
+    </RegressionTable>
+  </RegressionModel>""")
+
+LOGISTIC_REGRESSION = document("""
+  <RegressionModel functionName="classification" normalizationMethod="logit">""" + schema("y") + """
+    <RegressionTable intercept="0.0" targetCategory="q"/>
+    <RegressionTable intercept="0.3" targetCategory="p">
+      <NumericPredictor name="x1" coefficient="1.5"/>
+      <NumericPredictor name="x2" coefficient="-0.5"/>
+    </RegressionTable>
+  </RegressionModel>""")
+
+GENERAL_REGRESSION = document("""
+  <GeneralRegressionModel modelType="regression" functionName="regression">""" + schema("t") + """
+    <ParameterList>
+      <Parameter name="p0" label="Intercept"/><Parameter name="p1"/><Parameter name="p2"/><Parameter name="p3"/>
+    </ParameterList>
+    <FactorList><Predictor name="c"/></FactorList>
+    <CovariateList><Predictor name="x1"/><Predictor name="x2"/></CovariateList>
+    <PPMatrix>
+      <PPCell value="a" predictorName="c" parameterName="p1"/>
+      <PPCell value="1" predictorName="x1" parameterName="p2"/>
+      <PPCell value="2" predictorName="x2" parameterName="p3"/>
+      <PPCell value="1" predictorName="x1" parameterName="p3"/>
+    </PPMatrix>
+    <ParamMatrix>
+      <PCell parameterName="p0" beta="1"/><PCell parameterName="p1" beta="0.5"/>
+      <PCell parameterName="p2" beta="-2"/><PCell parameterName="p3" beta="0.25"/>
+    </ParamMatrix>
+  </GeneralRegressionModel>""")
+
+def tree(i, function, threshold, scores, counts=None, target=None):
+    distributions = ["", ""]
+    if counts is not None:
+        distributions = ['<ScoreDistribution value="p" recordCount="{0}"/><ScoreDistribution value="q" '
+                         'recordCount="{1}"/>'.format(count, 10 - count) for count in counts]
+        target = "y"
+    return """
+      <TreeModel functionName="{function}">{schema}
+        <Node id="{i}.0"><True/>
+          <Node id="{i}.1" score="{scores[0]}">
+            <SimplePredicate field="{field}" operator="lessOrEqual" value="{threshold}"/>{distributions[0]}
+          </Node>
+          <Node id="{i}.2" score="{scores[1]}"><True/>{distributions[1]}</Node>
+        </Node>
+      </TreeModel>""".format(i=i, function=function, schema=schema(target, ("x1", "x2")), scores=scores,
+                             field=("x1", "x2")[i % 2], threshold=threshold, distributions=distributions)
+
+def segments(models, weights=None):
+    return "".join('<Segment id="{0}" weight="{1}"><True/>{2}</Segment>'.format(i, (weights or [1] * len(models))[i],
+                                                                                  model)
+                   for i, model in enumerate(models))
+
+RANDOM_FOREST = document("""
+  <MiningModel functionName="classification">""" + schema("y", ("x1", "x2")) + """
+    <Segmentation multipleModelMethod="average">""" +
+    segments([tree(0, "classification", 1, ("p", "q"), (7, 4)), tree(1, "classification", 0.5, ("q", "p"), (2, 9)),
+              tree(2, "classification", -1, ("q", "p"), (4, 6))]) + """
+    </Segmentation>
+  </MiningModel>""")
+
+REGRESSION_FOREST = document("""
+  <MiningModel functionName="regression">""" + schema("t", ("x1", "x2")) + """
+    <Segmentation multipleModelMethod="weightedAverage">""" +
+    segments([tree(0, "regression", 1, (1.0, 2.0), target="t"), tree(1, "regression", 1, (10, 20), target="t"),
+              tree(2, "regression", 3, (5, 7), target="t")], [1, 2, 0.5]) + """
+    </Segmentation>
+  </MiningModel>""")
+
+BOOSTED_TREES = document("""
+  <MiningModel functionName="classification">""" + schema("y", ("x1", "x2")) + """
+    <Segmentation multipleModelMethod="modelChain">
+      <Segment id="1"><True/>
+        <MiningModel functionName="regression">""" + schema(None, ("x1", "x2")) + """
+          <Output><OutputField name="score" optype="continuous" dataType="double" isFinalResult="false"/></Output>
+          <Segmentation multipleModelMethod="sum">""" +
+    segments([tree(i, "regression", 0.5 * i, (0.123456789 * (i + 1), -0.3)) for i in range(4)]) + """
+          </Segmentation>
+          <Targets><Target rescaleConstant="0.5"/></Targets>
+        </MiningModel>
+      </Segment>
+      <Segment id="2"><True/>
+        <RegressionModel functionName="classification" normalizationMethod="logit">
+          <MiningSchema><MiningField name="y" usageType="target"/><MiningField name="score"/></MiningSchema>
+          <Output>
+            <OutputField name="probability(p)" optype="continuous" dataType="double" feature="probability" value="p"/>
+            <OutputField name="probability(q)" optype="continuous" dataType="double" feature="probability" value="q"/>
+          </Output>
+          <RegressionTable intercept="0.0" targetCategory="q"><NumericPredictor name="score" coefficient="1"/></RegressionTable>
+          <RegressionTable intercept="0.0" targetCategory="p"/>
+        </RegressionModel>
+      </Segment>
+    </Segmentation>
+  </MiningModel>""")
+
+def sampleInputs():
+    rand = np.random.RandomState(0)
+    n = 400
+    X = np.empty((n, 3), dtype=object)
+    X[:, 0] = rand.normal(0, 3, n).round(1)
+    X[:, 1] = rand.normal(0, 2, n).round(1)
+    X[:, 2] = rand.choice(["a", "b", "c", "z", None], n)
+    X[rand.rand(n) < 0.1, 0] = None
+    X[rand.rand(n) < 0.1, 1] = None
+    return X
+
+def sampleDocument():
+    with open(os.path.join(TESTS_DIR, "sample_pmml.xml")) as f:
+        return f.read()
+
+# rows with missing values whose predictions depend on how the evaluator
+# treats UNKNOWN predicates and missing categorical predictors
+MISSING = np.array([[None, 1.0, "a"], [None, None, None], [0.5, None, "b"], [1.0, 2.0, None]], dtype=object)
+
+class NativePMMLTests(unittest.TestCase):
+    def setUp(self):
+        self.X = sampleInputs()
+        self.columns = ["x1", "x2", "c"]
+
+    def test_compile(self):
+        for doc in (CLASSIFICATION_TREE, REGRESSION, LOGISTIC_REGRESSION, GENERAL_REGRESSION, RANDOM_FOREST,
+                    REGRESSION_FOREST, BOOSTED_TREES, sampleDocument()):
+            model = ScoringModel.fromPMML(doc)
+            self.assertIsInstance(model.model, NativePMML)
+            columns = [name for name, _ in model.inputFields]
+            if set(columns) <= set(self.columns):
+                X = self.X[:, [self.columns.index(name) for name in columns]]
+            else:
+                X = np.random.RandomState(1).uniform(0, 8, size=(len(self.X), len(columns)))
+            predictions = model.predictBatch(X, columns)
+            self.assertEqual(list(predictions), [name for name, _ in model.outputFields])
+            self.assertTrue(all(len(values) == len(X) for values in predictions.values()))
+
+    def test_predict(self):
+        model = ScoringModel.fromPMML(CLASSIFICATION_TREE)
+        self.assertEqual(model.predict({"x1": 0, "x2": 1, "c": "a"}),
+                         {"predicted_y": "p", "probability": 1.0, "probability_p": 1.0, "probability_q": 0.0,
+                          "node_id": "3"})
+        self.assertRaises(ValueError, lambda: ScoringModel.fromPMML(sampleDocument()).predict(3))
+
+    def test_missing_values(self):
+        # as in pypmml, an UNKNOWN predicate of a child does not end the walk:
+        # a later TRUE child is followed, else the parent's prediction is taken
+        model = ScoringModel.fromPMML(CLASSIFICATION_TREE)
+        self.assertEqual(model.predictBatch(MISSING, self.columns)["node_id"], ["2", "0", "", "2"])
+        # as in pypmml, a missing categorical predictor adds nothing
+        model = ScoringModel.fromPMML(REGRESSION)
+        self.assertAlmostEqual(model.predictBatch(MISSING, self.columns)["predicted_t"][3], np.exp(0.5))
+        model = ScoringModel.fromPMML(GENERAL_REGRESSION)
+        self.assertAlmostEqual(model.predictBatch(MISSING, self.columns)["predicted_t"][3], 0.0)
+
+    def test_unsupported(self):
+        doc = LOGISTIC_REGRESSION.replace('normalizationMethod="logit"', 'normalizationMethod="exp"')
+        self.assertIsNone(compilePMML(doc))
+        self.assertIsNone(compilePMML(CLASSIFICATION_TREE.replace('missingValueStrategy="lastPrediction"',
+                                                                  'missingValueStrategy="weightedConfidence"')))
+        self.assertIsNone(compilePMML(REGRESSION.replace("<RegressionTable",
+                                                         "<LocalTransformations/><RegressionTable")))
+
+
+@unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+class PypmmlEquivalenceTests(unittest.TestCase):
+    def setUp(self):
+        self.X = sampleInputs()
+        self.columns = ["x1", "x2", "c"]
+
+    def assertEquivalent(self, doc, X=None, columns=None):
+        X = self.X if X is None else X
+        columns = columns or self.columns
+        native = ScoringModel.fromPMML(doc)
+        self.assertIsInstance(native.model, NativePMML)
+        reference = ScoringModel.fromPMML(doc, native=False)
+        self.assertNotIsInstance(reference.model, NativePMML)
+        for fields in ("inputFields", "outputFields", "targetFields"):
+            self.assertEqual(getattr(native, fields), getattr(reference, fields))
+        actual = native.predictBatch(X, columns)
+        expected = reference.predictBatch(X, columns)
+        self.assertEqual(list(actual), list(expected))
+        for name in expected:
+            for value, expectedValue in zip(actual[name], expected[name]):
+                if isinstance(expectedValue, float):
+                    self.assertAlmostEqual(value, expectedValue, places=12)
+                else:
+                    self.assertEqual(value, expectedValue)
+
+    def test_clustering(self):
+        doc = sampleDocument()
+        X = np.random.RandomState(1).uniform(0, 8, size=(300, 4))
+        X[::7, 1] = np.nan
+        model = ScoringModel.fromPMML(doc)
+        self.assertEquivalent(doc, X, [name for name, _ in model.inputFields])
+
+    def test_tree(self):
+        self.assertEquivalent(CLASSIFICATION_TREE)
+
+    def test_regression(self):
+        self.assertEquivalent(REGRESSION)
+        self.assertEquivalent(LOGISTIC_REGRESSION)
+        self.assertEquivalent(GENERAL_REGRESSION)
+
+    def test_ensembles(self):
+        self.assertEquivalent(RANDOM_FOREST)
+        self.assertEquivalent(REGRESSION_FOREST)
+        self.assertEquivalent(BOOSTED_TREES)
+
+    def test_missing_values(self):
+        for doc in (CLASSIFICATION_TREE, REGRESSION, GENERAL_REGRESSION):
+            self.assertEquivalent(doc, MISSING)
+
+    def test_predict_input_forms(self):
+        import pandas as pd
+        doc = sampleDocument()
+        native = ScoringModel.fromPMML(doc)
+        reference = ScoringModel.fromPMML(doc, native=False)
+        names = [name for name, _ in native.inputFields]
+        rows = [[5.1, 3.5, 1.4, 0.2], [6.0, 3.0, 5.0, 2.0]]
+        for data in (rows[0], rows, [], np.array(rows[0])):
+            self.assertEqual(native.predict(data), reference.predict(data))
+        record = dict(zip(names, rows[0]))
+        # pypmml returns a mapping of the JVM
+        self.assertEqual(native.predict(record), dict(reference.predict(record)))
+        np.testing.assert_array_equal(native.predict(np.array(rows))[:, 1], reference.predict(np.array(rows))[:, 1])
+        split = '{{"columns": {0}, "data": {1}}}'.format(json.dumps(names), json.dumps(rows))
+        self.assertEqual(json.loads(native.predict(split)), json.loads(reference.predict(split)))
+        series = pd.Series(dict(zip(names, rows[0])))
+        self.assertEqual(native.predict(series).to_dict(), reference.predict(series).to_dict())
+        frame = pd.DataFrame(rows, columns=names)
+        self.assertEqual(native.predict(frame)["cluster_name"].tolist(),
+                         reference.predict(frame)["cluster_name"].tolist())
+
+    def test_fallback(self):
+        model = ScoringModel.fromPMML(REGRESSION.replace("<RegressionTable", "<LocalTransformations/><RegressionTable"))
+        self.assertNotIsInstance(model.model, NativePMML)
+        self.assertEqual(len(model.predictBatch(self.X[:5], self.columns)["predicted_t"]), 5)
@@ -0,0 +1,71 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.profiling import ScoringProfile, origin, profileSample, sampleRows
+from orangecontrib.scoring.lib.readers import getReader
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class ScoringProfileTests(unittest.TestCase):
+    def setUp(self):
+        self.model = getReader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        # scored by titus, not NumPy
+        self.model.vectorized = None
+        self.columns = [name for name, _ in self.model.inputFields]
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(300, 4))
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_profile(self):
+        with ScoringProfile(self.model, rows=150) as profile:
+            for start in range(0, 300, 100):
+                self.model.predictBatch(self.X[start:start + 100], self.columns)
+            self.model.predict(dict(zip(self.columns, self.X[0])))
+        self.assertNotIn("predictBatch", self.model.__dict__)
+        # the calls after the first 150 rows are not profiled
+        self.assertEqual(profile.rows, 200)
+        spots = profile.hotSpots(5)
+        self.assertEqual(spots[0].function, "predictBatch")
+        actions = profile.hotSpots(origins=("pfa",))
+        self.assertEqual(actions[0].function, "action")
+        self.assertEqual(actions[0].calls, 200)
+        self.assertTrue(profile.hotSpots(origins=("titus",)))
+        lines = profile.format(3)
+        self.assertEqual(lines[:2], ["Rows profiled: 200", "Top cumulative:"])
+        self.assertIn("PFA functions generated by titus:", lines)
+
+        filename = profile.save(os.path.join(self.directory, "profiles", "iris.prof"))
+        self.assertEqual(profile.filename, filename)
+        self.assertEqual(pstats.Stats(filename).total_calls, profile.stats().total_calls)
+
+    def test_nothing_profiled(self):
+        with ScoringProfile(self.model) as profile:
+            pass
+        self.assertEqual(profile.hotSpots(), [])
+
+    @unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+    def test_profile_pmml(self):
+        with open(os.path.join(TESTS_DIR, "sample_pmml.xml")) as f:
+            model = ScoringModel.fromPMML(f.read(), native=False)
+        columns = [name for name, _ in model.inputFields]
+        profile = profileSample(model, self.X, columns, rows=50)
+        self.assertEqual(profile.rows, 50)
+        self.assertTrue(profile.hotSpots(origins=("pmml",)))
+        self.assertFalse(profile.hotSpots(origins=("pfa",)))
+
+    def test_helpers(self):
+        self.assertEqual(origin("<string>"), "pfa")
+        self.assertEqual(origin(os.path.join("site-packages", "py4j", "java_gateway.py")), "pmml")
+        self.assertEqual(origin("~"), "builtin")
+        self.assertEqual(sampleRows(5, 10).tolist(), [0, 1, 2, 3, 4])
+        sample = sampleRows(1000, 10)
+        self.assertEqual(len(np.unique(sample)), 10)
+        self.assertEqual(sample.tolist(), sorted(sample))
@@ -0,0 +1,96 @@
+import bz2
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from orangecontrib.scoring.lib import readers
+from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat, fileDigest, getReader, readModelFile, \
+    splitExtension
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class ReadModelFileTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.pmmlFile = os.path.join(TESTS_DIR, "sample_pmml.xml")
+        with open(self.pmmlFile) as f:
+            self.text = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def compressed(self, compression):
+        path = os.path.join(self.directory, "model.pmml" + compression)
+        with open(self.pmmlFile, "rb") as f:
+            content = f.read()
+        if compression == ".gz":
+            with gzip.open(path, "wb") as f:
+                f.write(content)
+        elif compression == ".bz2":
+            with bz2.open(path, "wb") as f:
+                f.write(content)
+        elif compression == ".zip":
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("model.pmml", content)
+        else:
+            shutil.copy(self.pmmlFile, path)
+        return path
+
+    def test_split_extension(self):
+        self.assertEqual(splitExtension("a/model.pmml.gz"), ("a/model", ".pmml", ".gz"))
+        self.assertEqual(splitExtension("model.PFA.ZIP"), ("model", ".PFA", ".zip"))
+        self.assertEqual(splitExtension("model.yaml"), ("model", ".yaml", ""))
+        self.assertIn(".yaml.bz2", PFAFormat.EXTENSIONS)
+        self.assertIn(".xml.zip", PMMLFormat.EXTENSIONS)
+
+    def test_compressed(self):
+        for compression in ("", ".gz", ".bz2", ".zip"):
+            path = self.compressed(compression)
+            fractions = []
+            text, digest = readModelFile(path, fractions.append)
+            self.assertEqual(text, self.text)
+            self.assertEqual(digest, fileDigest(path))
+            self.assertEqual(fractions[-1], 1.0)
+            self.assertEqual(fractions, sorted(fractions))
+
+    def test_blocks(self):
+        path = os.path.join(self.directory, "model.pmml")
+        with open(path, "w") as f:
+            f.write(self.text * 50)
+        blockSize = readers.BLOCK_SIZE
+        readers.BLOCK_SIZE = 10000
+        try:
+            fractions = []
+            text, _ = readModelFile(path, fractions.append)
+        finally:
+            readers.BLOCK_SIZE = blockSize
+        self.assertEqual(text, self.text * 50)
+        self.assertGreater(len(fractions), 5)
+
+    def test_read(self):
+        for compression in (".gz", ".zip"):
+            reader = getReader(self.compressed(compression))
+            fractions = []
+            model = reader.read(progress=fractions.append)
+            self.assertEqual(model.type, "PMML")
+            self.assertEqual(model.document, self.text)
+            self.assertEqual(fractions[-1], 1.0)
+            self.assertEqual(fractions, sorted(fractions))
+
+        path = os.path.join(self.directory, "model.yaml.bz2")
+        with bz2.open(path, "wt") as f:
+            f.write("input: double\noutput: double\naction: {+: [input, 100]}\n")
+        model = getReader(path).read()
+        self.assertEqual(model.documentExt, ".yaml")
+        self.assertEqual(model.predict(1.0), 101.0)
+
+    def test_no_model_in_zip(self):
+        path = os.path.join(self.directory, "model.pmml.zip")
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("a.txt", "a")
+            archive.writestr("b.txt", "b")
+        self.assertRaises(IOError, readModelFile, path)
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+import tracemalloc
+import numpy as np
+
+from Orange.data import Table, Domain, DiscreteVariable, ContinuousVariable
+
+from orangecontrib.scoring.lib.results import ResultAssembler, memmapArray, predictionTable
+
+
+class ResultAssemblerTests(unittest.TestCase):
+    def test_columns(self):
+        assembler = ResultAssembler([("cluster", "string"), ("distance", "real")], 5)
+        assembler.add(3, {"cluster": ["b", "c"], "distance": [0.5, None]})
+        assembler.add(0, {"cluster": ["a", "b", None], "distance": [1., 2., 3.]})
+        self.assertEqual(assembler.nScored, 5)
+        np.testing.assert_array_equal(assembler.Y, [[2, 1], [0, 2], [np.nan, 3], [0, .5], [1, np.nan]])
+        cluster, distance = assembler.outputVariables()
+        self.assertIsInstance(cluster, DiscreteVariable)
+        self.assertEqual(cluster.values, ("b", "c", "a"))
+        self.assertIsInstance(distance, ContinuousVariable)
+
+    def test_many_categories(self):
+        values = ["segment{0}".format(i % 5000) for i in range(20000)]
+        assembler = ResultAssembler([("output_value", "string")], len(values))
+        assembler.add(0, {"output_value": values})
+        np.testing.assert_array_equal(assembler.Y[:, 0], np.arange(20000) % 5000)
+        self.assertEqual(len(assembler.outputVariables()[0].values), 5000)
+
+    def test_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            assembler = ResultAssembler.onDisk([("cluster", "string"), ("distance", "real")], 3, directory)
+            self.assertIsInstance(assembler.Y, np.memmap)
+            assembler.add(0, {"cluster": ["a", "b", "a"], "distance": [1., None, 3.]})
+            np.testing.assert_array_equal(assembler.Y, [[0, 1], [1, np.nan], [0, 3]])
+            extended = ResultAssembler.extending(assembler, 4, memmapArray((4, 2), directory))
+            np.testing.assert_array_equal(extended.Y[:3], assembler.Y)
+            self.assertTrue(np.isnan(extended.Y[3]).all())
+            del assembler, extended
+
+    def test_memmap_array(self):
+        with tempfile.TemporaryDirectory() as directory:
+            Y = memmapArray((1000, 2), directory)
+            Y[:] = 1
+            column = np.asarray(Y[:, 1])
+            del Y
+            # the column keeps the map alive
+            self.assertEqual(column.sum(), 1000)
+            del column
+            self.assertEqual(os.listdir(directory), [])
+            self.assertEqual(memmapArray((0, 2), directory).shape, (0, 2))
+
+class PredictionTableTests(unittest.TestCase):
+    def makeData(self, nRows, nAttributes):
+        domain = Domain([ContinuousVariable("x{0}".format(i)) for i in range(nAttributes)],
+                        DiscreteVariable("y", values=("a", "b", "c")))
+        rand = np.random.RandomState(0)
+        Y = rand.randint(3, size=nRows).astype(float)
+        Y[::7] = np.nan
+        return Table.from_numpy(domain, rand.random_sample((nRows, nAttributes)), Y)
+
+    def test_table(self):
+        data = self.makeData(10, 3)
+        Y = np.arange(10, dtype=float).reshape(10, 1)
+        table = predictionTable(data, [ContinuousVariable("score")], Y)
+        self.assertEqual(table.domain.class_var.name, "score")
+        self.assertEqual([var.name for var in table.domain.metas], ["y"])
+        self.assertTrue(np.shares_memory(table.X, data.X))
+        self.assertTrue(np.shares_memory(table.Y, Y))
+        np.testing.assert_array_equal(table.ids, data.ids)
+        np.testing.assert_array_equal(table.metas[:, 0].astype(float), data.Y)
+
+    def test_memory(self):
+        data = self.makeData(500000, 20)
+        Y = np.zeros((len(data), 1))
+        tracemalloc.start()
+        try:
+            table = predictionTable(data, [ContinuousVariable("score")], Y)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(table), len(data))
+        # only the targets moved to metas (a pointer per row) and temporaries
+        # of Orange's checks for infinite values may be allocated
+        self.assertLess(peak, data.X.nbytes / 4)
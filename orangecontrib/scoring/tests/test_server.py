@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import shutil
+import unittest
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+from orangecontrib.scoring.server import MicroBatcher, ScoringServer
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write("{0} {1} HTTP/1.1\r\nContent-Length: {2}\r\nConnection: close\r\n\r\n".format(
+        method, path, len(payload)).encode("latin-1") + payload)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content.decode("utf-8"))
+
+
+class ScoringServerTests(unittest.TestCase):
+    def setUp(self):
+        self.model = PFAFormat.get_reader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        self.columns = [name for name, _ in self.model.inputFields]
+        self.rows = [{name: 1.0 + 0.3 * i + j for j, name in enumerate(self.columns)} for i in range(20)]
+        X = [[row[name] for name in self.columns] for row in self.rows]
+        self.expected = self.model.predictBatch(X, self.columns)["output_value"]
+
+    def test_micro_batching(self):
+        async def run():
+            batcher = MicroBatcher(self.model, maxBatchSize=8, maxWait=0.05)
+            batcher.start()
+            try:
+                results = await asyncio.gather(*[batcher.predict([row]) for row in self.rows],
+                                               batcher.predict([]))
+            finally:
+                await batcher.stop()
+            return results, batcher.stats()
+
+        results, stats = asyncio.run(run())
+        self.assertEqual([result[0]["output_value"] for result in results[:-1]], self.expected)
+        self.assertEqual(results[-1], [])
+        self.assertEqual((stats["requests"], stats["rows"], stats["queueDepth"]), (20, 20, 0))
+        # 20 concurrent rows in batches of at most 8
+        self.assertEqual(stats["batches"], 3)
+        self.assertIsNotNone(stats["latencyMilliseconds"]["p99"])
+
+    def test_server(self):
+        async def run():
+            server = ScoringServer(self.model, port=0, maxWait=0.01)
+            await server.start()
+            try:
+                single = await request(server.port, "POST", "/predict", self.rows[0])
+                many = await asyncio.gather(*[request(server.port, "POST", "/predict", self.rows[i:i + 5])
+                                              for i in range(0, 20, 5)])
+                invalid = await request(server.port, "POST", "/predict", [{"x": 1}])
+                listed = await request(server.port, "POST", "/predict", [[1.0, 2.0, 3.0, 4.0]])
+                unknown = await request(server.port, "GET", "/nowhere")
+                model = await request(server.port, "GET", "/model")
+                stats = await request(server.port, "GET", "/stats")
+            finally:
+                await server.stop()
+            return single, many, invalid, listed, unknown, model, stats
+
+        single, many, invalid, listed, unknown, model, stats = asyncio.run(run())
+        self.assertEqual(single, (200, {"output_value": self.expected[0]}))
+        self.assertEqual([status for status, _ in many], [200] * 4)
+        self.assertEqual([row["output_value"] for _, rows in many for row in rows], self.expected)
+        self.assertEqual(invalid[0], 400)
+        expected = self.model.predictBatch([[1.0, 2.0, 3.0, 4.0]], self.columns)["output_value"][0]
+        self.assertEqual(listed, (200, [{"output_value": expected}]))
+        self.assertEqual(unknown[0], 404)
+        self.assertEqual(model[1]["inputFields"], [list(field) for field in self.model.inputFields])
+        self.assertEqual(stats[0], 200)
+        self.assertEqual(stats[1]["requests"], 6)
+        self.assertEqual(stats[1]["rows"], 22)
+        self.assertNotIn("jvm", stats[1])
+
+    def test_array_input(self):
+        doc = {"input": {"type": "array", "items": "double"}, "output": "double", "action": [{"a.sum": "input"}]}
+        model = ScoringModel.fromPFA(json.dumps(doc), ".json")
+
+        async def run():
+            server = ScoringServer(model, port=0, maxWait=0.01)
+            await server.start()
+            try:
+                return await asyncio.gather(
+                    request(server.port, "POST", "/predict", [1.0, 2.0, 3.5]),
+                    request(server.port, "POST", "/predict", [[1.0, 2.0], [3.0, 4.0]]),
+                    request(server.port, "POST", "/predict", {"input_value": [1.0, 2.0, 3.0, 4.0]}),
+                    request(server.port, "POST", "/predict", [[1.0], [2.0, 3.0]]))
+            finally:
+                await server.stop()
+
+        single, many, named, ragged = asyncio.run(run())
+        self.assertEqual(single, (200, {"output_value": 6.5}))
+        self.assertEqual(many, (200, [{"output_value": 3.0}, {"output_value": 7.0}]))
+        self.assertEqual(named, (200, {"output_value": 10.0}))
+        self.assertEqual(ragged[0], 400)
+
+    @unittest.skipUnless(shutil.which("java"), "pypmml needs java")
+    def test_jvm_stats(self):
+        with open(os.path.join(TESTS_DIR, "sample_pmml.xml")) as f:
+            model = ScoringModel.fromPMML(f.read(), native=False)
+
+        async def run():
+            server = ScoringServer(model, port=0)
+            await server.start()
+            try:
+                return await request(server.port, "GET", "/stats")
+            finally:
+                await server.stop()
+
+        status, stats = asyncio.run(run())
+        self.assertEqual(status, 200)
+        self.assertTrue(stats["jvm"]["running"])
+        self.assertGreater(stats["jvm"]["heapUsed"], 0)
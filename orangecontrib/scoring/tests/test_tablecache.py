@@ -0,0 +1,75 @@
+import os
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.readers import PFAFormat
+from orangecontrib.scoring.lib.results import ResultAssembler
+from orangecontrib.scoring.lib.tablecache import PredictionCache
+
+
+class PredictionCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        testsDir = os.path.dirname(os.path.realpath(__file__))
+        cls.iris = PFAFormat.get_reader(os.path.join(testsDir, "sample_iris.json")).read()
+        cls.pfa = PFAFormat.get_reader(os.path.join(testsDir, "sample_pfa.json")).read()
+
+    def setUp(self):
+        self.columns = [name for name, _ in self.iris.inputFields]
+        self.X = np.random.RandomState(0).uniform(0, 7, size=(100, 4))
+
+    def scored(self, X):
+        assembler = ResultAssembler(self.iris.outputFields, len(X))
+        assembler.add(0, self.iris.predictBatch(X, self.columns))
+        return assembler
+
+    def test_exact(self):
+        cache = PredictionCache()
+        fingerprint, cached = cache.lookup(self.iris, self.columns, self.X)
+        self.assertIsNone(cached)
+        assembler = self.scored(self.X)
+        cache.store(fingerprint, assembler)
+        fingerprint, cached = cache.lookup(self.iris, self.columns, self.X.copy())
+        self.assertIs(cached[1], assembler)
+        self.assertEqual(cached[0].digest, fingerprint.digest)
+
+    def test_prefix(self):
+        cache = PredictionCache()
+        fingerprint, _ = cache.lookup(self.iris, self.columns, self.X[:60])
+        cache.store(fingerprint, self.scored(self.X[:60]))
+        fingerprint, _ = cache.lookup(self.iris, self.columns, self.X[:80])
+        cache.store(fingerprint, self.scored(self.X[:80]))
+        fingerprint, cached = cache.lookup(self.iris, self.columns, self.X)
+        self.assertEqual(cached[1].nRows, 80)
+
+        assembler = ResultAssembler.extending(cached[1], len(self.X))
+        assembler.add(80, self.iris.predictBatch(self.X[80:], self.columns))
+        np.testing.assert_array_equal(assembler.Y, self.scored(self.X).Y)
+        cache.store(fingerprint, assembler, replaces=cached[0])
+        self.assertEqual([entry[0].nRows for entry in cache.entries], [60, 100])
+
+    def test_miss(self):
+        cache = PredictionCache()
+        fingerprint, _ = cache.lookup(self.iris, self.columns, self.X[:60])
+        cache.store(fingerprint, self.scored(self.X[:60]))
+        X = self.X.copy()
+        X[10, 2] += 1
+        self.assertIsNone(cache.lookup(self.iris, self.columns, X)[1])
+        self.assertIsNone(cache.lookup(self.iris, self.columns[::-1], self.X)[1])
+        self.assertIsNone(cache.lookup(self.pfa, self.columns, self.X)[1])
+
+    def test_categories(self):
+        cache = PredictionCache()
+        fingerprint, _ = cache.lookup(self.iris, self.columns, self.X, {"sepal_length": ("a", "b")})
+        cache.store(fingerprint, self.scored(self.X))
+        self.assertIsNotNone(cache.lookup(self.iris, self.columns, self.X, {"sepal_length": ("a", "b")})[1])
+        self.assertIsNone(cache.lookup(self.iris, self.columns, self.X, {"sepal_length": ("b", "a")})[1])
+        self.assertIsNone(cache.lookup(self.iris, self.columns, self.X)[1])
+
+    def test_eviction(self):
+        cache = PredictionCache(maxEntries=2)
+        for nRows in (10, 20, 30):
+            fingerprint, _ = cache.lookup(self.iris, self.columns, self.X[nRows:])
+            cache.store(fingerprint, self.scored(self.X[nRows:]))
+        self.assertEqual([entry[0].nRows for entry in cache.entries], [80, 70])
+        self.assertIsNone(cache.lookup(self.iris, self.columns, self.X[10:])[1])
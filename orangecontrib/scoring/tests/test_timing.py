@@ -0,0 +1,57 @@
+import os
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib import timing
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+
+class TimingsTests(unittest.TestCase):
+    def setUp(self):
+        self.wasEnabled = timing.isEnabled()
+
+    def tearDown(self):
+        timing.enable(self.wasEnabled)
+
+    def test_record(self):
+        timings = timing.Timings()
+        with timings.phase("predict", 100):
+            pass
+        timings.record("predict", 1.0, 50)
+        timings.record("parse", 0.5)
+        self.assertEqual(list(timings.phases), ["predict", "parse"])
+        predict = timings.phases["predict"]
+        self.assertEqual((predict.calls, predict.rows), (2, 150))
+        self.assertGreaterEqual(predict.seconds, 1.0)
+        self.assertEqual(timings.format()[1], "parse: 0.500 s")
+
+    def test_since(self):
+        timings = timing.Timings()
+        timings.record("parse", 0.5)
+        timings.record("predict", 1.0, 10)
+        snapshot = timings.snapshot()
+        timings.record("predict", 2.0, 20)
+        difference = timings.since(snapshot)
+        self.assertEqual(list(difference.phases), ["predict"])
+        self.assertEqual(difference.phases["predict"].rows, 20)
+        self.assertEqual(difference.format(), ["predict: 2.000 s, 20 rows (10 rows/s)"])
+
+    def test_disabled(self):
+        timing.enable(False)
+        snapshot = timing.timings().snapshot()
+        with timing.phase("predict", 10):
+            pass
+        self.assertEqual(timing.timings().since(snapshot).phases, {})
+
+    def test_scoring_phases(self):
+        timing.enable()
+        snapshot = timing.timings().snapshot()
+        irisFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "sample_iris.json")
+        model = PFAFormat.get_reader(irisFile).read()
+        columns = [name for name, _ in model.inputFields]
+        batch = model.predictBatch(np.array([[5.1, 3.5, 1.4, 0.2], [6.3, 3.3, 6.0, 2.5]]), columns)
+        self.assertEqual(batch["output_value"], ["Iris-setosa", "Iris-virginica"])
+        phases = timing.timings().since(snapshot).phases
+        for name in ("read", "parse", "compile", "describeModel", "vectorize", "predict"):
+            self.assertIn(name, phases)
+        self.assertEqual(phases["predict"].rows, 2)
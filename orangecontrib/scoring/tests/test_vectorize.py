@@ -0,0 +1,166 @@
+import os
+import json
+import unittest
+import numpy as np
+
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.readers import PFAFormat
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+def record(*names):
+    return {"type": "record", "name": "Input", "fields": [{"name": name, "type": "double"} for name in names]}
+
+TREE = {
+    "input": record("x", "y"),
+    "output": "string",
+    "cells": {"tree": {
+        "type": {"type": "record", "name": "TreeNode", "fields": [
+            {"name": "field", "type": {"type": "enum", "name": "Fields", "symbols": ["x", "y"]}},
+            {"name": "operator", "type": "string"},
+            {"name": "value", "type": ["double", {"type": "array", "items": "double"}]},
+            {"name": "pass", "type": ["string", "TreeNode"]},
+            {"name": "fail", "type": ["string", "TreeNode"]}]},
+        "init": {"field": "x", "operator": "<", "value": {"double": 2.5},
+                 "pass": {"TreeNode": {"field": "y", "operator": "in", "value": {"array": [1.0, 2.0]},
+                                       "pass": {"string": "a"}, "fail": {"string": "b"}}},
+                 "fail": {"TreeNode": {"field": "y", "operator": ">=", "value": {"double": 3.5},
+                                       "pass": {"string": "c"}, "fail": {"string": "d"}}}}}},
+    "action": [{"model.tree.simpleWalk": ["input", {"cell": "tree"},
+                                          {"params": [{"d": "Input"}, {"t": "TreeNode"}], "ret": "boolean",
+                                           "do": {"model.tree.simpleTest": ["d", "t"]}}]}]}
+
+LINEAR = {
+    "input": {"type": "array", "items": "double"},
+    "output": "double",
+    "cells": {"model": {"type": {"type": "record", "name": "Model", "fields": [
+        {"name": "coeff", "type": {"type": "array", "items": "double"}}, {"name": "const", "type": "double"}]},
+        "init": {"coeff": [0.5, -1.5, 2.0, 0.25], "const": 3.0}}},
+    "action": [{"m.link.logit": {"model.reg.linear": ["input", {"cell": "model"}]}}]}
+
+CLASSIFIER = {
+    "input": record("a", "b", "c"),
+    "output": {"type": "record", "name": "Output", "fields": [
+        {"name": "label", "type": "string"}, {"name": "index", "type": "int"},
+        {"name": "probability", "type": "double"}]},
+    "cells": {"model": {"type": {"type": "record", "name": "Model", "fields": [
+        {"name": "coeff", "type": {"type": "array", "items": {"type": "array", "items": "double"}}},
+        {"name": "const", "type": {"type": "array", "items": "double"}}]},
+        "init": {"coeff": [[1, 0, -1], [0.5, 0.5, 0.5], [-1, 2, 0]], "const": [0, -1, 0.5]}}},
+    "action": [
+        {"let": {"scores": {"model.reg.linear": [{"new": ["input.a", "input.b", "input.c"],
+                                                  "type": {"type": "array", "items": "double"}},
+                                                 {"cell": "model"}]}}},
+        {"let": {"probs": {"m.link.softmax": "scores"}}},
+        {"new": {"label": {"map.argmax": {"new": {"setosa": "probs.0", "versicolor": "probs.1",
+                                                  "virginica": "probs.2"},
+                                          "type": {"type": "map", "values": "double"}}},
+                 "index": {"a.argmax": "probs"},
+                 "probability": {"m.round": {"*": [100, "probs.0"]}}},
+         "type": "Output"}]}
+
+COUNTS = {
+    "input": {"type": "record", "name": "Input", "fields": [{"name": "n", "type": "int"}, {"name": "m", "type": "int"}]},
+    "output": "int",
+    "action": [{"*": ["input.n", {"+": ["input.m", 1000]}]}]}
+
+ARITHMETIC = {
+    "input": record("u", "v"),
+    "output": "double",
+    "action": [
+        {"let": {"s": {"+": ["input.u", {"*": [2, "input.v"]}]}}},
+        {"cond": [{"if": {"&&": [{">": ["s", 3]}, {"!": {"==": ["input.u", 0]}}]},
+                   "then": {"m.sqrt": {"m.abs": "s"}}},
+                  {"if": {"<": ["s", -2]}, "then": {"m.ln": {"u-": "s"}}}],
+         "else": {"/": [{"m.exp": "input.v"}, {"+": [1, {"**": ["input.u", 2]}]}]}}]}
+
+class VectorizeTests(unittest.TestCase):
+    def assertEquivalent(self, model, X, columns):
+        self.assertIsNotNone(model.vectorized)
+        expected = model._predictBatchTitus(X, columns)
+        actual = model.vectorized.predictBatch(X, columns)
+        self.assertEqual(list(actual), list(expected))
+        for name in expected:
+            if all(isinstance(value, float) for value in expected[name]):
+                np.testing.assert_allclose(actual[name], expected[name], rtol=1e-12, atol=1e-12)
+            else:
+                self.assertEqual(actual[name], expected[name])
+            if dict(model.outputFields)[name] in ("int", "long"):
+                self.assertTrue(all(type(value) is int for value in actual[name]))
+
+    def setUp(self):
+        self.rand = np.random.RandomState(0)
+
+    def test_samples(self):
+        iris = PFAFormat.get_reader(os.path.join(TESTS_DIR, "sample_iris.json")).read()
+        X = self.rand.uniform(0, 7, size=(500, 4))
+        self.assertEquivalent(iris, X, [name for name, _ in iris.inputFields])
+        pfa = PFAFormat.get_reader(os.path.join(TESTS_DIR, "sample_pfa.json")).read()
+        self.assertEquivalent(pfa, self.rand.normal(size=(500, 1)), ["input_value"])
+
+    def test_tree(self):
+        model = ScoringModel.fromPFA(json.dumps(TREE), ".json")
+        X = self.rand.randint(0, 5, size=(500, 2)).astype(float)
+        X[::11, 0] = np.nan
+        self.assertEquivalent(model, X, ["x", "y"])
+
+    def test_linear(self):
+        model = ScoringModel.fromPFA(json.dumps(LINEAR), ".json")
+        self.assertEquivalent(model, self.rand.normal(size=(500, 4)), ["a", "b", "c", "d"])
+
+    def test_classifier(self):
+        model = ScoringModel.fromPFA(json.dumps(CLASSIFIER), ".json")
+        self.assertEquivalent(model, self.rand.normal(size=(500, 3)), ["c", "a", "b"])
+
+    def test_map_ties(self):
+        doc = {"input": record("x", "y"), "output": "string",
+               "action": [{"map.argmax": {"new": {"b": "input.x", "a": "input.y"},
+                                          "type": {"type": "map", "values": "double"}}}]}
+        model = ScoringModel.fromPFA(json.dumps(doc), ".json")
+        X = self.rand.randint(0, 3, size=(500, 2)).astype(float)
+        self.assertEquivalent(model, X, ["x", "y"])
+        self.assertEqual(model.vectorized.predictBatch(np.ones((1, 2)), ["x", "y"])["output_value"], ["a"])
+
+    def test_integer_outputs(self):
+        model = ScoringModel.fromPFA(json.dumps(COUNTS), ".json")
+        self.assertEquivalent(model, self.rand.randint(-1000, 1000, size=(500, 2)), ["n", "m"])
+        # titus reports the overflow, the evaluator does not hide it
+        from titus.errors import PFARuntimeException
+        self.assertRaises(PFARuntimeException, model.predictBatch, np.array([[5000000, 2]]), ["n", "m"])
+        self.assertIsNotNone(model.vectorized)
+
+    def test_arithmetic(self):
+        model = ScoringModel.fromPFA(json.dumps(ARITHMETIC), ".json")
+        X = self.rand.normal(scale=3, size=(500, 2))
+        X[:5, 0] = 0
+        self.assertEquivalent(model, X, ["u", "v"])
+
+    def test_unsupported(self):
+        doc = {"input": "double", "output": "double",
+               "cells": {"total": {"type": "double", "init": 0}},
+               "action": [{"cell": "total", "to": {"+": [{"cell": "total"}, "input"]}}]}
+        model = ScoringModel.fromPFA(json.dumps(doc), ".json")
+        self.assertIsNone(model.vectorized)
+        self.assertEqual(model.predictBatch(np.array([[1.], [2.]]), ["input_value"])["output_value"], [1., 3.])
+        doc = {"input": "string", "output": "string", "action": [{"s.upper": "input"}]}
+        self.assertIsNone(ScoringModel.fromPFA(json.dumps(doc), ".json").vectorized)
+
+    def test_runtime_fallback(self):
+        doc = dict(LINEAR, action=[{"model.reg.linear": ["input", {"cell": "model"}]}])
+        model = ScoringModel.fromPFA(json.dumps(doc), ".json")
+        self.assertIsNotNone(model.vectorized)
+        # titus scores a batch the evaluator rejects and raises its own error
+        self.assertRaises(Exception, model.predictBatch, np.ones((2, 3)), ["a", "b", "c"])
+        self.assertEqual(len(model.predictBatch(np.ones((2, 4)), ["a", "b", "c", "d"])["output_value"]), 2)
+        self.assertIsNotNone(model.vectorized)
+
+    def test_evaluator_failure(self):
+        model = ScoringModel.fromPFA(json.dumps(LINEAR), ".json")
+
+        def fail(X, columns):
+            raise TypeError("evaluator bug")
+        model.vectorized.predictBatch = fail
+        with self.assertLogs("orangecontrib.scoring.lib.model", "WARNING"):
+            scores = model.predictBatch(np.ones((2, 4)), ["a", "b", "c", "d"])["output_value"]
+        self.assertEqual(len(scores), 2)
+        self.assertIsNone(model.vectorized)
@@ -0,0 +1,183 @@
+import os
+import logging
+
+import numpy as np
+
+from AnyQt.QtCore import QSize
+
+from Orange.widgets.widget import OWWidget, Msg, Input, Output
+from Orange.data import Table, ContinuousVariable, DiscreteVariable
+from Orange.widgets import gui
+from Orange.widgets.settings import Setting
+from Orange.widgets.utils.concurrent import ConcurrentWidgetMixin
+
+from orangecontrib.scoring.lib.compare import compareModels
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.multi import MultiScorer
+from orangecontrib.scoring.lib.results import predictionTable
+from orangecontrib.scoring.widgets.owevaluate import Cancelled
+
+log = logging.getLogger(__name__)
+
+def run(data, incumbent, challenger, state):
+    """Compare the latency and predictions of incumbent and challenger on
+    the rows of data; runs in a worker thread."""
+    def progress(fraction):
+        if state.is_interruption_requested():
+            raise Cancelled
+        state.set_progress_value(100 * fraction)
+
+    columns = [var.name for var in data.domain.attributes]
+    categories = {var.name: tuple(var.values) for var in data.domain.attributes if var.is_discrete}
+    return compareModels(incumbent, challenger, data.X, columns, categories, progress=progress)
+
+class OWCompareModels(OWWidget, ConcurrentWidgetMixin):
+    name = "Compare Models"
+    id = "orange.widgets.scoring.comparemodels"
+    description = "Compare the latency and predictions of a challenger model with those of the incumbent"
+    icon = "icons/evaluate.svg"
+    priority = 4
+    category = "Scoring"
+    keywords = ["scoring", "latency", "profile", "agreement", "champion", "challenger", "a/b"]
+
+    class Inputs:
+        data = Input("Data", Table)
+        incumbent = Input("Incumbent Model", ScoringModel)
+        challenger = Input("Challenger Model", ScoringModel)
+
+    class Outputs:
+        comparison = Output("Comparison", Table, doc="Predictions and latencies of both models")
+        slowest = Output("Slowest Rows", Table, doc="Rows that took longest to score")
+        disagreements = Output("Disagreements", Table, doc="Rows on which the models disagree")
+
+    resizing_enabled = True
+    want_control_area = False
+
+    # Number of slowest rows reported and output
+    n_slowest = Setting(10)
+
+    class Error(OWWidget.Error):
+        fields = Msg("{}")
+        scoring = Msg("Scoring error:\n{}")
+
+    def __init__(self):
+        OWWidget.__init__(self)
+        ConcurrentWidgetMixin.__init__(self)
+        self.data = None
+        self.incumbent = None
+        self.challenger = None
+        self.comparison = None
+
+        box = gui.vBox(self.mainArea, "Info")
+        self.infolabel = gui.widgetLabel(box, 'No models or data loaded.')
+        box = gui.vBox(self.mainArea, "Comparison")
+        self.reportLabel = gui.widgetLabel(box, '')
+
+        box = gui.hBox(self.mainArea)
+        gui.spin(box, self, "n_slowest", 1, 1000, label="Slowest rows:", callback=self.send_comparison)
+        gui.rubber(box)
+        self.apply_button = gui.button(box, self, "Compare", callback=self.compare)
+        self.apply_button.setEnabled(False)
+
+    @staticmethod
+    def sizeHint():
+        return QSize(480, 200)
+
+    @Inputs.data
+    def set_data(self, data):
+        self.data = data
+
+    @Inputs.incumbent
+    def set_incumbent(self, model):
+        self.incumbent = model
+
+    @Inputs.challenger
+    def set_challenger(self, model):
+        self.challenger = model
+
+    def handleNewSignals(self):
+        # results of a run started for the previous inputs are stale
+        self.cancel()
+        self.apply_button.setText("Compare")
+        self.comparison = None
+        self.send_comparison()
+        self.Error.clear()
+        self.apply_button.setEnabled(False)
+        models = [model for model in (self.incumbent, self.challenger) if model is not None]
+        if self.data is None or len(models) < 2:
+            self.infolabel.setText('Connect data and both models.')
+            return
+        columns = [var.name for var in self.data.domain.attributes]
+        lines = ["Input Data:", "Rows - {0}".format(len(self.data)), "", "Models:"]
+        missingFields = []
+        for modelName, model in zip(MultiScorer(models).names, models):
+            lines.append("- {0} ({1}, {2} output(s))".format(modelName, model.type, len(model.outputFields)))
+            if model.type == "PMML" or model.pfaInputIsRecord:
+                missing = [name for name, _ in model.inputFields if name not in columns]
+                if missing:
+                    missingFields.append("{0}: {1}".format(modelName, ", ".join(missing)))
+        self.infolabel.setText("<br/>".join(lines))
+        if missingFields:
+            self.Error.fields("Data has no column for model field(s)\n" + "\n".join(missingFields))
+            return
+        self.apply_button.setEnabled(True)
+
+    def compare(self):
+        if self.task is not None:
+            self.cancel()
+            self.apply_button.setText("Compare")
+            return
+        self.comparison = None
+        self.Error.scoring.clear()
+        self.reportLabel.setText('')
+        self.apply_button.setText("Cancel")
+        self.start(run, self.data, self.incumbent, self.challenger)
+
+    def on_done(self, comparison):
+        self.apply_button.setText("Compare")
+        self.comparison = comparison
+        self.send_comparison()
+
+    def on_exception(self, ex):
+        self.apply_button.setText("Compare")
+        if isinstance(ex, Cancelled):
+            return
+        self.Error.scoring(str(ex))
+
+    def send_comparison(self):
+        comparison = self.comparison
+        if comparison is None:
+            self.reportLabel.setText('')
+            for output in (self.Outputs.comparison, self.Outputs.slowest, self.Outputs.disagreements):
+                output.send(None)
+            return
+        self.reportLabel.setText("<br/>".join(comparison.format(self.n_slowest)))
+        scorer = MultiScorer([self.incumbent, self.challenger], comparison.names)
+        assemblers, Y = scorer.assemblers(comparison.nRows)
+        for assembler, outputs in zip(assemblers, comparison.outputs):
+            assembler.add(0, outputs)
+        variables = [var for assembler in assemblers for var in assembler.outputVariables()]
+        metaVariables = [ContinuousVariable("{0} latency (ms)".format(name)) for name in comparison.names]
+        metaVariables.append(DiscreteVariable("agree", values=("no", "yes")))
+        metas = np.column_stack((1000 * comparison.latencies, ~comparison.disagreeing()))
+        table = predictionTable(self.data, variables, Y, metaVariables, metas)
+        table.name = "Comparison"
+        self.Outputs.comparison.send(table)
+        self.Outputs.slowest.send(table[comparison.slowest(self.n_slowest)])
+        self.Outputs.disagreements.send(table[np.flatnonzero(comparison.disagreeing())])
+
+    def onDeleteWidget(self):
+        self.shutdown()
+        super().onDeleteWidget()
+
+
+if __name__ == "__main__":
+    from Orange.widgets.utils.widgetpreview import WidgetPreview
+    from orangecontrib.scoring.lib.readers import PMMLFormat
+    pmmlFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../tests/sample_pmml.xml")
+    with open(pmmlFile) as f:
+        pmmlDoc = f.read()
+    iris = Table("iris")
+    WidgetPreview(OWCompareModels).run(set_data=iris,
+                                       set_incumbent=ScoringModel.fromPMML(pmmlDoc, native=False),
+                                       set_challenger=PMMLFormat.get_reader(pmmlFile).read())
@@ -1,3 +1,9 @@
+import os
+import html
+import time
+import logging
+import tempfile
+
 import numpy as np
 
 from AnyQt.QtWidgets import QGridLayout, QSizePolicy as Policy
@@ -6,12 +12,92 @@ from AnyQt.QtCore import QSize
 from Orange.widgets.widget import OWWidget, Msg, Output
 from Orange.data import Table, DiscreteVariable, Domain, ContinuousVariable
 from Orange.widgets import gui
+from Orange.widgets.settings import Setting
+from Orange.widgets.utils.concurrent import ConcurrentWidgetMixin
 from Orange.evaluation import Results
 
+from orangecontrib.scoring.lib import timing
+from orangecontrib.scoring.lib.adapter import InputAdapter
+from orangecontrib.scoring.lib.memo import RowMemo
 from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.parallel import iterPredict
+from orangecontrib.scoring.lib.profiling import ScoringProfile
+from orangecontrib.scoring.lib.results import ResultAssembler, memmapArray, predictionTable
+from orangecontrib.scoring.lib.tablecache import PredictionCache
 from orangecontrib.scoring.lib.utils import prettifyText
 
-class OWEvaluate(OWWidget):
+log = logging.getLogger(__name__)
+
+# Minimal number of seconds between two status updates of a running scoring task
+STATUS_INTERVAL = 0.5
+
+class Cancelled(Exception):
+    """Raised by a scoring task when the widget asked it to stop."""
+
+def run(data, model, chunkSize, workers, cache, memo, profileRows, scratch, state):
+    """Score data with model in chunks of chunkSize rows using the given number
+    of worker processes; runs in a worker thread.
+
+    If profileRows is positive, the first that many rows to be scored are
+    scored in this process under cProfile, see profiling.ScoringProfile, and
+    the rest as usual; rows are thus scored once and in order, so models
+    with state give the same predictions as without profiling.
+
+    Predictions are looked up in and stored into cache, a PredictionCache;
+    if it holds the predictions for the leading rows of data, only the
+    remaining rows are scored. If memo, a RowMemo for model, is given, each
+    distinct row is scored once, in this process. If scratch, a directory,
+    is given, predictions are stored into a memory-mapped file in it, see
+    results.memmapArray, instead of into memory. Returns the
+    ResultAssembler holding the predictions and the profile, if any, saved
+    into a file. Categorical columns read by string fields of the model
+    are passed as their values."""
+    inputColumnNames = [field.name for field in data.domain.attributes]
+    nRows = len(data)
+    with timing.phase("fingerprint", nRows):
+        categories = {var.name: tuple(var.values) for var in data.domain.attributes if var.is_discrete}
+        fingerprint, cached = cache.lookup(model, inputColumnNames, data.X, categories)
+    if cached is not None and cached[1].nRows == nRows:
+        return cached[1], None
+    Y = None if scratch is None else memmapArray((nRows, len(model.outputFields)), scratch)
+    if cached is None:
+        assembler = ResultAssembler(model.outputFields, nRows, Y)
+    else:
+        assembler = ResultAssembler.extending(cached[1], nRows, Y)
+    offset = assembler.nScored
+    lastStatus = 0
+    with timing.phase("buildInput", nRows - offset):
+        # string fields read the values of categorical columns, not their indices
+        X, columns = InputAdapter.fromDomain(model, data.domain).prepare(data.X[offset:])
+    scorer = model
+    if memo is not None:
+        scorer, workers = memo, 1
+    profile = None
+    profiled = min(profileRows, nRows - offset)
+    if profiled > 0:
+        with timing.phase("profile", profiled):
+            # a memo scores with model, so its calls are profiled too
+            with ScoringProfile(model) as profile:
+                assembler.add(offset, scorer.predictBatch(X[:profiled], columns))
+            profile.save()
+    batches = iterPredict(scorer, X[profiled:], columns, workers=workers, chunkSize=chunkSize)
+    with timing.phase("score", nRows - offset - profiled):
+        try:
+            for start, stop, batch in batches:
+                with timing.phase("encodeOutput", stop - start):
+                    assembler.add(offset + profiled + start, batch)
+                if state.is_interruption_requested():
+                    raise Cancelled
+                state.set_progress_value(100*(assembler.nScored - offset)/(nRows - offset))
+                if time.monotonic() - lastStatus > STATUS_INTERVAL:
+                    lastStatus = time.monotonic()
+                    state.set_status("Scored {0} of {1} rows".format(assembler.nScored, nRows))
+        finally:
+            batches.close()
+    cache.store(fingerprint, assembler, replaces=cached and cached[0])
+    return assembler, profile
+
+class OWEvaluate(OWWidget, ConcurrentWidgetMixin):
     # Each widget has a name description and a set of input/outputs (referred to as the widget’s meta description).
     # Widget's name as displayed in the canvas
     name = "Evaluate PMML/PFA Model"
@@ -42,24 +128,69 @@ class OWEvaluate(OWWidget):
     #   with a fixed or resizable geometry.
     resizing_enabled = True
 
+    # Number of rows handed to ScoringModel.predictBatch at once
+    CHUNK_SIZE = 1000
+
+    # Number of processes scoring in parallel
+    workers = Setting(1)
+    # Record the time spent in each phase of scoring and show it in the Info box
+    record_timings = Setting(False)
+    # Score each distinct row once and remember the predictions of recent rows
+    deduplicate = Setting(False)
+    # Score again when a new model arrives for data that has been scored
+    rescore = Setting(False)
+    # Profile the scoring of the first profile_rows rows with cProfile
+    profile = Setting(False)
+    profile_rows = Setting(1000)
+    # Keep predictions in a memory-mapped file in the temporary directory
+    on_disk = Setting(False)
+
     class Error(OWWidget.Error):
         connection = Msg("{}")
+        scoring = Msg("Scoring error:\n{}")
+
+    class Warning(OWWidget.Warning):
+        deduplication = Msg("{}")
 
     def __init__(self):
-        super().__init__()
+        OWWidget.__init__(self)
+        ConcurrentWidgetMixin.__init__(self)
         self.data = None
         self.model = None
         self.output_data = None
         self.eval_results = None
         self.inputDataAsArray = None
         self.inputWithoutFieldName = None
+        # predictions of recently scored data, reused when the same rows are scored again
+        self.predictionCache = PredictionCache()
+        # RowMemo of the current model when duplicate rows are scored once
+        self.rowMemo = None
 		# ensure the widget has some decent minimum width.        
         self.controlArea.hide()
         box = gui.vBox(self.mainArea, "Info")
         self.infolabel = gui.widgetLabel(box, 'No model or data loaded.')
         self.warnings = gui.widgetLabel(box, '')
+        self.timingsLabel = gui.widgetLabel(box, '')
+        self.timingsSnapshot = None
+        self.profileLabel = gui.widgetLabel(box, '')
+        if self.record_timings:
+            timing.enable()
 
         box = gui.hBox(self.mainArea)
+        gui.checkBox(box, self, "deduplicate", "Score duplicate rows once")
+        gui.checkBox(box, self, "rescore", "Re-score when the model changes")
+        gui.rubber(box)
+        box = gui.hBox(self.mainArea)
+        gui.checkBox(box, self, "profile", "Profile this run")
+        gui.spin(box, self, "profile_rows", 1, 10 ** 6, step=100, label="Rows profiled:")
+        gui.rubber(box)
+        box = gui.hBox(self.mainArea)
+        gui.checkBox(box, self, "on_disk", "Keep predictions on disk")
+        gui.rubber(box)
+        box = gui.hBox(self.mainArea)
+        gui.spin(box, self, "workers", 1, os.cpu_count() or 1, label="Worker processes:")
+        gui.checkBox(box, self, "record_timings", "Record timings",
+                     callback=lambda: timing.enable(self.record_timings))
         gui.rubber(box)
         self.apply_button = gui.button(
             box, self, "Score", callback=self.score)
@@ -74,13 +205,19 @@ class OWEvaluate(OWWidget):
         return True
 
     def handleNewSignals(self):
+        # results of a run started for the previous inputs are stale
+        self.cancel()
+        self.apply_button.setText("Score")
         self.progressBarSet(0)
         self.output_data = None
         self.eval_results = None
         self.send_data()
         self.Error.clear()
+        self.timingsLabel.setText('')
+        self.profileLabel.setText('')
         if self.data is not None and self.model is not None:
-            conforms, fieldNamesChecked, inputFieldsChecked = self.describeFields()
+            with timing.phase("describeFields"):
+                conforms, fieldNamesChecked, inputFieldsChecked = self.describeFields()
             if conforms:
                 self.inputDataAsArray = not inputFieldsChecked
                 self.inputWithoutFieldName = not fieldNamesChecked
@@ -96,7 +233,7 @@ class OWEvaluate(OWWidget):
         inputColumnNames = [field.name for field in self.data.domain.attributes]
         self.infolabel.setText('')
         text = "Input Data:"
-        text += BR + "Rows - " + str(len(X))
+        text += BR + "Rows - " + str(X.shape[0])
         text += BR + "<br/>".join(prettifyText(inputColumnNames, pre="Column Names - "))
         text += BR
         text += BR + "{0} Model: ".format(self.model.type) 
@@ -139,62 +276,71 @@ class OWEvaluate(OWWidget):
         self.handleNewSignals()
 
     def set_model(self, model):
+        scored = self.output_data is not None or self.task is not None
         self.model = model
+        self.rowMemo = None
         self.handleNewSignals()
+        if self.rescore and scored and self.apply_button.isEnabled():
+            self.score()
 
     def score(self):
+        if self.task is not None:
+            self.cancel()
+            self.apply_button.setText("Score")
+            return
         self.output_data = None  
-        self.progressBarSet(0)
-        #cv = ["null", "boolean", "integer", "int", "long", "float", "double"]
-        dv = ["string", "bytes"]
-        res = []
-        inputColumnNames = [field.name for field in self.data.domain.attributes]
-        dvFieldSet = {name: [] for name, type in self.model.outputFields if type in dv}
-        nRows = len(self.data.X)
-        for cnt, row in enumerate(self.data.X):
-            self.progressBarSet(int(100*cnt/nRows) -10)
-            datum = None
-            if self.inputWithoutFieldName:
-                datum = row[0]
-            elif self.inputDataAsArray:
-                datum = {self.model.inputFields[0][0]: list(row)}
-            else:
-                datum = dict(zip(inputColumnNames, row))
-            if datum is not None:
-                result = self.model.predict(datum)
-                if "output_value" == self.model.outputFields[0][0]:
-                    if "output_value" in dvFieldSet.keys():
-                        if result in dvFieldSet["output_value"]:
-                            result = dvFieldSet["output_value"].index(result)
-                        else:
-                            dvFieldSet["output_value"].append(result)
-                            result = len(dvFieldSet["output_value"]) - 1
-                    res.append([result, ])
-                else:
-                    resRow = []
-                    for name, _ in self.model.outputFields:
-                        if name in dvFieldSet.keys():
-                            if result[name] in dvFieldSet[name]:
-                                resRow.append(dvFieldSet[name].index(result[name]))
-                            else:
-                                dvFieldSet[name].append(result[name])
-                                resRow.append(len(dvFieldSet[name])-1)
-                        else:
-                            resRow.append(result[name])  
-                    res.append(resRow)                          
-            else:
-                raise RuntimeError("Error detecting input data row - {0}".format(row))
-        DomainX = self.data.domain.attributes
-        DomainY = [DiscreteVariable(name, values=dvFieldSet[name]) if name in dvFieldSet.keys() else ContinuousVariable(name) \
-                    for name, _ in self.model.outputFields]
+        self.eval_results = None
+        self.Error.scoring.clear()
+        self.apply_button.setText("Cancel")
+        self.timingsLabel.setText('')
+        self.profileLabel.setText('')
+        self.timingsSnapshot = timing.timings().snapshot() if timing.isEnabled() else None
+        self.Warning.deduplication.clear()
+        if self.deduplicate and self.rowMemo is None:
+            try:
+                self.rowMemo = RowMemo(self.model)
+            except NotImplementedError as ex:
+                self.Warning.deduplication(str(ex))
+        memo = self.rowMemo if self.deduplicate else None
+        self.start(run, self.data, self.model, self.CHUNK_SIZE, self.workers, self.predictionCache, memo,
+                   self.profile_rows if self.profile else 0, tempfile.gettempdir() if self.on_disk else None)
+
+    def on_done(self, result):
+        self.apply_button.setText("Score")
+        result, profile = result
+        if profile is not None:
+            lines = ["Profile saved to {0}".format(profile.filename)] + profile.format()
+            log.info("Scoring profile: %s", "; ".join(lines))
+            # function names such as <listcomp> are not markup
+            self.profileLabel.setText("<br/>".join(html.escape(line) for line in lines))
+        DomainY = result.outputVariables()
         DomainM = self.data.domain.class_vars
-        output_data_domain = Domain(DomainX, class_vars=DomainY, metas=DomainM)     
-        self.output_data = Table.from_numpy(output_data_domain, self.data.X, Y=np.array(res), metas=self.data._Y)   
+        with timing.phase("buildTable", len(result.Y)):
+            self.output_data = predictionTable(self.data, DomainY, result.Y)
         self.output_data.name = "Result Table"
-        if len(DomainM) > 0 and len(res[0])==1:
-            self.eval_result_matrix(np.array(res), DomainY)
+        if len(DomainM) > 0 and len(DomainY)==1:
+            self.eval_result_matrix(result.Y, DomainY)
+        self.showTimings()
         self.send_data()
-        self.progressBarSet(100)
+
+    def showTimings(self):
+        """Show the timings recorded since scoring was started."""
+        if self.timingsSnapshot is None:
+            return
+        lines = timing.timings().since(self.timingsSnapshot).format()
+        self.timingsSnapshot = None
+        log.info("Scoring timings: %s", "; ".join(lines))
+        self.timingsLabel.setText("<br/>".join(["Timings:"] + lines))
+
+    def on_exception(self, ex):
+        self.apply_button.setText("Score")
+        if isinstance(ex, Cancelled):
+            return
+        self.Error.scoring(str(ex))
+
+    def onDeleteWidget(self):
+        self.shutdown()
+        super().onDeleteWidget()
 
     def eval_result_matrix(self, predicted_results, domain_results):
         self.eval_results = Results(self.data,
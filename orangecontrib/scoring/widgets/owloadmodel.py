@@ -4,8 +4,8 @@ import logging
 from warnings import catch_warnings
 from typing import List
 
-from AnyQt.QtWidgets import QStyle, QGridLayout, QSizePolicy as Policy
-from AnyQt.QtCore import Qt, QTimer, QSize
+from AnyQt.QtWidgets import QApplication, QStyle, QGridLayout, QSizePolicy as Policy
+from AnyQt.QtCore import Qt, QTimer, QSize, QFileSystemWatcher, QEventLoop
 
 from Orange.data.io import class_from_qualified_name
 from Orange.widgets import widget, gui
@@ -21,8 +21,10 @@ from Orange.widgets.widget import Output
 # module's namespace so that old saved settings still work
 from Orange.widgets.utils.filedialogs import RecentPath
 
+from orangecontrib.scoring.lib.gateway import formatStats, pmmlGateway
 from orangecontrib.scoring.lib.model import ScoringModel
-from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat
+from orangecontrib.scoring.lib.readers import PFAFormat, PMMLFormat, fileDigest, formatOf, \
+    splitExtension
 
 log = logging.getLogger(__name__)
 
@@ -44,8 +46,11 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
     want_main_area = False
 
     SEARCH_PATHS = [("location", os.getcwd())]
-    SIZE_LIMIT = 1e7
     LOCAL_FILE, URL = range(2)
+    # Milliseconds between checks of a watched file, in case the file system
+    # does not report changes, and from a reported change to the check
+    WATCH_INTERVAL = 2000
+    WATCH_DELAY = 500
 
     settingsHandler = PerfectDomainContextHandler(
         match_values=PerfectDomainContextHandler.MATCH_VALUES_ALL
@@ -57,11 +62,13 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
     # Overload RecentPathsWidgetMixin.recent_paths to set defaults
     recent_paths = Setting([])
     source = Setting(LOCAL_FILE)   
+    # Reload the model and send it when the content of the file changes
+    watch = Setting(False)
 
     class Warning(widget.OWWidget.Warning):
-        file_too_big = widget.Msg("The file is too large to load automatically."
-                                  " Press Reload to load.")
         load_warning = widget.Msg("Read warning:\n{}")
+        reload_failed = widget.Msg("The changed file could not be loaded; "
+                                   "the previous model is kept.\n{}")
 
     class Error(widget.OWWidget.Error):
         file_not_found = widget.Msg("File not found.")
@@ -78,6 +85,10 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
         self.data = None
         self.loaded_file = ""
         self.reader = None
+        # fileDigest of the file content last loaded, or tried to load by check_file
+        self.loaded_digest = None
+        # True while _read runs; events processed meanwhile must not start another read
+        self.loading = False
 
         layout = QGridLayout()
         gui.widgetBox(self.controlArea, margin=0, orientation=layout)
@@ -107,6 +118,19 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
         reload_button.setSizePolicy(Policy.Fixed, Policy.Fixed)
         layout.addWidget(reload_button, 0, 3)
 
+        watch_box = gui.checkBox(
+            None, self, "watch", "Reload and send the model when the file changes",
+            callback=self.update_watch, addToLayout=False)
+        layout.addWidget(watch_box, 1, 1, 1, 3)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._schedule_check)
+        self.watcher.directoryChanged.connect(self._schedule_check)
+        self.watch_delay = QTimer(self, singleShot=True, interval=self.WATCH_DELAY)
+        self.watch_delay.timeout.connect(self.check_file)
+        self.watch_timer = QTimer(self, interval=self.WATCH_INTERVAL)
+        self.watch_timer.timeout.connect(self.check_file)
+
         box = gui.vBox(self.controlArea, "Info")
         self.infolabel = gui.widgetLabel(box, 'No model loaded.')
         self.warnings = gui.widgetLabel(box, '')
@@ -125,13 +149,6 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
 
         self.setAcceptDrops(True)
 
-        if self.source == self.LOCAL_FILE:
-            last_path = self.last_path()
-            if last_path and os.path.exists(last_path) and \
-                    os.path.getsize(last_path) > self.SIZE_LIMIT:
-                self.Warning.file_too_big()
-                return
-
         QTimer.singleShot(0, self.load_data)
 
     @staticmethod
@@ -173,8 +190,63 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
         if error:
             error()
             self.data = None
+            self.loaded_digest = None
             self.Outputs.data.send(None)
             self.infolabel.setText("No model.")
+        self.update_watch()
+
+    def update_watch(self):
+        """Watch the current file and its directory if watching is enabled;
+        the directory reports files that are replaced rather than rewritten."""
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        path = self.last_path()
+        if not (self.watch and self.source == self.LOCAL_FILE and path):
+            self.watch_timer.stop()
+            return
+        watched = [p for p in (path, os.path.dirname(path)) if os.path.exists(p)]
+        if watched:
+            self.watcher.addPaths(watched)
+        self.watch_timer.start()
+
+    def _schedule_check(self):
+        # writers often change a file in several steps; check when they are done
+        self.watch_delay.start()
+
+    def check_file(self):
+        """Reload the model if the content of the watched file has changed and
+        send the new model. The previous model is kept while the file is
+        missing or cannot be read."""
+        path = self.last_path()
+        if self.loading or not (self.watch and self.source == self.LOCAL_FILE and path):
+            return
+        if path not in self.watcher.files() and os.path.exists(path):
+            # the file was replaced or recreated; watch the new one
+            self.watcher.addPath(path)
+        try:
+            digest = fileDigest(path)
+        except OSError:
+            return
+        if digest == self.loaded_digest:
+            return
+        # pylint: disable=broad-except
+        try:
+            reader = self._get_reader()
+            model = self._read(reader)
+        except Exception as ex:
+            log.exception(ex)
+            self.Warning.reload_failed(str(ex))
+            # do not retry until the content changes again
+            self.loaded_digest = digest
+            return
+        self.clear_messages()
+        self.reader = reader
+        self.data = model
+        self.loaded_file = path
+        self.loaded_digest = reader.digest
+        self.infolabel.setText(self._describe(model))
+        self.send_data()
 
     def _try_load(self):
         # pylint: disable=broad-except
@@ -192,7 +264,7 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
 
         with catch_warnings(record=True) as warnings:
             try:
-                model = self.reader.read()
+                model = self._read(self.reader)
             except Exception as ex:
                 log.exception(ex)
                 return lambda x=ex: self.Error.unknown(str(x))
@@ -202,10 +274,38 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
         self.infolabel.setText(self._describe(model))
 
         self.loaded_file = self.last_path()
+        self.loaded_digest = getattr(self.reader, "digest", None)
         self.data = model
         self.apply_button.setEnabled(True)
         return None
 
+    def _read(self, reader):
+        """Read a model with reader, showing the progress of reading and
+        parsing it in the progress bar. The file is not checked for changes
+        meanwhile."""
+        shown = [-1]
+
+        def progress(fraction):
+            percent = int(100 * fraction)
+            if percent != shown[0]:
+                shown[0] = percent
+                self.progressBarSet(percent)
+                # loading runs in the GUI thread; let the progress bar repaint
+                QApplication.processEvents(QEventLoop.ExcludeUserInputEvents)
+
+        polling = self.watch_timer.isActive()
+        self.watch_timer.stop()
+        self.watch_delay.stop()
+        self.loading = True
+        self.progressBarInit()
+        try:
+            return reader.read(progress=progress)
+        finally:
+            self.progressBarFinished()
+            self.loading = False
+            if polling:
+                self.watch_timer.start()
+
     def _get_reader(self):
         if self.source == self.LOCAL_FILE:
             path = self.last_path()
@@ -216,12 +316,10 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
                 reader_class = class_from_qualified_name(qname)
                 reader = reader_class.get_reader(path)
             else:
-                _, ext = os.path.splitext(path)
+                file_format = formatOf(path)
                 reader = self.NoFileSelected
-                if ext in PMMLFormat.EXTENSIONS:
-                    reader = PMMLFormat.get_reader(path)
-                if ext in PFAFormat.EXTENSIONS:
-                    reader = PFAFormat.get_reader(path)
+                if file_format is not None:
+                    reader = file_format.get_reader(path)
             return reader
         return self.NoFileSelected
 
@@ -251,11 +349,13 @@ class OWLoadModel(widget.OWWidget, RecentPathsWComboMixin):
                     ", ".join([name+ " ("+dataType+")" for name, dataType in modelFormat.targetFields]) 
             else:
                 text += ":<br/>&nbsp;&nbsp;&nbsp;&nbsp;None"                               
+        if modelFormat.usesJVM:
+            text += "<br/>JVM:<br/>&nbsp;&nbsp;&nbsp;&nbsp;" + formatStats(pmmlGateway().stats())
         return text
 
     def get_widget_name_extension(self):
         _, name = os.path.split(self.loaded_file)
-        return os.path.splitext(name)[0]
+        return splitExtension(name)[0]
 
     def send_data(self):
         self.Outputs.data.send(self.data)
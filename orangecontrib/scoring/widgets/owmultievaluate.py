@@ -0,0 +1,188 @@
+import os
+import logging
+
+from AnyQt.QtCore import QSize
+
+from Orange.widgets.widget import OWWidget, Msg, Input, Output, MultiInput
+from Orange.data import Table
+from Orange.widgets import gui
+from Orange.widgets.settings import Setting
+from Orange.widgets.utils.concurrent import ConcurrentWidgetMixin
+
+from orangecontrib.scoring.lib import timing
+from orangecontrib.scoring.lib.model import ScoringModel
+from orangecontrib.scoring.lib.multi import MultiScorer
+from orangecontrib.scoring.lib.results import predictionTable
+from orangecontrib.scoring.lib.utils import prettifyText
+from orangecontrib.scoring.widgets.owevaluate import Cancelled
+
+log = logging.getLogger(__name__)
+
+def run(data, scorer, chunkSize, workers, state):
+    """Score data with every model of scorer, a MultiScorer, in chunks of
+    chunkSize rows on the given number of threads; runs in a worker thread.
+    Returns the output variables of all models and the array of their
+    predictions."""
+    nRows = len(data)
+    columns = [var.name for var in data.domain.attributes]
+    categories = {var.name: tuple(var.values) for var in data.domain.attributes if var.is_discrete}
+    assemblers, Y = scorer.assemblers(nRows)
+    total = max(nRows * len(assemblers), 1)
+    done = 0
+    batches = scorer.iterPredict(data.X, columns, categories, workers=workers, chunkSize=chunkSize)
+    with timing.phase("score", nRows):
+        try:
+            for i, start, stop, batch in batches:
+                with timing.phase("encodeOutput", stop - start):
+                    assemblers[i].add(start, batch)
+                if state.is_interruption_requested():
+                    raise Cancelled
+                done += stop - start
+                state.set_progress_value(100 * done / total)
+        finally:
+            batches.close()
+    variables = [var for assembler in assemblers for var in assembler.outputVariables()]
+    return variables, Y
+
+class OWMultiEvaluate(OWWidget, ConcurrentWidgetMixin):
+    name = "Evaluate Multiple Models"
+    id = "orange.widgets.scoring.multievaluate"
+    description = "Score data with several PFA or PMML models at once and output " \
+                  "the predictions of all models in one table"
+    icon = "icons/evaluate.svg"
+    priority = 3
+    category = "Scoring"
+    keywords = ["scoring", "inference", "pfa", "pmml", "champion", "challenger"]
+
+    class Inputs:
+        data = Input("Data", Table)
+        models = MultiInput("Scoring Model", ScoringModel)
+
+    class Outputs:
+        predictions = Output("Predictions", Table, doc="Predictions of all models")
+
+    resizing_enabled = True
+    want_control_area = False
+
+    # Number of rows handed to ScoringModel.predictBatch at once
+    CHUNK_SIZE = 1000
+
+    # Number of threads scoring models in parallel
+    workers = Setting(1)
+
+    class Error(OWWidget.Error):
+        fields = Msg("{}")
+        scoring = Msg("Scoring error:\n{}")
+
+    def __init__(self):
+        OWWidget.__init__(self)
+        ConcurrentWidgetMixin.__init__(self)
+        self.data = None
+        self.models = []
+        self.output_data = None
+
+        box = gui.vBox(self.mainArea, "Info")
+        self.infolabel = gui.widgetLabel(box, 'No models or data loaded.')
+        self.timingsLabel = gui.widgetLabel(box, '')
+        self.timingsSnapshot = None
+
+        box = gui.hBox(self.mainArea)
+        gui.spin(box, self, "workers", 1, os.cpu_count() or 1, label="Models scored in parallel:")
+        gui.rubber(box)
+        self.apply_button = gui.button(box, self, "Score", callback=self.score)
+        self.apply_button.setEnabled(False)
+
+    @staticmethod
+    def sizeHint():
+        return QSize(320, 100)
+
+    @Inputs.data
+    def set_data(self, data):
+        self.data = data
+
+    @Inputs.models
+    def set_model(self, index, model):
+        self.models[index] = model
+
+    @Inputs.models.insert
+    def insert_model(self, index, model):
+        self.models.insert(index, model)
+
+    @Inputs.models.remove
+    def remove_model(self, index):
+        self.models.pop(index)
+
+    def handleNewSignals(self):
+        # results of a run started for the previous inputs are stale
+        self.cancel()
+        self.apply_button.setText("Score")
+        self.output_data = None
+        self.Outputs.predictions.send(None)
+        self.Error.clear()
+        self.timingsLabel.setText('')
+        self.apply_button.setEnabled(False)
+        models = [model for model in self.models if model is not None]
+        if self.data is None or not models:
+            self.infolabel.setText('No models or data loaded.')
+            return
+        scorer = MultiScorer(models)
+        columns = [var.name for var in self.data.domain.attributes]
+        lines = ["Input Data:", "Rows - {0}".format(len(self.data))]
+        lines += prettifyText(columns, pre="Column Names - ")
+        lines += ["", "Models:"]
+        missingFields = []
+        for modelName, model in zip(scorer.names, models):
+            fields = [name for name, _ in model.inputFields]
+            lines.append("- {0} ({1}, {2} output(s))".format(modelName, model.type, len(model.outputFields)))
+            if model.type == "PMML" or model.pfaInputIsRecord:
+                missing = [name for name in fields if name not in columns]
+                if missing:
+                    missingFields.append("{0}: {1}".format(modelName, ", ".join(missing)))
+        self.infolabel.setText("<br/>".join(lines))
+        if missingFields:
+            self.Error.fields("Data has no column for model field(s)\n" + "\n".join(missingFields))
+            return
+        self.apply_button.setEnabled(True)
+
+    def score(self):
+        if self.task is not None:
+            self.cancel()
+            self.apply_button.setText("Score")
+            return
+        self.output_data = None
+        self.Error.scoring.clear()
+        self.apply_button.setText("Cancel")
+        self.timingsLabel.setText('')
+        self.timingsSnapshot = timing.timings().snapshot() if timing.isEnabled() else None
+        scorer = MultiScorer([model for model in self.models if model is not None])
+        self.start(run, self.data, scorer, self.CHUNK_SIZE, self.workers)
+
+    def on_done(self, result):
+        self.apply_button.setText("Score")
+        variables, Y = result
+        with timing.phase("buildTable", len(Y)):
+            self.output_data = predictionTable(self.data, variables, Y)
+        self.output_data.name = "Result Table"
+        if self.timingsSnapshot is not None:
+            lines = timing.timings().since(self.timingsSnapshot).format()
+            self.timingsSnapshot = None
+            self.timingsLabel.setText("<br/>".join(["Timings:"] + lines))
+        self.Outputs.predictions.send(self.output_data)
+
+    def on_exception(self, ex):
+        self.apply_button.setText("Score")
+        if isinstance(ex, Cancelled):
+            return
+        self.Error.scoring(str(ex))
+
+    def onDeleteWidget(self):
+        self.shutdown()
+        super().onDeleteWidget()
+
+
+if __name__ == "__main__":
+    from Orange.widgets.utils.widgetpreview import WidgetPreview
+    from orangecontrib.scoring.lib.readers import PFAFormat
+    pfaFile = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../tests/sample_iris.json")
+    WidgetPreview(OWMultiEvaluate).run(set_data=Table("iris"),
+                                       insert_model=[(0, PFAFormat.get_reader(pfaFile).read())])
@@ -42,6 +42,11 @@ INSTALL_REQUIRES = [
     'pypmml',
 ]
 
+EXTRAS_REQUIRE = {
+    # Parquet and Arrow input and output of the command-line scorer
+    'arrow': ['pyarrow'],
+}
+
 ENTRY_POINTS = {
     # Entry points that marks this package as an orange add-on. If set, addon will
     # be shown in the add-ons manager even if not published on PyPi.
@@ -65,7 +70,12 @@ ENTRY_POINTS = {
 
     # Register widget help
     "orange.canvas.help": (
-        'html-index = orangecontrib.scoring.widgets:WIDGET_HELP_PATH',)
+        'html-index = orangecontrib.scoring.widgets:WIDGET_HELP_PATH',),
+
+    # Command-line scorer
+    'console_scripts': (
+        'orange-scoring = orangecontrib.scoring.cli:main',
+    ),
 }
 
 NAMESPACE_PACKAGES = ["orangecontrib"]
@@ -104,7 +114,8 @@ if __name__ == '__main__':
         package_data=PACKAGE_DATA,
         data_files=DATA_FILES,
         install_requires=INSTALL_REQUIRES,
-        python_requires='>=3.5',
+        extras_require=EXTRAS_REQUIRE,
+        python_requires='>=3.7',
         entry_points=ENTRY_POINTS,
         namespace_packages=NAMESPACE_PACKAGES,
         test_suite=TEST_SUITE,
@@ -124,8 +135,6 @@ if __name__ == '__main__':
             'License :: OSI Approved :: MIT License',
             'Programming Language :: Python :: 3 :: Only',
             'Programming Language :: Python :: 3',
-            'Programming Language :: Python :: 3.5',
-            'Programming Language :: Python :: 3.6',
             'Programming Language :: Python :: 3.7',
             'Programming Language :: Python :: 3.8',
             'Natural Language :: English',